@@ -1,9 +1,22 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from .context_builder import build_rag_snippets
-from ..llm.client import LLMClient
+from ..llm.context_builder import (
+    budget_context,
+    format_field_lines,
+)
+from ..llm.client import LLMClient, declare_prompt_variables, get_llm_client, run_sync, usage_scope
+from ..llm.json_parser import JSONParseError
+from ..llm.resilience import record_fallback
 
 
 # Section -> which fields it uses
@@ -15,50 +28,387 @@ SECTION_MAP: Dict[str, List[str]] = {
 }
 
 
-def _format_section_fields(fields: Dict[str, Any], keys: List[str], max_chars: int = 1800) -> str:
-    lines = []
-    for k in keys:
-        v = fields.get(k, "")
-        if isinstance(v, list):
-            v_str = ", ".join([str(x) for x in v])
-        else:
-            v_str = str(v or "")
-        v_str = v_str.strip()
-        lines.append(f"- {k}: {v_str if v_str else '(empty)'}")
-    text = "\n".join(lines)
-    return text[:max_chars]
+# Preview modes:
+# - per_section: one generate_section call per section (concurrent)
+# - single_call: one generate_preview call returning all sections as JSON;
+#   sections missing from / unusable in the response fall back to per_section
+PREVIEW_MODES = ("per_section", "single_call")
+PREVIEW_MODE = os.getenv("PREVIEW_MODE", "per_section")
+
+
+# Bump to invalidate stored preview sections without a prompt text change
+PREVIEW_CACHE_VERSION = "2"
+
+PREVIEW_PROMPTS = ("generate_section.txt", "generate_preview.txt")
+
+# Variables _section_variables / _preview_variables pass (checked at startup)
+SECTION_VARIABLES = ("section_name", "section_fields", "rag_snippets")
+PREVIEW_VARIABLES = ("section_names", "sections_fields", "rag_snippets")
+declare_prompt_variables("generate_section.txt", SECTION_VARIABLES)
+declare_prompt_variables("generate_preview.txt", PREVIEW_VARIABLES)
+
+
+def section_cache_key(
+    section_name: str,
+    fields: Dict[str, Any],
+    rag_snippets: Optional[List[str]],
+    prompt_fingerprint: str,
+) -> str:
+    """Hash of everything a section's text depends on."""
+    values = [fields.get(k, "") for k in SECTION_MAP.get(section_name, [])]
+    payload = json.dumps(
+        [PREVIEW_CACHE_VERSION, prompt_fingerprint, section_name, values, rag_snippets or []],
+        ensure_ascii=False, sort_keys=True, default=str,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class _PreviewStats:
+    """
+    Per-mode latency / call / token counters. Tokens are the client's
+    estimates for the model calls made (response cache hits cost none).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modes: Dict[str, Dict[str, float]] = {}
+
+    def record(
+        self,
+        mode: str,
+        seconds: float,
+        llm_calls: int,
+        fallback_sections: int,
+        cached_sections: int,
+        prompt_tokens: int,
+        output_tokens: int,
+    ) -> None:
+        with self._lock:
+            m = self._modes.setdefault(mode, {
+                "runs": 0,
+                "seconds": 0.0,
+                "llm_calls": 0,
+                "fallback_sections": 0,
+                "cached_sections": 0,
+                "prompt_tokens": 0,
+                "output_tokens": 0,
+            })
+            m["runs"] += 1
+            m["seconds"] += seconds
+            m["llm_calls"] += llm_calls
+            m["fallback_sections"] += fallback_sections
+            m["cached_sections"] += cached_sections
+            m["prompt_tokens"] += prompt_tokens
+            m["output_tokens"] += output_tokens
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            out = {}
+            for mode, m in self._modes.items():
+                runs = m["runs"] or 1
+                out[mode] = dict(m)
+                out[mode]["seconds"] = round(m["seconds"], 3)
+                out[mode]["avg_latency_s"] = round(m["seconds"] / runs, 3)
+                out[mode]["avg_prompt_tokens"] = round(m["prompt_tokens"] / runs, 1)
+                out[mode]["avg_output_tokens"] = round(m["output_tokens"] / runs, 1)
+            return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._modes.clear()
+
+
+_preview_stats = _PreviewStats()
+
+
+def preview_stats() -> Dict[str, Dict[str, Any]]:
+    """Latency and (estimated) token usage per preview mode."""
+    return _preview_stats.snapshot()
 
 
 class BRDGenerator:
-    def __init__(self, llm: Optional[LLMClient] = None):
-        self.llm = llm or LLMClient()
+    def __init__(self, llm: Optional[LLMClient] = None, mode: Optional[str] = None):
+        self.llm = llm or get_llm_client()
+        self.mode = mode or PREVIEW_MODE
+        if self.mode not in PREVIEW_MODES:
+            raise ValueError(f"Unknown preview mode: {self.mode} (expected one of {PREVIEW_MODES})")
 
-    def generate_section(
+    def prompt_fingerprint(self) -> str:
+        """Hash of the preview prompt templates (changes when they are edited)."""
+        h = hashlib.sha1()
+        for name in PREVIEW_PROMPTS:
+            h.update(self.llm.get_template(name).text.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _cache_keys(
+        self,
+        names: List[str],
+        fields: Dict[str, Any],
+        rag_snippets_by_section: Optional[Dict[str, List[str]]] = None,
+    ) -> Dict[str, str]:
+        fp = self.prompt_fingerprint()
+        return {
+            name: section_cache_key(name, fields, (rag_snippets_by_section or {}).get(name, []), fp)
+            for name in names
+        }
+
+    def _section_variables(
         self,
         section_name: str,
         fields: Dict[str, Any],
         rag_snippets: Optional[List[str]] = None,
-    ) -> str:
+    ) -> Dict[str, Any]:
         keys = SECTION_MAP.get(section_name, [])
-        section_fields = _format_section_fields(fields, keys)
-
-        variables = {
+        section_fields, snippets = budget_context(
+            "generate_section.txt",
+            [self.llm.get_template("generate_section.txt").text, section_name],
+            format_field_lines(fields, keys, include_empty=True),
+            rag_snippets,
+            rank_fields=False,
+        )
+        return {
             "section_name": section_name,
             "section_fields": section_fields,
-            "rag_snippets": build_rag_snippets(rag_snippets),
+            "rag_snippets": snippets,
         }
+
+    def generate_section(
+        self,
+        section_name: str,
+        fields: Dict[str, Any],
+        rag_snippets: Optional[List[str]] = None,
+    ) -> str:
+        variables = self._section_variables(section_name, fields, rag_snippets)
         return self.llm.run_text("generate_section.txt", variables, max_output_tokens=900)
 
+    async def agenerate_section(
+        self,
+        section_name: str,
+        fields: Dict[str, Any],
+        rag_snippets: Optional[List[str]] = None,
+    ) -> str:
+        variables = self._section_variables(section_name, fields, rag_snippets)
+        return await self.llm.arun_text("generate_section.txt", variables, max_output_tokens=900)
+
+    def _preview_variables(
+        self,
+        names: List[str],
+        fields: Dict[str, Any],
+        rag_snippets_by_section: Optional[Dict[str, List[str]]] = None,
+    ) -> Dict[str, Any]:
+        lines: List[str] = []
+        for name in names:
+            lines.append(f"### {name}")
+            lines.extend(format_field_lines(fields, SECTION_MAP.get(name, []), include_empty=True))
+
+        # Snippets are shared by all sections: send each one once
+        snippets: List[str] = []
+        for name in names:
+            for snip in (rag_snippets_by_section or {}).get(name, []):
+                if snip not in snippets:
+                    snippets.append(snip)
+
+        section_names = json.dumps(names, ensure_ascii=False)
+        sections_fields, rag_snippets = budget_context(
+            "generate_preview.txt",
+            [self.llm.get_template("generate_preview.txt").text, section_names],
+            lines,
+            snippets,
+            max_snippets=3 * len(names),
+            rank_fields=False,
+        )
+        return {
+            "section_names": section_names,
+            "sections_fields": sections_fields,
+            "rag_snippets": rag_snippets,
+        }
+
+    async def _agenerate_per_section(
+        self,
+        names: List[str],
+        fields: Dict[str, Any],
+        rag_snippets_by_section: Optional[Dict[str, List[str]]] = None,
+    ) -> Dict[str, str]:
+        texts = await asyncio.gather(*[
+            self.agenerate_section(name, fields, (rag_snippets_by_section or {}).get(name, []))
+            for name in names
+        ])
+        return dict(zip(names, texts))
+
+    async def _agenerate_single_call(
+        self,
+        names: List[str],
+        fields: Dict[str, Any],
+        rag_snippets_by_section: Optional[Dict[str, List[str]]] = None,
+    ) -> Dict[str, str]:
+        variables = self._preview_variables(names, fields, rag_snippets_by_section)
+        try:
+            data = await self.llm.arun_json(
+                "generate_preview.txt", variables, max_output_tokens=900 * len(names)
+            )
+        except JSONParseError:
+            # Sections it did not deliver are regenerated per section
+            record_fallback("generate_preview", "invalid_json")
+            data = {}
+
+        if not isinstance(data, dict):
+            data = {}
+        # Accept {"Background": "..."} or {"sections": {"Background": "..."}}
+        if isinstance(data.get("sections"), dict):
+            data = data["sections"]
+
+        sections: Dict[str, str] = {}
+        for name in names:
+            text = data.get(name)
+            if isinstance(text, str) and text.strip():
+                sections[name] = text.strip()
+        return sections
+
+    async def agenerate_preview(
+        self,
+        fields: Dict[str, Any],
+        rag_snippets_by_section: Optional[Dict[str, List[str]]] = None,
+        mode: Optional[str] = None,
+        cache: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> Dict[str, str]:
+        """
+        Generate all sections. Returns dict: section_name -> text
+
+        per_section: sections run concurrently (bounded by the client's
+        concurrency limit). single_call: one JSON call for all sections;
+        only sections it did not deliver are regenerated per section.
+
+        cache (e.g. SessionState.preview_cache) is updated in place:
+        sections whose input hash is unchanged are reused, not regenerated.
+        """
+        mode = mode or self.mode
+        names = list(SECTION_MAP.keys())
+        t0 = time.perf_counter()
+        llm_calls = 0
+
+        sections: Dict[str, str] = {}
+        keys: Dict[str, str] = {}
+        if cache is not None:
+            keys = self._cache_keys(names, fields, rag_snippets_by_section)
+            for name in names:
+                entry = cache.get(name)
+                if entry and entry.get("key") == keys[name]:
+                    sections[name] = entry["text"]
+        cached = len(sections)
+
+        stale = [n for n in names if n not in sections]
+        # Token estimates come from the client's own accounting of these calls
+        with usage_scope() as usage:
+            if mode == "single_call" and len(stale) > 1:
+                sections.update(await self._agenerate_single_call(stale, fields, rag_snippets_by_section))
+                llm_calls += 1
+
+            missing = [n for n in names if n not in sections]
+            if missing:
+                sections.update(await self._agenerate_per_section(missing, fields, rag_snippets_by_section))
+                llm_calls += len(missing)
+
+        if cache is not None:
+            for name in stale:
+                cache[name] = {"key": keys[name], "text": sections[name]}
+
+        _preview_stats.record(
+            mode,
+            seconds=time.perf_counter() - t0,
+            llm_calls=llm_calls,
+            fallback_sections=len(missing) if mode == "single_call" and len(stale) > 1 else 0,
+            cached_sections=cached,
+            prompt_tokens=usage["input_tokens"],
+            output_tokens=usage["output_tokens"],
+        )
+        return {name: sections[name] for name in names}
+
     def generate_preview(
         self,
         fields: Dict[str, Any],
         rag_snippets_by_section: Optional[Dict[str, List[str]]] = None,
+        mode: Optional[str] = None,
+        cache: Optional[Dict[str, Dict[str, Any]]] = None,
     ) -> Dict[str, str]:
         """
         Returns dict: section_name -> text
+        Sync wrapper around agenerate_preview.
         """
-        out: Dict[str, str] = {}
-        for section_name in SECTION_MAP.keys():
-            snippets = (rag_snippets_by_section or {}).get(section_name, [])
-            out[section_name] = self.generate_section(section_name, fields, snippets)
-        return out
+        return run_sync(self.agenerate_preview(fields, rag_snippets_by_section, mode=mode, cache=cache))
+
+    def stream_section(
+        self,
+        section_name: str,
+        fields: Dict[str, Any],
+        rag_snippets: Optional[List[str]] = None,
+    ) -> Iterator[str]:
+        variables = self._section_variables(section_name, fields, rag_snippets)
+        return self.llm.stream_text("generate_section.txt", variables, max_output_tokens=900)
+
+    def stream_preview(
+        self,
+        fields: Dict[str, Any],
+        rag_snippets_by_section: Optional[Dict[str, List[str]]] = None,
+        cache: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        Yields (section_name, chunk) events as text arrives.
+        Sections stream concurrently (up to the client's concurrency
+        limit), so events of different sections may interleave; chunks of
+        one section always arrive in order. Closing the iterator early
+        stops the remaining sections.
+
+        Sections still valid in cache are yielded first, as one chunk each;
+        fully streamed sections are written back to cache.
+        """
+        names = list(SECTION_MAP.keys())
+        keys: Dict[str, str] = {}
+        texts: Dict[str, List[str]] = {}
+        if cache is not None:
+            keys = self._cache_keys(names, fields, rag_snippets_by_section)
+            stale = []
+            for name in names:
+                entry = cache.get(name)
+                if entry and entry.get("key") == keys[name]:
+                    yield name, entry["text"]
+                else:
+                    stale.append(name)
+            names = stale
+            if not names:
+                return
+        events: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        cancelled = threading.Event()
+        done = object()
+
+        def produce(name: str) -> None:
+            try:
+                snippets = (rag_snippets_by_section or {}).get(name, [])
+                for chunk in self.stream_section(name, fields, snippets):
+                    if cancelled.is_set():
+                        break
+                    events.put((name, chunk))
+            except BaseException as e:
+                events.put((name, e))
+            finally:
+                events.put((name, done))
+
+        pool = ThreadPoolExecutor(max_workers=min(len(names), self.llm.max_concurrency) or 1)
+        try:
+            for name in names:
+                pool.submit(produce, name)
+            remaining = len(names)
+            while remaining:
+                name, item = events.get()
+                if item is done:
+                    remaining -= 1
+                    if cache is not None and name in keys:
+                        cache[name] = {"key": keys[name], "text": "".join(texts.get(name, []))}
+                elif isinstance(item, BaseException):
+                    raise item
+                else:
+                    texts.setdefault(name, []).append(item)
+                    yield name, item
+        finally:
+            cancelled.set()
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -11,4 +11,4 @@ BRD_FIELDS = [
     "Traffic Forecast",
 ]
 
-SUBMIT_THRESHOLD = 70  # (your compute_scores_from_fields uses this logic)
+SUBMIT_THRESHOLD = 70  # keep in sync with scoring_engine_final.SUBMIT_THRESHOLD
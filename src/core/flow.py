@@ -3,18 +3,24 @@ from __future__ import annotations
 import os
 from typing import Any, Dict, Optional
 
-from ..llm.client import LLMClient
-from .context_builder import build_fields_context, build_rag_snippets, field_desc
+from ..llm.client import LLMClient, declare_prompt_variables, get_llm_client
+from ..llm.context_builder import RELATED_FIELDS, budget_context, field_desc, format_field_lines
+from ..llm.json_parser import JSONParseError
+from ..llm.resilience import CircuitOpenError, record_fallback
 
 from .state import load_session, save_session, update_field, set_answer
+from .store import SessionConflictError
+from .session_lock import session_lock
+from .llm_gate import should_bypass_llm
 from .mapping import pick_next_field, question_ids_for_field
 from ..scoring.scoring_engine_final import (
-    compute_scores_from_fields,
+    compute_scores_incremental,
     get_weak_fields,
     resolve_questions,
 )
 from ..rag.retriever import retrieve_snippets
-from ..rag.index import VectorStore
+from ..rag.index import get_vector_store
+from ..rag.prefetch import get_prefetcher
 
 # -----------------------------
 # LLM Switch (Demo-safe)
@@ -37,12 +43,19 @@ PYTHONPATH=.
 # -----------------------------
 USE_LLM = os.getenv("USE_LLM", "0") == "1"
 
-_llm = None
+# Reload + re-apply attempts when another worker saved the same session
+MAX_SAVE_ATTEMPTS = 3
+
+RAG_TOP_K = 3
+
+# Variables normalize_answer_llm passes (checked against the template at startup)
+NORMALIZE_VARIABLES = ("field_name", "field_desc", "fields_context", "rag_snippets", "user_answer")
+declare_prompt_variables("normalize_answer.txt", NORMALIZE_VARIABLES)
+
+
 def _get_llm() -> LLMClient:
-    global _llm
-    if _llm is None:
-        _llm = LLMClient()
-    return _llm
+    # Shared client: prompt templates are parsed once per process
+    return get_llm_client()
 
 
 def normalize_answer_stub(field_name: str, user_text: str) -> Dict[str, Any]:
@@ -55,14 +68,24 @@ def normalize_answer_stub(field_name: str, user_text: str) -> Dict[str, Any]:
 
 
 def normalize_answer_llm(field_name: str, user_text: str, fields: dict, rag_snippets=None) -> Dict[str, Any]:
+    llm = _get_llm()
+    desc = field_desc(field_name)
+    answer = user_text.strip()
+    # Template, description and answer are always sent; related fields and
+    # snippets share what is left of the prompt budget
+    fields_context, snippets = budget_context(
+        "normalize_answer.txt",
+        [llm.get_template("normalize_answer.txt").text, field_name, desc, answer],
+        format_field_lines(fields, RELATED_FIELDS.get(field_name, list(fields.keys()))),
+        rag_snippets,
+    )
     variables = {
         "field_name": field_name,
-        "field_desc": field_desc(field_name),
-        "fields_context": build_fields_context(fields, field_name),
-        "rag_snippets": build_rag_snippets(rag_snippets),
-        "user_answer": user_text.strip(),
+        "field_desc": desc,
+        "fields_context": fields_context,
+        "rag_snippets": snippets,
+        "user_answer": answer,
     }
-    llm = _get_llm()
     return llm.run_json("normalize_answer.txt", variables, max_output_tokens=450)
 
 
@@ -72,15 +95,42 @@ def normalize_answer(field_name: str, user_text: str, fields: dict, rag_snippets
       - USE_LLM=0 => stub
       - USE_LLM=1 => LLM
       - LLM fails => fallback to stub
+      - LLM circuit breaker open => stub immediately (no waiting)
+      - answer already full marks and BRD-ready => stub (LLM_BYPASS gate)
     """
     if not USE_LLM:
         return normalize_answer_stub(field_name, user_text)
 
+    if should_bypass_llm(field_name, user_text):
+        return normalize_answer_stub(field_name, user_text)
+
     try:
         return normalize_answer_llm(field_name, user_text, fields, rag_snippets=rag_snippets)
+    except CircuitOpenError:
+        record_fallback("normalize_answer", "circuit_open")
+    except TimeoutError:
+        record_fallback("normalize_answer", "timeout")
+    except JSONParseError:
+        record_fallback("normalize_answer", "invalid_json")
     except Exception:
-        # Demo guarantee: never crash the flow because of LLM
-        return normalize_answer_stub(field_name, user_text)
+        record_fallback("normalize_answer", "error")
+    # Demo guarantee: never crash the flow because of LLM
+    return normalize_answer_stub(field_name, user_text)
+
+
+# -----------------------------
+# Scoring (cached per field in state.scores["field_cache"])
+# -----------------------------
+def _score_state(state):
+    """
+    Score session fields, re-running only scorers whose field value changed
+    since the cached result; refreshes the cache on the state.
+    """
+    cache = (state.scores or {}).get("field_cache")
+    score_result, new_cache = compute_scores_incremental(state.fields, cache)
+    if new_cache != cache:
+        state.scores = dict(state.scores or {}, field_cache=new_cache)
+    return score_result
 
 
 # -----------------------------
@@ -122,13 +172,15 @@ def _build_bot_payload(
 def start_or_resume(session_id: str, data_dir: str = "data/sessions") -> Dict[str, Any]:
     state = load_session(session_id, data_dir=data_dir)
 
-    score_result = compute_scores_from_fields(state.fields)
+    # Cached per-field scores from the last save -> no rescoring needed
+    score_result = _score_state(state)
     weak = get_weak_fields(score_result)
     next_field = pick_next_field(score_result, state.fields, weak_fields=weak)
 
     qids = question_ids_for_field(score_result, next_field) if next_field else []
     q_texts = resolve_questions(qids)[:2] if qids else []
 
+    _prefetch_rag(state, next_field)
     return _build_bot_payload(state.session_id, state.fields, score_result, next_field, q_texts)
 
 
@@ -139,43 +191,89 @@ def handle_user_message(
     question_id: Optional[str] = None,
     data_dir: str = "data/sessions",
 ) -> Dict[str, Any]:
-    state = load_session(session_id, data_dir=data_dir)
+    # Requests for the same session run one at a time in this process;
+    # other workers are caught by the store's version check below.
+    with session_lock(session_id):
+        state = load_session(session_id, data_dir=data_dir)
+
+        # Retrieve RAG snippets if index exists (prefetched last turn if possible)
+        rag_snippets = []
+        if state.rag_index_id:
+            prefetcher = get_prefetcher()
+            prefetched = None
+            if prefetcher is not None:
+                prefetched = prefetcher.take(session_id, state.rag_index_id, current_field, top_k=RAG_TOP_K)
+            if prefetched is not None:
+                rag_snippets = prefetched
+            else:
+                try:
+                    vector_store = get_vector_store()
+                    rag_snippets = retrieve_snippets(
+                        current_field,
+                        state.rag_index_id,
+                        vector_store,
+                        top_k=RAG_TOP_K
+                    )
+                except Exception as e:
+                    # Silently fail if RAG retrieval fails (demo-safe)
+                    print(f"RAG retrieval failed: {e}")
+                    rag_snippets = []
+
+        # normalize answer (LLM or stub) once; only the apply/save step is
+        # retried if another worker saved the session in the meantime
+        norm = normalize_answer(current_field, user_text, state.fields, rag_snippets=rag_snippets)
+
+        for attempt in range(MAX_SAVE_ATTEMPTS):
+            try:
+                payload = _apply_answer(state, user_text, current_field, question_id, norm, data_dir)
+                break
+            except SessionConflictError:
+                if attempt + 1 >= MAX_SAVE_ATTEMPTS:
+                    raise
+                state = load_session(session_id, data_dir=data_dir)
+
+    # The next turn's field is known: start its retrieval while the user types
+    _prefetch_rag(state, payload.get("next_field"))
+    return payload
+
+
+def _prefetch_rag(state, next_field: Optional[str]) -> None:
+    if not state.rag_index_id or not next_field:
+        return
+    prefetcher = get_prefetcher()
+    if prefetcher is None:
+        return
+    try:
+        prefetcher.schedule(state.session_id, state.rag_index_id, next_field, top_k=RAG_TOP_K)
+    except Exception as e:
+        print(f"RAG prefetch failed: {e}")
+
 
+def _apply_answer(
+    state,
+    user_text: str,
+    current_field: str,
+    question_id: Optional[str],
+    norm: Dict[str, Any],
+    data_dir: str,
+) -> Dict[str, Any]:
     # 1) store raw answer (optional)
     if question_id:
         set_answer(state, question_id, user_text)
 
-    # 2) normalize answer (LLM or stub)
-    # Retrieve RAG snippets if index exists
-    rag_snippets = []
-    if state.rag_index_id:
-        try:
-            vector_store = VectorStore()
-            rag_snippets = retrieve_snippets(
-                current_field, 
-                state.rag_index_id, 
-                vector_store,
-                top_k=3
-            )
-        except Exception as e:
-            # Silently fail if RAG retrieval fails (demo-safe)
-            print(f"RAG retrieval failed: {e}")
-            rag_snippets = []
-    
-    norm = normalize_answer(current_field, user_text, state.fields, rag_snippets=rag_snippets)
-
     needs = bool(norm.get("needs_clarification", False))
     followup = norm.get("followup_question")
 
-    # 2b) If clarification needed -> ask follow-up and do NOT update field yet
+    # 2) If clarification needed -> ask follow-up and do NOT update field yet
     if needs and followup:
         # Persist minimal session info so UI can keep continuity
         state.current_field = current_field
         state.last_question_ids = [question_id] if question_id else []
-        save_session(state, data_dir=data_dir)
 
-        # Score without changing fields (optional)
-        score_result = compute_scores_from_fields(state.fields)
+        # Score without changing fields (cache hit for every field); before
+        # saving, so a refreshed field_cache is persisted too
+        score_result = _score_state(state)
+        save_session(state, data_dir=data_dir)
         return _build_bot_payload(
             state.session_id,
             state.fields,
@@ -197,8 +295,8 @@ def handle_user_message(
         evidence=f"User answer to {question_id}" if question_id else "User answer",
     )
 
-    # 4) scoring
-    score_result = compute_scores_from_fields(state.fields)
+    # 4) scoring (only the changed field is re-scored)
+    score_result = _score_state(state)
     weak = get_weak_fields(score_result)
 
     # 5) pick next field
@@ -208,7 +306,7 @@ def handle_user_message(
     qids = question_ids_for_field(score_result, next_field) if next_field else []
     q_texts = resolve_questions(qids)[:2] if qids else []
 
-    # 7) persist session
+    # 7) persist session (raises SessionConflictError if stale)
     state.current_field = next_field
     state.last_question_ids = qids[:2]
     state.scores = {
@@ -217,6 +315,7 @@ def handle_user_message(
         "submit_allowed": score_result.submit_allowed,
         "submit_blockers": score_result.submit_blockers,
         "weak_fields": weak,
+        "field_cache": state.scores["field_cache"],
     }
     save_session(state, data_dir=data_dir)
 
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from ..scoring.scoring_engine_final import FIELD_MAX, score_field, tr_fold
+
+
+# Pre-normalization gate: skip normalize_answer_llm when the raw answer
+# already scores full marks and looks BRD-ready.
+#   off     -> always call the LLM
+#   strict  -> full marks + short, single line, no question / hedging
+#   lenient -> full marks + length cap only
+LLM_BYPASS = os.getenv("LLM_BYPASS", "strict")
+LLM_BYPASS_MAX_CHARS = int(os.getenv("LLM_BYPASS_MAX_CHARS", "280"))
+
+BYPASS_LEVELS = ("off", "strict", "lenient")
+
+# Hedging means the user is unsure: the LLM may want to ask a follow-up
+HEDGE_WORDS_TR = ["sanırım", "galiba", "herhalde", "bilmiyorum", "emin değilim", "belki"]
+# Folded like the answer (tr_fold), so "SANIRIM" and "Sanırım" both match
+_HEDGE_FOLDED = tuple(tr_fold(w) for w in HEDGE_WORDS_TR)
+
+
+class _BypassStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0
+        self.kept: Dict[str, int] = {}
+        self.skipped_by_field: Dict[str, int] = {}
+
+    def record(self, field_name: str, skip: bool, reason: str) -> None:
+        with self._lock:
+            self.checked += 1
+            if skip:
+                self.skipped += 1
+                self.skipped_by_field[field_name] = self.skipped_by_field.get(field_name, 0) + 1
+            else:
+                self.kept[reason] = self.kept.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "level": LLM_BYPASS,
+                "checked": self.checked,
+                "skipped": self.skipped,
+                "skip_rate": round(self.skipped / self.checked, 4) if self.checked else 0.0,
+                "skipped_by_field": dict(self.skipped_by_field),
+                "llm_reasons": dict(self.kept),
+            }
+
+
+_stats = _BypassStats()
+
+
+def bypass_decision(field_name: str, user_text: str, level: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Returns (skip_llm, reason). Cheap checks first; the field scorer runs
+    only for answers that could be skipped.
+    """
+    level = level or LLM_BYPASS
+    if level not in BYPASS_LEVELS or level == "off":
+        return False, "off"
+    if field_name not in FIELD_MAX:
+        return False, "unknown_field"
+
+    text = (user_text or "").strip()
+    max_chars = LLM_BYPASS_MAX_CHARS if level == "strict" else LLM_BYPASS_MAX_CHARS * 3
+    if not text:
+        return False, "empty"
+    if len(text) > max_chars:
+        return False, "too_long"
+
+    if level == "strict":
+        if "\n" in text:
+            return False, "multiline"
+        if "?" in text:
+            return False, "question"
+        folded = tr_fold(text)
+        if any(w in folded for w in _HEDGE_FOLDED):
+            return False, "hedging"
+
+    if score_field(field_name, text).score < FIELD_MAX[field_name]:
+        return False, "below_max"
+    return True, "full_marks"
+
+
+def should_bypass_llm(field_name: str, user_text: str, level: Optional[str] = None) -> bool:
+    skip, reason = bypass_decision(field_name, user_text, level=level)
+    _stats.record(field_name, skip, reason)
+    return skip
+
+
+def bypass_stats() -> Dict[str, Any]:
+    """How often the gate skipped the LLM, and why it did not."""
+    return _stats.snapshot()
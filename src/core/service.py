@@ -1,17 +1,70 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Iterator, Optional, List
 
 from .state import create_session as _create_session, load_session, save_session
+from .store import SessionConflictError, close_session_stores, session_store_stats
+from .session_lock import session_lock
+from .llm_gate import bypass_stats
 from .flow import start_or_resume, handle_user_message
-from .brd_generator import BRDGenerator
+from .brd_generator import BRDGenerator, preview_stats as _preview_stats
+from ..llm.client import get_llm_client
+from ..llm.resilience import fallback_stats
 from ..export.exporter_docx import export_docx_file
 from ..export.exporter_txt import export_txt_file
-from ..rag.index import VectorStore
+from ..rag.index import get_vector_store, warm_up as _warm_up_rag, shutdown_vector_stores
+from ..rag.prefetch import get_prefetcher, shutdown_prefetcher
 from ..rag.wiki_ingest import ingest_wiki_from_config
 
 
+def startup() -> None:
+    """
+    Optional server startup hook: preload the embedding model and
+    ChromaDB client so the first RAG-enabled message is not slow.
+    """
+    _warm_up_rag()
+
+
+def shutdown() -> None:
+    """Server shutdown hook: flush cached sessions, release shared resources."""
+    close_session_stores()
+    shutdown_prefetcher()
+    shutdown_vector_stores()
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Session cache hit/miss/eviction counters (empty if cache disabled)."""
+    return session_store_stats()
+
+
+def embedding_stats() -> Dict[str, Any]:
+    """Embedding batching and chunk-embedding cache (hit rate, bytes on disk)."""
+    return get_vector_store().stats()
+
+
+def rag_prefetch_stats() -> Dict[str, Any]:
+    """Speculative next-field retrieval: hits, misses, stale results."""
+    prefetcher = get_prefetcher()
+    return prefetcher.stats() if prefetcher else {}
+
+
+def llm_stats() -> Dict[str, Any]:
+    """LLM call health and cost: retries/timeouts, breaker state, stub fallbacks, token usage, bypass gate."""
+    return {
+        "resilience": get_llm_client().resilience_stats(),
+        "usage": get_llm_client().usage_stats(),
+        "bypass": bypass_stats(),
+        "fallbacks": fallback_stats(),
+    }
+
+
+def preview_stats() -> Dict[str, Any]:
+    """Preview latency and estimated token usage per PREVIEW_MODE."""
+    return _preview_stats()
+
+
 def create_session(data_dir: str = "data/sessions") -> Dict[str, Any]:
     state = _create_session(data_dir=data_dir)
     payload = start_or_resume(state.session_id, data_dir=data_dir)
@@ -38,10 +91,57 @@ def message(
     )
 
 
+def _store_preview_cache(session_id: str, data_dir: str, cache: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Persist regenerated preview sections. Generation runs outside the
+    session lock, so merge into the latest stored state; entries carry
+    their input hash, so a section made stale meanwhile is just a miss.
+    """
+    with session_lock(session_id):
+        for _ in range(2):
+            state = load_session(session_id, data_dir=data_dir)
+            if all(state.preview_cache.get(k) == v for k, v in cache.items()):
+                return
+            state.preview_cache.update(cache)
+            try:
+                save_session(state, data_dir=data_dir)
+                return
+            except SessionConflictError:
+                continue
+
+
 def preview(session_id: str, data_dir: str = "data/sessions") -> Dict[str, Any]:
     state = load_session(session_id, data_dir=data_dir)
     gen = BRDGenerator()
-    sections = gen.generate_preview(state.fields, rag_snippets_by_section=None)
+    cache = dict(state.preview_cache)
+    sections = gen.generate_preview(state.fields, rag_snippets_by_section=None, cache=cache)
+    _store_preview_cache(session_id, data_dir, cache)
+    return {"session_id": session_id, "sections": sections}
+
+
+def stream_preview(session_id: str, data_dir: str = "data/sessions") -> Iterator[Dict[str, Any]]:
+    """
+    Streaming preview: yields {"section", "chunk"} events as text arrives
+    (e.g. to forward as server-sent events).
+    """
+    state = load_session(session_id, data_dir=data_dir)
+    gen = BRDGenerator()
+    cache = dict(state.preview_cache)
+    for section, chunk in gen.stream_preview(state.fields, rag_snippets_by_section=None, cache=cache):
+        yield {"session_id": session_id, "section": section, "chunk": chunk}
+    _store_preview_cache(session_id, data_dir, cache)
+
+
+async def apreview(session_id: str, data_dir: str = "data/sessions") -> Dict[str, Any]:
+    """
+    Async variant of preview() for async servers. Session store and lock
+    I/O run on worker threads, off the event loop.
+    """
+    state = await asyncio.to_thread(load_session, session_id, data_dir=data_dir)
+    gen = BRDGenerator()
+    cache = dict(state.preview_cache)
+    sections = await gen.agenerate_preview(state.fields, rag_snippets_by_section=None, cache=cache)
+    await asyncio.to_thread(_store_preview_cache, session_id, data_dir, cache)
     return {"session_id": session_id, "sections": sections}
 
 
@@ -69,6 +169,8 @@ def add_wiki_documents(
     space_key: Optional[str] = None,
     limit: int = 100,
     data_dir: str = "data/sessions",
+    sync: bool = False,
+    resume: bool = False,
     **wiki_kwargs
 ) -> Dict[str, Any]:
     """
@@ -81,6 +183,9 @@ def add_wiki_documents(
         space_key: Space/key to filter pages (optional)
         limit: Maximum number of pages to fetch
         data_dir: Session data directory
+        sync: Incremental sync of space_key (only changed pages re-embedded,
+            removed pages deleted) instead of a full re-ingest
+        resume: Continue an interrupted ingest into the session's index
         **wiki_kwargs: Confluence client configuration (base_url, username, api_token, etc.)
     
     Returns:
@@ -96,29 +201,42 @@ def add_wiki_documents(
             api_token="token"
         )
     """
-    state = load_session(session_id, data_dir=data_dir)
-    
-    # Create vector store
-    vector_store = VectorStore()
-    
-    # Use existing index or create new one
-    existing_index_id = state.rag_index_id
-    
-    # Ingest wiki pages
-    index_id = ingest_wiki_from_config(
-        wiki_type=wiki_type,
-        vector_store=vector_store,
-        page_ids=page_ids,
-        space_key=space_key,
-        limit=limit,
-        index_id=existing_index_id,
-        **wiki_kwargs
-    )
-    
-    # Update session state
-    state.rag_index_id = index_id
-    save_session(state, data_dir=data_dir)
-    
+    with session_lock(session_id):
+        state = load_session(session_id, data_dir=data_dir)
+
+        # Shared vector store (embedding model loaded once per process)
+        vector_store = get_vector_store()
+
+        # Use existing index or create new one
+        existing_index_id = state.rag_index_id
+
+        # Ingest wiki pages
+        index_id = ingest_wiki_from_config(
+            wiki_type=wiki_type,
+            vector_store=vector_store,
+            page_ids=page_ids,
+            space_key=space_key,
+            limit=limit,
+            index_id=existing_index_id,
+            sync=sync,
+            resume=resume,
+            **wiki_kwargs
+        )
+
+        # Prefetched snippets for this index are outdated now
+        prefetcher = get_prefetcher()
+        if prefetcher is not None:
+            prefetcher.invalidate_index(index_id)
+
+        # Update session state (reload if another worker saved meanwhile)
+        try:
+            state.rag_index_id = index_id
+            save_session(state, data_dir=data_dir)
+        except SessionConflictError:
+            state = load_session(session_id, data_dir=data_dir)
+            state.rag_index_id = index_id
+            save_session(state, data_dir=data_dir)
+
     return {
         "session_id": session_id,
         "index_id": index_id,
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import atexit
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from .session_lock import is_session_locked, session_lock
+from .store import SessionConflictError, SessionStore
+from .types import SessionState
+
+
+def estimate_state_bytes(state: SessionState) -> int:
+    """
+    Cheap size estimate used for memory-based eviction
+    (string payloads + fixed per-object overhead, no serialization).
+    """
+    size = 1024
+    for v in state.fields.values():
+        size += 64 + len(str(v))
+    for k, v in state.answers.items():
+        size += 64 + len(k) + len(v or "")
+    for fu in state.field_updates:
+        size += 256 + len(str(fu.value)) + len(fu.evidence or "")
+    size += len(state.system_summary or "")
+    return size
+
+
+def copy_state(state: SessionState) -> SessionState:
+    """
+    Copy a session's containers one level deep. Nested values (field
+    updates, score and preview entries) are replaced rather than mutated
+    in place, so they can be shared.
+    """
+    return replace(
+        state,
+        fields=dict(state.fields),
+        answers=dict(state.answers),
+        field_updates=list(state.field_updates),
+        uploaded_files=list(state.uploaded_files),
+        scores=dict(state.scores) if state.scores is not None else None,
+        preview_cache=dict(state.preview_cache),
+        last_question_ids=list(state.last_question_ids),
+        pending_ops=list(state.pending_ops),
+    )
+
+
+class CachedSessionStore(SessionStore):
+    """
+    Bounded LRU cache of SessionState objects in front of another store.
+
+    - load(): served from memory when cached (no parse / rehydration);
+      callers get a copy, so a request that fails halfway leaves the
+      cached session untouched
+    - save(): adopts the caller's state and marks the session dirty;
+      dirty sessions are written to the backend by a background flusher
+      every flush_interval seconds, on eviction, and on flush()/close()
+      (write-behind)
+    - flush_interval=0 disables write-behind (every save goes through)
+
+    Intended for a single process owning its sessions; with several
+    workers sharing a backend, keep it off or use write-through
+    (flush_interval=0) so version conflicts reach the caller. A conflict
+    found by the background flusher drops the cached copy; any other
+    flush error keeps the session dirty for the next flush. Both are
+    counted in stats().
+    """
+
+    def __init__(
+        self,
+        backend: SessionStore,
+        max_entries: int = 1000,
+        max_bytes: Optional[int] = None,
+        flush_interval: float = 2.0,
+    ):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+
+        self._entries: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.flush_conflicts = 0
+        self.last_flush_error: Optional[str] = None
+        self._closed = False
+
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if flush_interval > 0:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="session-cache-flusher", daemon=True
+            )
+            self._flusher.start()
+        atexit.register(self.close)
+
+    # ---- SessionStore ----
+    def load(self, session_id: str) -> SessionState:
+        with self._lock:
+            state = self._entries.get(session_id)
+            if state is not None:
+                self._entries.move_to_end(session_id)
+                self.hits += 1
+                return copy_state(state)
+            self.misses += 1
+
+        state = self.backend.load(session_id)
+        with self._lock:
+            # Another thread may have loaded it meanwhile: keep the cached one
+            cached = self._entries.get(session_id)
+            if cached is not None:
+                return copy_state(cached)
+            self._put(state)
+            state = copy_state(state)
+        self._evict()
+        return state
+
+    def save(self, state: SessionState) -> str:
+        if self.flush_interval <= 0:
+            try:
+                location = self.backend.save(state)
+            except SessionConflictError:
+                self._drop(state.session_id)
+                raise
+            with self._lock:
+                self._put(state)
+            self._evict()
+            return location
+
+        with self._lock:
+            self._put(state)
+            self._dirty.add(state.session_id)
+        self._evict()
+        return f"cache#{state.session_id}"
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id in self._entries:
+                return True
+        return self.backend.exists(session_id)
+
+    def iter_session_ids(self) -> Iterator[str]:
+        # Make sure sessions created since the last flush are visible
+        self.flush()
+        return self.backend.iter_session_ids()
+
+    def close(self) -> None:
+        # Called from close_session_stores() and again at exit
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.close)
+        self._stop.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=5)
+        self.flush()
+        self.backend.close()
+
+    # ---- cache management ----
+    def _put(self, state: SessionState) -> None:
+        sid = state.session_id
+        size = estimate_state_bytes(state)
+        self._bytes += size - self._sizes.get(sid, 0)
+        self._sizes[sid] = size
+        self._entries[sid] = state
+        self._entries.move_to_end(sid)
+
+    def _over_limit(self) -> bool:
+        if len(self._entries) > self.max_entries:
+            return True
+        return bool(self.max_bytes) and self._bytes > self.max_bytes and len(self._entries) > 1
+
+    def _evict(self) -> None:
+        to_flush: List[SessionState] = []
+        with self._lock:
+            # Sessions in use by a request are skipped (kept as most recent)
+            busy_skips = len(self._entries)
+            while self._entries and self._over_limit() and busy_skips > 0:
+                sid, state = self._entries.popitem(last=False)
+                if is_session_locked(sid):
+                    self._entries[sid] = state
+                    busy_skips -= 1
+                    continue
+                self._bytes -= self._sizes.pop(sid, 0)
+                self.evictions += 1
+                if sid in self._dirty:
+                    self._dirty.discard(sid)
+                    to_flush.append(state)
+        for state in to_flush:
+            self._flush_one(state)
+
+    def _flush_one(self, state: SessionState) -> None:
+        try:
+            self.backend.save(state)
+            self.flushes += 1
+        except SessionConflictError as e:
+            # Someone else wrote this session: our copy is stale. Only drop
+            # it if it is still the cached one (not a newer save)
+            self.flush_conflicts += 1
+            self.last_flush_error = f"{state.session_id}: {e}"
+            with self._lock:
+                if self._entries.get(state.session_id) is state:
+                    self._drop(state.session_id)
+        except Exception as e:
+            # Keep it dirty (back in the cache if it was being evicted)
+            # so the next flush retries it
+            self.flush_errors += 1
+            self.last_flush_error = f"{state.session_id}: {e}"
+            with self._lock:
+                cached = self._entries.get(state.session_id)
+                if cached is None:
+                    self._put(state)
+                    cached = state
+                if cached is state:
+                    self._dirty.add(state.session_id)
+
+    def flush(self) -> int:
+        """Write all dirty sessions to the backend; returns how many."""
+        with self._lock:
+            dirty = list(self._dirty)
+        flushed = 0
+        for sid in dirty:
+            # Don't write a session while a request is mutating it; pick
+            # the cached object only once we hold the lock, so a save made
+            # by that request is what gets written
+            with session_lock(sid):
+                with self._lock:
+                    if sid not in self._dirty:
+                        continue
+                    self._dirty.discard(sid)
+                    state = self._entries.get(sid)
+                if state is None:
+                    continue
+                self._flush_one(state)
+                flushed += 1
+        return flushed
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _drop(self, session_id: str) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+            self._bytes -= self._sizes.pop(session_id, 0)
+            self._dirty.discard(session_id)
+
+    def invalidate(self, session_id: str) -> None:
+        """Drop a session from memory (flushing it first if dirty)."""
+        with self._lock:
+            state = self._entries.pop(session_id, None)
+            self._bytes -= self._sizes.pop(session_id, 0)
+            dirty = session_id in self._dirty
+            self._dirty.discard(session_id)
+        if state is not None and dirty:
+            self._flush_one(state)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "dirty": len(self._dirty),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "flushes": self.flushes,
+                "flush_errors": self.flush_errors,
+                "flush_conflicts": self.flush_conflicts,
+                "last_flush_error": self.last_flush_error,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
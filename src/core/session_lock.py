@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class _SessionGate:
+    """
+    FIFO (ticket) lock for one session: concurrent requests for the same
+    session run one after another in arrival order. Re-entrant for the
+    owning thread.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        self.next_ticket = 0
+        self.serving = 0
+        self.owner: Optional[int] = None
+        self.depth = 0
+        self.users = 0  # threads holding or waiting (for cleanup)
+
+
+_gates: Dict[str, _SessionGate] = {}
+_gates_lock = threading.Lock()
+
+
+@contextmanager
+def session_lock(session_id: str) -> Iterator[None]:
+    """
+    Serialize in-process work on one session. Different sessions never
+    block each other. Cross-process safety comes from the store's
+    version check (SessionConflictError).
+    """
+    me = threading.get_ident()
+    with _gates_lock:
+        gate = _gates.get(session_id)
+        if gate is None:
+            gate = _gates[session_id] = _SessionGate()
+        gate.users += 1
+
+    try:
+        with gate.cond:
+            if gate.owner == me:
+                gate.depth += 1
+            else:
+                ticket = gate.next_ticket
+                gate.next_ticket += 1
+                while gate.serving != ticket:
+                    gate.cond.wait()
+                gate.owner = me
+                gate.depth = 1
+        try:
+            yield
+        finally:
+            with gate.cond:
+                gate.depth -= 1
+                if gate.depth == 0:
+                    gate.owner = None
+                    gate.serving += 1
+                    gate.cond.notify_all()
+    finally:
+        with _gates_lock:
+            gate.users -= 1
+            if gate.users == 0 and _gates.get(session_id) is gate:
+                del _gates[session_id]
+
+
+def is_session_locked(session_id: str) -> bool:
+    """True if some request currently holds or waits for the session."""
+    with _gates_lock:
+        return session_id in _gates
@@ -0,0 +1,415 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import asdict, fields as dc_fields
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .constants import BRD_FIELDS
+from .types import FieldUpdate, SessionState
+
+try:
+    import fcntl  # POSIX advisory locks
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+DEFAULT_DATA_DIR = "data/sessions"
+
+# -----------------------------
+# Backend selection
+# -----------------------------
+# SESSION_STORE=file    -> FileSessionStore (default, one file per session)
+# SESSION_STORE=sqlite  -> SQLiteSessionStore (WAL, normalized tables)
+SESSION_STORE = os.getenv("SESSION_STORE", "file")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "")
+
+# Optional in-memory LRU cache with write-behind (0 = disabled)
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "0"))
+SESSION_CACHE_MAX_BYTES = int(os.getenv("SESSION_CACHE_MAX_BYTES", "0"))
+SESSION_CACHE_FLUSH_S = float(os.getenv("SESSION_CACHE_FLUSH_S", "2.0"))
+
+# File store mode:
+# SESSION_STORAGE=json     -> one pretty-printed JSON file per session (default)
+# SESSION_STORAGE=journal  -> compact snapshot + append-only journal of
+#                             field/answer records, compacted every N records
+SESSION_STORAGE = os.getenv("SESSION_STORAGE", "json")
+JOURNAL_COMPACT_EVERY = int(os.getenv("SESSION_JOURNAL_COMPACT_EVERY", "50"))
+
+# Keys stored as dedicated records / tables (everything else is "meta")
+NORMALIZED_KEYS = ("fields", "answers", "field_updates")
+BOOKKEEPING_KEYS = ("version", "journal_seq", "snapshot_seq", "pending_ops")
+
+_STATE_KEYS = tuple(f.name for f in dc_fields(SessionState))
+
+
+# -----------------------------
+# Serialization helpers
+# -----------------------------
+def state_to_dict(state: SessionState) -> Dict[str, Any]:
+    # Convert dataclasses -> JSON serializable dict (FieldUpdate included)
+    data = asdict(state)
+    data.pop("pending_ops", None)
+    return data
+
+
+def meta_dict(state: SessionState) -> Dict[str, Any]:
+    """Session attributes that are not stored as dedicated records."""
+    data = state_to_dict(state)
+    for k in NORMALIZED_KEYS + BOOKKEEPING_KEYS:
+        data.pop(k, None)
+    return data
+
+
+def state_from_dict(data: Dict[str, Any]) -> SessionState:
+    # Rehydrate dataclasses; unknown keys (newer/older files) are ignored
+    kwargs = {k: v for k, v in data.items() if k in _STATE_KEYS and k != "pending_ops"}
+    kwargs["fields"] = dict(data.get("fields") or {})
+    kwargs["answers"] = dict(data.get("answers") or {})
+    kwargs["field_updates"] = [FieldUpdate(**fu) for fu in data.get("field_updates") or []]
+    kwargs["snapshot_seq"] = data.get("journal_seq", 0)
+    state = SessionState(**kwargs)
+
+    # Backward compatibility: ensure any missing fields exist
+    for k in BRD_FIELDS:
+        state.fields.setdefault(k, "")
+    return state
+
+
+class SessionConflictError(RuntimeError):
+    """
+    Raised by SessionStore.save when the stored session was modified
+    since it was loaded (state.version is stale). Reload and re-apply.
+    """
+    pass
+
+
+# -----------------------------
+# Store interface
+# -----------------------------
+class SessionStore(ABC):
+    """Abstract base class for session persistence backends"""
+
+    @abstractmethod
+    def load(self, session_id: str) -> SessionState:
+        """Load a session; raises FileNotFoundError if it does not exist"""
+        pass
+
+    @abstractmethod
+    def save(self, state: SessionState) -> str:
+        """
+        Persist a session (compare-and-swap on state.version); returns a
+        backend-specific location. Raises SessionConflictError if another
+        writer saved the session since it was loaded.
+        """
+        pass
+
+    @abstractmethod
+    def exists(self, session_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    def iter_session_ids(self) -> Iterator[str]:
+        """Stream all stored session IDs (no full load)"""
+        pass
+
+    def close(self) -> None:
+        """Release backend resources (connections, handles)"""
+        pass
+
+
+class FileSessionStore(SessionStore):
+    """
+    One JSON file per session under data_dir.
+
+    mode="json":    full pretty-printed rewrite on every save
+    mode="journal": compact snapshot + append-only journal
+
+    The session version lives in <id>.lock; saves hold an exclusive
+    advisory lock (flock) on it while checking and bumping the version
+    and writing the data, loads hold a shared one while reading both.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = DEFAULT_DATA_DIR,
+        mode: Optional[str] = None,
+        compact_every: Optional[int] = None,
+    ):
+        self.data_dir = data_dir
+        self.mode = mode or SESSION_STORAGE
+        self.compact_every = compact_every or JOURNAL_COMPACT_EVERY
+        os.makedirs(data_dir, exist_ok=True)
+
+    def session_path(self, session_id: str) -> str:
+        return os.path.join(self.data_dir, f"{session_id}.json")
+
+    def journal_path(self, session_id: str) -> str:
+        return os.path.join(self.data_dir, f"{session_id}.journal")
+
+    def lock_path(self, session_id: str) -> str:
+        return os.path.join(self.data_dir, f"{session_id}.lock")
+
+    def _lock_fd(self, session_id: str, exclusive: bool) -> Optional[int]:
+        """
+        Open and flock the session's lock file. Saves create it; loads open
+        it read-only and never create it (None if it does not exist yet:
+        nothing has been saved through this store, the version is 0).
+        """
+        path = self.lock_path(session_id)
+        if exclusive:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        else:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                return None
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return fd
+
+    @staticmethod
+    def _fd_version(fd: int) -> int:
+        raw = os.pread(fd, 32, 0).strip()
+        try:
+            return int(raw) if raw else 0
+        except ValueError:
+            return 0
+
+    def exists(self, session_id: str) -> bool:
+        return os.path.exists(self.session_path(session_id))
+
+    def iter_session_ids(self) -> Iterator[str]:
+        with os.scandir(self.data_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    yield entry.name[: -len(".json")]
+
+    # ---- save ----
+    def save(self, state: SessionState) -> str:
+        fd = self._lock_fd(state.session_id, exclusive=True)
+        try:
+            current = self._fd_version(fd)
+            if current != state.version:
+                raise SessionConflictError(
+                    f"Session {state.session_id} changed concurrently "
+                    f"(stored version {current}, loaded version {state.version})"
+                )
+
+            # Bump the version first: if the data write fails, stale
+            # writers still conflict and reload. Loads take the shared
+            # lock, so none of them sees the new version before the data.
+            new_version = str(current + 1).encode()
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, new_version, 0)
+            state.version = current + 1
+            try:
+                return self._save_locked(state)
+            except Exception:
+                state.version = current
+                raise
+        finally:
+            os.close(fd)  # releases the flock
+
+    def _save_locked(self, state: SessionState) -> str:
+        if self.mode != "journal":
+            return self._write_snapshot(state, indent=2)
+
+        path = self.session_path(state.session_id)
+        if not os.path.exists(path):
+            return self._write_snapshot(state, indent=None)
+
+        self._append_journal(state)
+        if state.journal_seq - state.snapshot_seq >= self.compact_every:
+            self._write_snapshot(state, indent=None)
+        return path
+
+    def _write_snapshot(self, state: SessionState, indent: Optional[int]) -> str:
+        path = self.session_path(state.session_id)
+        state.snapshot_seq = state.journal_seq
+        data = state_to_dict(state)
+        if indent is None:
+            content = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        else:
+            content = json.dumps(data, ensure_ascii=False, indent=indent)
+        _write_atomic(path, content)
+
+        # Snapshot now covers every journal record -> drop them.
+        # (If we crash before this, load skips records with seq <= snapshot_seq.)
+        jpath = self.journal_path(state.session_id)
+        if os.path.exists(jpath):
+            if self.mode == "journal":
+                open(jpath, "w").close()
+            else:
+                os.remove(jpath)
+
+        state.pending_ops = []
+        return path
+
+    def _append_journal(self, state: SessionState) -> None:
+        records = list(state.pending_ops)
+        records.append({"op": "meta", "data": meta_dict(state)})
+
+        lines = []
+        for rec in records:
+            state.journal_seq += 1
+            rec = dict(rec, seq=state.journal_seq)
+            lines.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+
+        with open(self.journal_path(state.session_id), "a+b") as f:
+            # Drop a torn record left by a crashed writer before appending
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                f.seek(size - 1)
+                if f.read(1) != b"\n":
+                    f.seek(0)
+                    f.truncate(f.read().rfind(b"\n") + 1)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+        state.pending_ops = []
+
+    # ---- load ----
+    def load(self, session_id: str) -> SessionState:
+        path = self.session_path(session_id)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Session not found: {path}")
+
+        # Shared lock for the whole read: a save holds the exclusive lock
+        # from its version bump until its data is on disk, so the version
+        # we return always matches the data we read.
+        fd = self._lock_fd(session_id, exclusive=False)
+        try:
+            version = self._fd_version(fd) if fd is not None else 0
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            state = state_from_dict(data)
+            # Journal records written after the snapshot (journal mode)
+            self._replay_journal(state)
+        finally:
+            if fd is not None:
+                os.close(fd)  # releases the flock
+        state.version = version
+        return state
+
+    def _replay_journal(self, state: SessionState) -> None:
+        path = self.journal_path(state.session_id)
+        if not os.path.exists(path):
+            return
+
+        with open(path, "rb") as f:
+            for raw in f:
+                try:
+                    if not raw.endswith(b"\n"):
+                        raise ValueError("incomplete record")
+                    rec = json.loads(raw.decode("utf-8"))
+                except ValueError:
+                    # Torn tail (crash or append in progress): ignore it,
+                    # the next locked append truncates it
+                    break
+                seq = int(rec.get("seq", 0))
+                if seq <= state.journal_seq:
+                    continue  # already covered by the snapshot
+                _apply_record(state, rec)
+                state.journal_seq = seq
+
+
+def _write_atomic(path: str, content: str) -> None:
+    """
+    Write to a temp file in the same directory, fsync, then rename over
+    the target so readers never see a half-written file.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _apply_record(state: SessionState, rec: Dict[str, Any]) -> None:
+    op = rec.get("op")
+    if op == "field":
+        fu = FieldUpdate(**rec["fu"])
+        state.fields[fu.field] = fu.value
+        state.field_updates.append(fu)
+    elif op == "answer":
+        state.answers[rec["qid"]] = rec["text"]
+    elif op == "meta":
+        for k, v in rec.get("data", {}).items():
+            if hasattr(state, k):
+                setattr(state, k, v)
+
+
+# -----------------------------
+# Process-wide store registry
+# -----------------------------
+_stores: Dict[Tuple[str, str], SessionStore] = {}
+_stores_lock = threading.Lock()
+
+
+def _create_store(backend: str, data_dir: str) -> SessionStore:
+    if backend == "sqlite":
+        from .store_sqlite import SQLiteSessionStore
+
+        db_path = SESSION_DB_PATH or os.path.join(data_dir, "sessions.db")
+        store: SessionStore = SQLiteSessionStore(db_path)
+    elif backend == "file":
+        store = FileSessionStore(data_dir)
+    else:
+        raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
+
+    if SESSION_CACHE_SIZE > 0:
+        from .session_cache import CachedSessionStore
+
+        store = CachedSessionStore(
+            store,
+            max_entries=SESSION_CACHE_SIZE,
+            max_bytes=SESSION_CACHE_MAX_BYTES or None,
+            flush_interval=SESSION_CACHE_FLUSH_S,
+        )
+    return store
+
+
+def get_session_store(data_dir: str = DEFAULT_DATA_DIR) -> SessionStore:
+    """
+    Return the shared store for data_dir, using the backend selected by
+    SESSION_STORE. Created lazily on first use; thread-safe.
+    """
+    key = (SESSION_STORE, os.path.abspath(data_dir))
+    store = _stores.get(key)
+    if store is not None:
+        return store
+
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _create_store(SESSION_STORE, data_dir)
+            _stores[key] = store
+        return store
+
+
+def session_store_stats() -> Dict[str, Dict[str, Any]]:
+    """Cache counters per shared store (only stores with a cache report)."""
+    with _stores_lock:
+        items = list(_stores.items())
+    out: Dict[str, Dict[str, Any]] = {}
+    for (backend, data_dir), store in items:
+        stats = getattr(store, "stats", None)
+        if stats:
+            out[f"{backend}:{data_dir}"] = stats()
+    return out
+
+
+def close_session_stores() -> None:
+    """Flush, close and forget all shared stores (server shutdown hook)."""
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
@@ -0,0 +1,340 @@
+"""
+SQLite session store (WAL mode).
+
+Normalized tables:
+    sessions       one row per session (version + scalar attributes as JSON "meta")
+    fields         session_id, name -> value
+    answers        session_id, question_id -> text
+    field_updates  session_id, seq -> audit record (append-only)
+
+Saves only upsert the session row / fields / answers and insert the
+field_updates that are not stored yet, so write cost does not grow with
+the audit trail.
+
+Migration from the JSON directory:
+    python -m src.core.store_sqlite --src data/sessions --db data/sessions/sessions.db
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional
+
+from .store import (
+    FileSessionStore,
+    SessionConflictError,
+    SessionStore,
+    meta_dict,
+    state_from_dict,
+)
+from .types import SessionState
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    version    INTEGER NOT NULL DEFAULT 0,
+    meta       TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fields (
+    session_id TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    PRIMARY KEY (session_id, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS answers (
+    session_id  TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    text        TEXT NOT NULL,
+    PRIMARY KEY (session_id, question_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS field_updates (
+    session_id TEXT NOT NULL,
+    seq        INTEGER NOT NULL,
+    ts         TEXT NOT NULL,
+    field      TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    source     TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    evidence   TEXT,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+# Constant SQL strings -> sqlite3's per-connection statement cache keeps
+# them prepared across calls.
+_SQL_SELECT_VERSION = "SELECT version FROM sessions WHERE session_id = ?"
+_SQL_UPSERT_SESSION = (
+    "INSERT INTO sessions (session_id, created_at, version, meta) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(session_id) DO UPDATE SET version = excluded.version, meta = excluded.meta"
+)
+_SQL_UPSERT_FIELD = (
+    "INSERT INTO fields (session_id, name, value) VALUES (?, ?, ?) "
+    "ON CONFLICT(session_id, name) DO UPDATE SET value = excluded.value"
+)
+_SQL_UPSERT_ANSWER = (
+    "INSERT INTO answers (session_id, question_id, text) VALUES (?, ?, ?) "
+    "ON CONFLICT(session_id, question_id) DO UPDATE SET text = excluded.text"
+)
+_SQL_NEXT_UPDATE_SEQ = "SELECT COALESCE(MAX(seq) + 1, 0) FROM field_updates WHERE session_id = ?"
+_SQL_INSERT_UPDATE = (
+    "INSERT INTO field_updates (session_id, seq, ts, field, value, source, confidence, evidence) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_SQL_SELECT_SESSION = "SELECT created_at, version, meta FROM sessions WHERE session_id = ?"
+_SQL_SELECT_FIELDS = "SELECT name, value FROM fields WHERE session_id = ?"
+_SQL_SELECT_ANSWERS = "SELECT question_id, text FROM answers WHERE session_id = ?"
+_SQL_SELECT_UPDATES = (
+    "SELECT ts, field, value, source, confidence, evidence "
+    "FROM field_updates WHERE session_id = ? ORDER BY seq"
+)
+_SQL_EXISTS = "SELECT 1 FROM sessions WHERE session_id = ?"
+_SQL_ALL_IDS = "SELECT session_id FROM sessions"
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite-backed session store.
+    One connection per thread, reused for the lifetime of the store.
+    """
+
+    def __init__(self, db_path: str, busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        parent = os.path.dirname(db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "version" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                isolation_level=None,  # explicit BEGIN/COMMIT below
+                check_same_thread=False,
+                cached_statements=256,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    # ---- write ----
+    def _write(self, conn: sqlite3.Connection, state: SessionState, check_version: bool = True) -> None:
+        sid = state.session_id
+        row = conn.execute(_SQL_SELECT_VERSION, (sid,)).fetchone()
+        current = row[0] if row else 0
+        if check_version and current != state.version:
+            raise SessionConflictError(
+                f"Session {sid} changed concurrently "
+                f"(stored version {current}, loaded version {state.version})"
+            )
+        conn.execute(_SQL_UPSERT_SESSION, (sid, state.created_at, current + 1, _dumps(meta_dict(state))))
+        conn.executemany(
+            _SQL_UPSERT_FIELD,
+            [(sid, k, _dumps(v)) for k, v in state.fields.items()],
+        )
+        if state.answers:
+            conn.executemany(
+                _SQL_UPSERT_ANSWER,
+                [(sid, qid, text) for qid, text in state.answers.items()],
+            )
+
+        # field_updates is append-only: insert only the tail not stored yet
+        next_seq = conn.execute(_SQL_NEXT_UPDATE_SEQ, (sid,)).fetchone()[0]
+        new_updates = state.field_updates[next_seq:]
+        if new_updates:
+            conn.executemany(
+                _SQL_INSERT_UPDATE,
+                [
+                    (sid, next_seq + i, fu.ts, fu.field, _dumps(fu.value),
+                     fu.source, float(fu.confidence), fu.evidence)
+                    for i, fu in enumerate(new_updates)
+                ],
+            )
+        state.pending_ops = []
+        state.version = current + 1
+
+    def save(self, state: SessionState) -> str:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._write(conn, state)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return f"{self.db_path}#{state.session_id}"
+
+    def save_many(self, states: Iterable[SessionState]) -> int:
+        """
+        Persist several sessions in one transaction (bulk import).
+        No version check: imported sessions overwrite stored ones.
+        """
+        conn = self._conn()
+        n = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for state in states:
+                self._write(conn, state, check_version=False)
+                n += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return n
+
+    # ---- read ----
+    def load(self, session_id: str) -> SessionState:
+        conn = self._conn()
+        row = conn.execute(_SQL_SELECT_SESSION, (session_id,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Session not found: {session_id}")
+
+        created_at, version, meta = row
+        data = json.loads(meta)
+        data["session_id"] = session_id
+        data["created_at"] = created_at
+        data["version"] = version
+        data["fields"] = {
+            name: json.loads(value)
+            for name, value in conn.execute(_SQL_SELECT_FIELDS, (session_id,))
+        }
+        data["answers"] = dict(conn.execute(_SQL_SELECT_ANSWERS, (session_id,)).fetchall())
+        data["field_updates"] = [
+            {
+                "ts": ts,
+                "field": field,
+                "value": json.loads(value),
+                "source": source,
+                "confidence": confidence,
+                "evidence": evidence,
+            }
+            for ts, field, value, source, confidence, evidence
+            in conn.execute(_SQL_SELECT_UPDATES, (session_id,))
+        ]
+        return state_from_dict(data)
+
+    def exists(self, session_id: str) -> bool:
+        return self._conn().execute(_SQL_EXISTS, (session_id,)).fetchone() is not None
+
+    def iter_session_ids(self, batch_size: int = 1000) -> Iterator[str]:
+        # Dedicated cursor so callers can load/save while iterating
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cur = conn.execute(_SQL_ALL_IDS)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for (sid,) in rows:
+                    yield sid
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        with self._conns_lock:
+            conns = list(self._conns)
+            self._conns.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+
+# -----------------------------
+# Migration: JSON directory -> SQLite
+# -----------------------------
+def migrate_json_dir(
+    src_dir: str,
+    db_path: str,
+    batch_size: int = 500,
+    skip_existing: bool = True,
+) -> dict:
+    """
+    Stream every session from a FileSessionStore directory into SQLite.
+    Sessions are loaded one at a time and committed in batches, so memory
+    stays bounded regardless of directory size.
+    """
+    src = FileSessionStore(src_dir)
+    dst = SQLiteSessionStore(db_path)
+
+    migrated = skipped = failed = 0
+    batch: List[SessionState] = []
+    t0 = time.perf_counter()
+
+    try:
+        for sid in src.iter_session_ids():
+            if skip_existing and dst.exists(sid):
+                skipped += 1
+                continue
+            try:
+                batch.append(src.load(sid))
+            except Exception as e:
+                print(f"Error loading session {sid}: {e}")
+                failed += 1
+                continue
+
+            if len(batch) >= batch_size:
+                migrated += dst.save_many(batch)
+                batch = []
+                print(f"Migrated {migrated} sessions...")
+
+        if batch:
+            migrated += dst.save_many(batch)
+    finally:
+        dst.close()
+
+    return {
+        "migrated": migrated,
+        "skipped": skipped,
+        "failed": failed,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Migrate JSON session files into SQLite.")
+    parser.add_argument("--src", default="data/sessions", help="JSON session directory")
+    parser.add_argument("--db", default=None, help="SQLite path (default: <src>/sessions.db)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--overwrite", action="store_true", help="Re-import sessions already in the DB")
+    args = parser.parse_args(argv)
+
+    db_path = args.db or os.path.join(args.src, "sessions.db")
+    result = migrate_json_dir(
+        args.src,
+        db_path,
+        batch_size=args.batch_size,
+        skip_existing=not args.overwrite,
+    )
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
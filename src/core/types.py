@@ -42,6 +42,20 @@ class SessionState:
     # Latest scoring snapshot (store as dict to avoid tight coupling)
     scores: Optional[Dict[str, Any]] = None
 
+    # Generated preview per section: {section: {"key": input hash, "text": ...}}
+    # A section is regenerated only when its key no longer matches.
+    preview_cache: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
     # Optional: current step tracking
     current_field: Optional[FieldName] = None
     last_question_ids: List[str] = field(default_factory=list)
+
+    # Optimistic concurrency: number of successful saves; a save only
+    # succeeds if the stored version still equals this value.
+    version: int = 0
+
+    # Storage bookkeeping (journal mode): last journal record applied /
+    # covered by the snapshot. pending_ops is in-memory only.
+    journal_seq: int = 0
+    snapshot_seq: int = 0
+    pending_ops: List[Dict[str, Any]] = field(default_factory=list, repr=False, compare=False)
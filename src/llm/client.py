@@ -1,9 +1,130 @@
 from __future__ import annotations
 
+import asyncio
+import glob
 import os
-from typing import Any, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from string import Formatter
+from typing import Any, Awaitable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple, TypeVar
 
-from .json_parser import parse_json_strict
+from .context_builder import estimate_tokens
+from .json_parser import JSONParseError, parse_json_strict
+from .resilience import ResiliencePolicy, get_resilience_policy
+from .response_cache import ResponseCache, cache_key
+
+
+# Package-relative, so the working directory does not matter
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+# LLM_PROMPTS_HOT_RELOAD=1 -> re-read a template when its file mtime changes (dev)
+PROMPTS_HOT_RELOAD = os.getenv("LLM_PROMPTS_HOT_RELOAD", "0") == "1"
+
+# Persistent response cache in front of _call_model (LLM_CACHE=0 disables)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/llm_cache.db")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+
+# Max concurrent model calls per client (the default client is shared, so
+# per process), sync and async API alike
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+# LLM_FAKE=1 -> get_llm_client() returns the fake streaming model (dev / demos)
+LLM_FAKE = os.getenv("LLM_FAKE", "0") == "1"
+
+T = TypeVar("T")
+
+# Async callers wait for a model-call slot here, one at a time (FIFO). Not
+# on a pool that runs model calls: waiters must not hold up slot holders.
+_slot_waiter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-slot-wait")
+
+# prompt name -> variables its callers pass, declared at import time with
+# declare_prompt_variables(); checked whenever a client parses the template
+_prompt_variables: Dict[str, FrozenSet[str]] = {}
+
+# Totals of the innermost usage_scope() (None outside one)
+_usage_scope: "ContextVar[Optional[Dict[str, int]]]" = ContextVar("llm_usage_scope", default=None)
+
+
+@contextmanager
+def usage_scope() -> Iterator[Dict[str, int]]:
+    """
+    Collect the token usage recorded by LLMClient.record_usage inside the
+    block, including asyncio tasks started in it (they inherit the scope).
+    Yields {"calls", "cached", "input_tokens", "output_tokens"}.
+    """
+    totals = {"calls": 0, "cached": 0, "input_tokens": 0, "output_tokens": 0}
+    token = _usage_scope.set(totals)
+    try:
+        yield totals
+    finally:
+        _usage_scope.reset(token)
+
+
+class PromptTemplateError(ValueError):
+    pass
+
+
+class PromptTemplate:
+    """
+    A prompt file parsed once into literal / variable parts.
+    Same syntax as str.format ({name}, {{ and }} for literal braces).
+    """
+
+    _formatter = Formatter()
+
+    def __init__(self, name: str, text: str, mtime: float = 0.0):
+        self.name = name
+        self.text = text
+        self.mtime = mtime
+        self.parts: List[Tuple[str, Optional[str], str, Optional[str]]] = []
+        names = set()
+        try:
+            parsed = list(self._formatter.parse(text))
+        except ValueError as e:
+            raise PromptTemplateError(f"Invalid prompt template {name}: {e}")
+        for literal, field, spec, conversion in parsed:
+            if field is not None:
+                if not field.isidentifier():
+                    raise PromptTemplateError(
+                        f"Prompt template {name}: unsupported placeholder {{{field}}}"
+                    )
+                names.add(field)
+            self.parts.append((literal, field, spec or "", conversion))
+        self.variables: FrozenSet[str] = frozenset(names)
+
+    @classmethod
+    def from_file(cls, path: str) -> "PromptTemplate":
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        return cls(os.path.basename(path), text, os.path.getmtime(path))
+
+    def missing(self, variables: Iterable[str]) -> FrozenSet[str]:
+        return self.variables.difference(variables)
+
+    def check_variables(self, variables: Iterable[str]) -> None:
+        missing = self.missing(variables)
+        if missing:
+            raise PromptTemplateError(
+                f"Prompt {self.name} is missing variables: {', '.join(sorted(missing))}"
+            )
+
+    def render(self, variables: Dict[str, Any]) -> str:
+        self.check_variables(variables)
+        out = []
+        for literal, field, spec, conversion in self.parts:
+            out.append(literal)
+            if field is None:
+                continue
+            value = variables[field]
+            if conversion:
+                value = self._formatter.convert_field(value, conversion)
+            out.append(format(value, spec) if spec else str(value))
+        return "".join(out)
 
 
 class LLMClient:
@@ -12,38 +133,303 @@ class LLMClient:
     Wire this to your existing AI infrastructure (OpenAI/Azure/local/etc.).
     """
 
-    def __init__(self, prompts_dir: str = "src/llm/prompts"):
-        self.prompts_dir = prompts_dir
+    def __init__(
+        self,
+        prompts_dir: Optional[str] = None,
+        hot_reload: Optional[bool] = None,
+        cache: Optional[ResponseCache] = None,
+        use_cache: Optional[bool] = None,
+        max_concurrency: Optional[int] = None,
+        resilience: Optional[ResiliencePolicy] = None,
+    ):
+        # Timeouts / retries / circuit breaker (shared process-wide by default)
+        self.resilience = resilience or get_resilience_policy()
+        self.max_concurrency = max_concurrency or LLM_MAX_CONCURRENCY
+        # A thread semaphore, not an asyncio one: run_sync starts an event
+        # loop per call, so a loop-bound limit would cap nothing
+        self._model_slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.prompts_dir = os.path.abspath(prompts_dir or PROMPTS_DIR)
+        self.hot_reload = PROMPTS_HOT_RELOAD if hot_reload is None else hot_reload
+        self.use_cache = LLM_CACHE_ENABLED if use_cache is None else use_cache
+        self._cache = cache
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._templates_lock = threading.Lock()
+        self._usage: Dict[str, Dict[str, int]] = {}
+        self._usage_lock = threading.Lock()
+
+        # Parse every template once; syntax errors and variables the
+        # callers don't pass surface at startup
+        for path in sorted(glob.glob(os.path.join(self.prompts_dir, "*.txt"))):
+            tmpl = PromptTemplate.from_file(path)
+            self._templates[tmpl.name] = tmpl
+        self.check_prompt_variables()
+
+    def get_template(self, name: str) -> PromptTemplate:
+        tmpl = self._templates.get(name)
+        if tmpl is not None and not self.hot_reload:
+            return tmpl
 
-    def _load_prompt(self, name: str) -> str:
         path = os.path.join(self.prompts_dir, name)
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
+        if tmpl is not None:
+            try:
+                if os.path.getmtime(path) == tmpl.mtime:
+                    return tmpl
+            except OSError:
+                return tmpl  # file removed while running: keep last version
+
+        # New template file, or changed on disk (hot reload)
+        with self._templates_lock:
+            tmpl = PromptTemplate.from_file(path)
+            if name in _prompt_variables:
+                tmpl.check_variables(_prompt_variables[name])
+            self._templates[name] = tmpl
+        return tmpl
+
+    def check_prompt_variables(self) -> None:
+        """Raise PromptTemplateError if a parsed template needs a variable its callers don't pass."""
+        for name, variables in _prompt_variables.items():
+            tmpl = self._templates.get(name)
+            if tmpl is not None:
+                tmpl.check_variables(variables)
+
+    def render_prompt(self, prompt_name: str, variables: Dict[str, Any]) -> str:
+        """Render a template; raises PromptTemplateError listing all missing variables."""
+        return self.get_template(prompt_name).render(variables)
+
+    def _load_prompt(self, name: str) -> str:
+        return self.get_template(name).text
+
+    # ---- Response cache ----
+    @property
+    def cache(self) -> Optional[ResponseCache]:
+        if not self.use_cache:
+            return None
+        if self._cache is None:
+            self._cache = get_response_cache()
+        return self._cache
+
+    # ---- Token usage ----
+    def record_usage(
+        self,
+        prompt_name: str,
+        prompt: str,
+        output: Optional[str],
+        cached: bool = False,
+    ) -> None:
+        """
+        Count input/output tokens per template (estimated with
+        context_builder.estimate_tokens), and in the active usage_scope().
+        Cache hits cost no tokens.
+        """
+        scope = _usage_scope.get()
+        input_tokens = 0 if cached else estimate_tokens(prompt)
+        output_tokens = 0 if cached else estimate_tokens(output or "")
+        with self._usage_lock:
+            u = self._usage.setdefault(prompt_name, {
+                "calls": 0, "cached": 0, "input_tokens": 0, "output_tokens": 0,
+            })
+            for totals in (u, scope) if scope is not None else (u,):
+                if cached:
+                    totals["cached"] += 1
+                    continue
+                totals["calls"] += 1
+                totals["input_tokens"] += input_tokens
+                totals["output_tokens"] += output_tokens
+
+    def usage_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._usage_lock:
+            out = {}
+            for name, u in self._usage.items():
+                out[name] = dict(u)
+                if u["calls"]:
+                    out[name]["avg_input_tokens"] = round(u["input_tokens"] / u["calls"], 1)
+                    out[name]["avg_output_tokens"] = round(u["output_tokens"] / u["calls"], 1)
+            return out
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        return self.resilience.stats()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        cache = self.cache
+        return cache.stats() if cache else {}
+
+    def _complete(
+        self,
+        prompt_name: str,
+        prompt: str,
+        max_output_tokens: int,
+        use_cache: bool = True,
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Model call behind the response cache.
+        Returns (raw text, cache key or None if the cache was bypassed).
+        """
+        cache = self.cache if use_cache else None
+        if cache is None:
+            with self._model_slots:
+                raw = self.resilience.call(self._call_model, prompt, max_output_tokens)
+            self.record_usage(prompt_name, prompt, raw)
+            return raw, None
+
+        key = cache_key(prompt_name, prompt, max_output_tokens)
+        raw = cache.get(prompt_name, key)
+        if raw is None:
+            with self._model_slots:
+                raw = self.resilience.call(self._call_model, prompt, max_output_tokens)
+            self.record_usage(prompt_name, prompt, raw)
+            cache.put(prompt_name, key, raw)
+        else:
+            self.record_usage(prompt_name, prompt, raw, cached=True)
+        return raw, key
 
     def run_json(
         self,
         prompt_name: str,
         variables: Dict[str, Any],
         max_output_tokens: int = 500,
+        use_cache: bool = True,
     ) -> Dict[str, Any]:
         """
         Returns a dict parsed from model output (strict JSON expected).
+        use_cache=False bypasses the response cache for this call.
         """
-        prompt_tmpl = self._load_prompt(prompt_name)
-        prompt = prompt_tmpl.format(**variables)
+        prompt = self.render_prompt(prompt_name, variables)
 
-        raw = self._call_model(prompt, max_output_tokens=max_output_tokens)
-        return parse_json_strict(raw)
+        raw, key = self._complete(prompt_name, prompt, max_output_tokens, use_cache=use_cache)
+        try:
+            return parse_json_strict(raw)
+        except JSONParseError:
+            # Never keep serving an unparseable response from cache
+            if key is not None:
+                self.cache.delete(key)
+            raise
 
     def run_text(
         self,
         prompt_name: str,
         variables: Dict[str, Any],
         max_output_tokens: int = 1200,
+        use_cache: bool = True,
     ) -> str:
-        prompt_tmpl = self._load_prompt(prompt_name)
-        prompt = prompt_tmpl.format(**variables)
-        return self._call_model(prompt, max_output_tokens=max_output_tokens)
+        prompt = self.render_prompt(prompt_name, variables)
+        raw, _ = self._complete(prompt_name, prompt, max_output_tokens, use_cache=use_cache)
+        return raw
+
+    def stream_text(
+        self,
+        prompt_name: str,
+        variables: Dict[str, Any],
+        max_output_tokens: int = 1200,
+        use_cache: bool = True,
+    ) -> Iterator[str]:
+        """
+        Yields text chunks as the model produces them.
+        A cached response is yielded as a single chunk; a completed stream
+        is written to the cache (an abandoned one is not).
+        """
+        prompt = self.render_prompt(prompt_name, variables)
+        cache = self.cache if use_cache else None
+        key = None
+        if cache is not None:
+            key = cache_key(prompt_name, prompt, max_output_tokens)
+            raw = cache.get(prompt_name, key)
+            if raw is not None:
+                self.record_usage(prompt_name, prompt, raw, cached=True)
+                yield raw
+                return
+
+        chunks: List[str] = []
+        try:
+            for chunk in self.resilience.stream(self._stream_model, prompt, max_output_tokens):
+                if chunk:
+                    chunks.append(chunk)
+                    yield chunk
+        finally:
+            # Abandoned streams still spent the tokens generated so far
+            self.record_usage(prompt_name, prompt, "".join(chunks))
+
+        if cache is not None:
+            cache.put(prompt_name, key, "".join(chunks))
+
+    # ---- Async API ----
+    @asynccontextmanager
+    async def _model_slot(self):
+        """Hold one of the max_concurrency model-call slots (shared with the sync API)."""
+        if not self._model_slots.acquire(blocking=False):
+            waiter = _slot_waiter.submit(self._model_slots.acquire)
+            try:
+                await asyncio.wrap_future(waiter)
+            except asyncio.CancelledError:
+                # Cancelled while waiting: hand the slot back if the waiter
+                # still gets it
+                waiter.add_done_callback(lambda f: f.cancelled() or self._model_slots.release())
+                raise
+        try:
+            yield
+        finally:
+            self._model_slots.release()
+
+    async def _acomplete(
+        self,
+        prompt_name: str,
+        prompt: str,
+        max_output_tokens: int,
+        use_cache: bool = True,
+    ) -> Tuple[str, Optional[str]]:
+        cache = self.cache if use_cache else None
+        key = None
+        if cache is not None:
+            key = cache_key(prompt_name, prompt, max_output_tokens)
+            raw = cache.get(prompt_name, key)
+            if raw is not None:
+                self.record_usage(prompt_name, prompt, raw, cached=True)
+                return raw, key
+
+        async with self._model_slot():
+            raw = await self.resilience.acall(self._acall_model, prompt, max_output_tokens)
+        self.record_usage(prompt_name, prompt, raw)
+
+        if cache is not None:
+            cache.put(prompt_name, key, raw)
+        return raw, key
+
+    async def arun_json(
+        self,
+        prompt_name: str,
+        variables: Dict[str, Any],
+        max_output_tokens: int = 500,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        prompt = self.render_prompt(prompt_name, variables)
+        raw, key = await self._acomplete(prompt_name, prompt, max_output_tokens, use_cache=use_cache)
+        try:
+            return parse_json_strict(raw)
+        except JSONParseError:
+            if key is not None:
+                self.cache.delete(key)
+            raise
+
+    async def arun_text(
+        self,
+        prompt_name: str,
+        variables: Dict[str, Any],
+        max_output_tokens: int = 1200,
+        use_cache: bool = True,
+    ) -> str:
+        prompt = self.render_prompt(prompt_name, variables)
+        raw, _ = await self._acomplete(prompt_name, prompt, max_output_tokens, use_cache=use_cache)
+        return raw
+
+    async def _acall_model(self, prompt: str, max_output_tokens: int) -> str:
+        """
+        Async model call. Default runs the blocking _call_model on the
+        resilience policy's pool; override with a native async client if
+        your stack has one.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.resilience.executor(), self._call_model, prompt, max_output_tokens
+        )
 
     # ---- Implement this with your AI stack ----
     def _call_model(self, prompt: str, max_output_tokens: int) -> str:
@@ -54,3 +440,75 @@ class LLMClient:
         raise NotImplementedError(
             "Wire _call_model() to your existing AI infrastructure."
         )
+
+    def _stream_model(self, prompt: str, max_output_tokens: int) -> Iterator[str]:
+        """
+        Streaming model call: yield text chunks as they arrive.
+        Default yields the whole _call_model() response at once; override
+        with your stack's streaming API to get real time-to-first-token.
+        """
+        yield self._call_model(prompt, max_output_tokens=max_output_tokens)
+
+
+_default_client: Optional[LLMClient] = None
+_default_client_lock = threading.Lock()
+
+
+def declare_prompt_variables(prompt_name: str, variables: Iterable[str]) -> None:
+    """
+    Declare (at import time) the variables a caller passes to prompt_name.
+    Every client checks them against its templates when it parses them,
+    so a template / caller mismatch fails at startup, not on a request.
+    """
+    names = frozenset(variables)
+    declared = _prompt_variables.get(prompt_name)
+    # Each caller's set must cover the template: checking their intersection is enough
+    _prompt_variables[prompt_name] = names if declared is None else declared & names
+    if _default_client is not None:
+        _default_client.check_prompt_variables()
+
+
+def get_llm_client() -> LLMClient:
+    """Process-wide LLMClient (templates parsed once, shared by all callers)."""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                if LLM_FAKE:
+                    from .fake import FakeStreamingLLMClient
+
+                    _default_client = FakeStreamingLLMClient()
+                else:
+                    _default_client = LLMClient()
+    return _default_client
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache configured from LLM_CACHE_* env vars."""
+    global _response_cache
+    if _response_cache is None:
+        with _default_client_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    LLM_CACHE_PATH,
+                    max_entries=LLM_CACHE_MAX_ENTRIES,
+                    max_bytes=LLM_CACHE_MAX_BYTES,
+                    ttl_seconds=LLM_CACHE_TTL_S or None,
+                )
+    return _response_cache
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """
+    Run a coroutine from synchronous code. Uses asyncio.run, or a helper
+    thread if the caller is already inside a running event loop.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        return ex.submit(asyncio.run, coro).result()
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import math
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 
 FIELD_DESCRIPTIONS: Dict[str, str] = {
@@ -26,30 +28,185 @@ RELATED_FIELDS: Dict[str, List[str]] = {
     "Traffic Forecast": ["Traffic Forecast", "Impacted Channels", "Impacted Journey"],
 }
 
-def build_fields_context(fields: Dict[str, Any], current_field: str, max_chars: int = 1200) -> str:
-    keys = RELATED_FIELDS.get(current_field, list(fields.keys()))
+# Max prompt size (tokens) per template; the fixed template text and the
+# user's answer are always sent, variable context gets what is left
+PROMPT_TOKEN_BUDGETS: Dict[str, int] = {
+    "normalize_answer.txt": 1200,
+    "generate_section.txt": 1500,
+    "generate_preview.txt": 3500,
+}
+DEFAULT_PROMPT_TOKEN_BUDGET = 1500
+
+# How the remaining budget is split when both parts want more than their share
+CONTEXT_WEIGHTS: Dict[str, float] = {"fields": 2.0, "snippets": 1.0}
+
+
+# -----------------------------
+# Token estimation / truncation
+# -----------------------------
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?…;])\s+|\n+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate model tokens without a tokenizer: ~4 chars per token for
+    words (long Turkish words split into several), 1 per punctuation mark.
+    """
+    if not text:
+        return 0
+    return sum(math.ceil(len(t) / 4) for t in _TOKEN_RE.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: Optional[int]) -> str:
+    """
+    Cut text to max_tokens at a sentence boundary; falls back to a word
+    boundary (with "…") if even the first sentence does not fit.
+    """
+    if max_tokens is None or estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    kept: List[str] = []
+    used = 0
+    for sentence in _SENTENCE_SPLIT.split(text):
+        n = estimate_tokens(sentence)
+        if used + n > max_tokens:
+            break
+        kept.append(sentence)
+        used += n
+    if kept:
+        return " ".join(kept)
+
+    words: List[str] = []
+    used = 1  # the ellipsis
+    for word in text.split():
+        n = estimate_tokens(word)
+        if used + n > max_tokens:
+            break
+        words.append(word)
+        used += n
+    return " ".join(words) + "…" if words else ""
+
+
+def allocate_budget(total: int, demands: Dict[str, int], weights: Dict[str, float]) -> Dict[str, int]:
+    """
+    Split total tokens between parts by weight. Parts that need less than
+    their share get exactly what they need; the rest is redistributed.
+    """
+    alloc = {k: 0 for k in demands}
+    active = {k for k, d in demands.items() if d > 0}
+    remaining = max(0, total)
+    while active and remaining > 0:
+        weight_sum = sum(weights.get(k, 1.0) for k in active)
+        satisfied = set()
+        for k in active:
+            share = remaining * weights.get(k, 1.0) / weight_sum
+            if demands[k] - alloc[k] <= share:
+                satisfied.add(k)
+        if not satisfied:
+            for k in active:
+                alloc[k] += int(remaining * weights.get(k, 1.0) / weight_sum)
+            break
+        for k in satisfied:
+            remaining -= demands[k] - alloc[k]
+            alloc[k] = demands[k]
+        active -= satisfied
+    return alloc
+
+
+def prompt_budget(template_name: str) -> int:
+    return PROMPT_TOKEN_BUDGETS.get(template_name, DEFAULT_PROMPT_TOKEN_BUDGET)
+
+
+def fit_lines(lines: List[str], max_tokens: Optional[int], ranked: bool = True) -> str:
+    """
+    Fit lines into max_tokens. ranked=True: earlier lines have priority
+    (larger share when over budget); otherwise lines share equally.
+    """
+    lines = [l for l in lines if l]
+    if max_tokens is None:
+        return "\n".join(lines)
+    demands = {i: estimate_tokens(l) for i, l in enumerate(lines)}
+    weights = {i: (1.0 / (i + 1) if ranked else 1.0) for i in demands}
+    # Each line break costs about a token
+    alloc = allocate_budget(max_tokens - len(lines), demands, weights)
+    out = [truncate_to_tokens(l, alloc[i]) for i, l in enumerate(lines)]
+    return "\n".join(l for l in out if l)
+
+
+def format_field_lines(fields: Dict[str, Any], keys: List[str], include_empty: bool = False) -> List[str]:
     lines = []
     for k in keys:
         v = fields.get(k, "")
         if isinstance(v, list):
             v_str = ", ".join([str(x) for x in v])
         else:
-            v_str = str(v)
+            v_str = str(v or "")
         v_str = v_str.strip()
         if not v_str:
+            if include_empty:
+                lines.append(f"- {k}: (empty)")
             continue
         lines.append(f"- {k}: {v_str}")
+    return lines
+
+
+def build_fields_context(fields: Dict[str, Any], current_field: str, max_tokens: Optional[int] = 300) -> str:
+    keys = RELATED_FIELDS.get(current_field, list(fields.keys()))
+    # RELATED_FIELDS lists the current field first: it keeps the largest share
+    return fit_lines(format_field_lines(fields, keys), max_tokens, ranked=True)
 
-    text = "\n".join(lines)
-    return text[:max_chars]
 
-def build_rag_snippets(snippets: Optional[List[str]], max_snippets: int = 3, max_chars_each: int = 700) -> str:
+def build_rag_snippets(
+    snippets: Optional[List[str]],
+    max_snippets: int = 3,
+    max_tokens: Optional[int] = 525,
+) -> str:
     if not snippets:
         return ""
-    clipped = [s.strip()[:max_chars_each] for s in snippets[:max_snippets] if s and s.strip()]
-    if not clipped:
+    cleaned = [s.strip() for s in snippets[:max_snippets] if s and s.strip()]
+    if not cleaned:
         return ""
-    return "\n\n".join([f"[Snippet {i+1}] {c}" for i, c in enumerate(clipped)])
+    labelled = [f"[Snippet {i+1}] {c}" for i, c in enumerate(cleaned)]
+    if max_tokens is None:
+        return "\n\n".join(labelled)
+    # Best-ranked snippet first; each is cut at a sentence boundary
+    demands = {i: estimate_tokens(t) for i, t in enumerate(labelled)}
+    weights = {i: 1.0 / (i + 1) for i in demands}
+    alloc = allocate_budget(max_tokens - 2 * len(labelled), demands, weights)
+    out = [truncate_to_tokens(t, alloc[i]) for i, t in enumerate(labelled)]
+    return "\n\n".join(t for t in out if t)
+
+
+def budget_context(
+    template_name: str,
+    fixed_texts: Iterable[str],
+    field_lines: List[str],
+    snippets: Optional[List[str]],
+    max_snippets: int = 3,
+    rank_fields: bool = True,
+    max_prompt_tokens: Optional[int] = None,
+) -> Tuple[str, str]:
+    """
+    Fit field lines and RAG snippets into what the template's prompt budget
+    leaves after its fixed text (template + always-sent values).
+    Returns (fields_text, snippets_text).
+    """
+    budget = max_prompt_tokens or prompt_budget(template_name)
+    available = budget - sum(estimate_tokens(t) for t in fixed_texts)
+    full_fields = fit_lines(field_lines, None)
+    full_snippets = build_rag_snippets(snippets, max_snippets=max_snippets, max_tokens=None)
+    alloc = allocate_budget(
+        available,
+        {"fields": estimate_tokens(full_fields), "snippets": estimate_tokens(full_snippets)},
+        CONTEXT_WEIGHTS,
+    )
+    return (
+        fit_lines(field_lines, alloc["fields"], ranked=rank_fields),
+        build_rag_snippets(snippets, max_snippets=max_snippets, max_tokens=alloc["snippets"]),
+    )
 
 def field_desc(field_name: str) -> str:
     return FIELD_DESCRIPTIONS.get(field_name, "")
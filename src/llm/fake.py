@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import os
+import re
+import time
+from typing import Any, Callable, Iterator, Optional, Union
+
+from .client import LLMClient
+
+
+# Delays for the fake model (seconds)
+LLM_FAKE_FIRST_TOKEN_DELAY_S = float(os.getenv("LLM_FAKE_FIRST_TOKEN_DELAY_S", "0.5"))
+LLM_FAKE_TOKEN_DELAY_S = float(os.getenv("LLM_FAKE_TOKEN_DELAY_S", "0.02"))
+
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+
+def _default_response(prompt: str) -> str:
+    m = re.search(r"SECTION_NAME:\s*\n?(.+)", prompt)
+    name = m.group(1).strip() if m else "Response"
+    return (
+        f"{name}: this is placeholder text produced by the fake model. "
+        "It stands in for a real completion so that streaming, caching and "
+        "latency can be exercised without an LLM backend."
+    )
+
+
+class FakeStreamingLLMClient(LLMClient):
+    """
+    Stand-in model for tests and demos: emits a scripted response word by
+    word, waiting first_token_delay before the first token and token_delay
+    between tokens.
+
+    response may be a fixed string or a callable(prompt) -> str.
+    Default: a short placeholder naming the requested section.
+    """
+
+    def __init__(
+        self,
+        response: Optional[Union[str, Callable[[str], str]]] = None,
+        first_token_delay: Optional[float] = None,
+        token_delay: Optional[float] = None,
+        **kwargs: Any,
+    ):
+        kwargs.setdefault("use_cache", False)
+        super().__init__(**kwargs)
+        self.response = response
+        self.first_token_delay = (
+            LLM_FAKE_FIRST_TOKEN_DELAY_S if first_token_delay is None else first_token_delay
+        )
+        self.token_delay = LLM_FAKE_TOKEN_DELAY_S if token_delay is None else token_delay
+        self.calls = 0
+
+    def _response_for(self, prompt: str) -> str:
+        if self.response is None:
+            return _default_response(prompt)
+        if callable(self.response):
+            return self.response(prompt)
+        return self.response
+
+    def _call_model(self, prompt: str, max_output_tokens: int) -> str:
+        return "".join(self._stream_model(prompt, max_output_tokens))
+
+    def _stream_model(self, prompt: str, max_output_tokens: int) -> Iterator[str]:
+        self.calls += 1
+        text = self._response_for(prompt)
+        # Roughly one token per word; stop at the output budget like a real model
+        tokens = _TOKEN_RE.findall(text)[:max_output_tokens]
+        time.sleep(self.first_token_delay)
+        for i, tok in enumerate(tokens):
+            if i:
+                time.sleep(self.token_delay)
+            yield tok
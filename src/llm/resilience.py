@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+
+# Per-attempt timeout and total budget for one logical model call (seconds)
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "20"))
+LLM_DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "45"))
+
+# Retries for transient errors, with full-jitter exponential backoff
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BACKOFF_S = float(os.getenv("LLM_RETRY_BACKOFF_S", "0.5"))
+LLM_RETRY_BACKOFF_MAX_S = float(os.getenv("LLM_RETRY_BACKOFF_MAX_S", "4"))
+
+# Circuit breaker: open after N consecutive failures, probe again after reset_s
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_S = float(os.getenv("LLM_BREAKER_RESET_S", "30"))
+
+# Threads that run blocking _call_model implementations (sync and async API)
+LLM_CALL_THREADS = int(os.getenv("LLM_CALL_THREADS", "16"))
+
+TRANSIENT_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+T = TypeVar("T")
+
+_EXHAUSTED = object()
+
+
+class LLMTimeoutError(TimeoutError):
+    pass
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the model while the circuit breaker is open."""
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Timeouts, connection errors and retryable HTTP statuses."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "status", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status in TRANSIENT_STATUS
+
+
+class CircuitBreaker:
+    """
+    closed -> open after failure_threshold consecutive failures
+    open -> half_open after reset_timeout seconds (one probe call allowed)
+    half_open -> closed on success, open again on failure; a probe that
+                 ends without a verdict (cancelled, abandoned, non-transient
+                 error) is released so the next call probes instead
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = "half_open"
+            self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == "closed":
+                return True
+            if self._state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self.opened += 1
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        with self._lock:
+            if self._state == "half_open":
+                self._probe_in_flight = False
+
+    def reset(self) -> None:
+        self.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class ResiliencePolicy:
+    """
+    Timeout + jittered retries + circuit breaker around model calls.
+
+    - each attempt gets min(timeout, remaining deadline); a blocking call
+      that times out is abandoned (its thread finishes in the background)
+    - only transient errors are retried and count towards the breaker (a
+      400 or a bug says nothing about the service's health)
+    - while the breaker is open, calls fail fast with CircuitOpenError
+    - streams must produce their first chunk within the attempt timeout
+    """
+
+    def __init__(
+        self,
+        timeout: float = LLM_TIMEOUT_S,
+        deadline: float = LLM_DEADLINE_S,
+        retries: int = LLM_RETRIES,
+        backoff: float = LLM_RETRY_BACKOFF_S,
+        backoff_max: float = LLM_RETRY_BACKOFF_MAX_S,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_S)
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._counts: Dict[str, int] = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "short_circuited": 0,
+        }
+
+    # ---- bookkeeping ----
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[key] += n
+
+    def _sleep_for(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+
+    def _attempt_timeout(self, started: float) -> Optional[float]:
+        remaining = self.deadline - (time.monotonic() - started) if self.deadline > 0 else None
+        if self.timeout > 0 and (remaining is None or self.timeout < remaining):
+            return self.timeout
+        return remaining
+
+    def _admit(self) -> None:
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+    def _failed(self, exc: BaseException, attempt: int, started: float) -> Optional[float]:
+        """Record a failed attempt; returns the backoff to wait, or None to give up."""
+        transient = is_transient(exc)
+        if transient:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_probe()
+        if isinstance(exc, TimeoutError):
+            self._count("timeouts")
+        if attempt >= self.retries or not transient:
+            return None
+        delay = self._sleep_for(attempt)
+        if self.deadline > 0 and time.monotonic() - started + delay >= self.deadline:
+            return None
+        if not self.breaker.allow():
+            return None
+        self._count("retries")
+        return delay
+
+    def executor(self) -> ThreadPoolExecutor:
+        """
+        Pool that runs blocking model calls. Timed-out calls are abandoned
+        here, never on an event loop's default executor (asyncio.run would
+        wait for them on shutdown).
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=LLM_CALL_THREADS, thread_name_prefix="llm-call"
+                )
+            return self._executor
+
+    # ---- call wrappers ----
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        self._admit()
+        try:
+            return self._call(fn, *args, **kwargs)
+        finally:
+            # No-op once a verdict was recorded; frees the half-open probe
+            # slot if the call was interrupted (KeyboardInterrupt, ...)
+            self.breaker.release_probe()
+
+    def _call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout(started)
+            try:
+                if timeout is None:
+                    result = fn(*args, **kwargs)
+                else:
+                    fut = self.executor().submit(fn, *args, **kwargs)
+                    try:
+                        result = fut.result(timeout=max(timeout, 0.0))
+                    except FutureTimeoutError:
+                        fut.cancel()
+                        raise LLMTimeoutError(f"LLM call timed out after {timeout:.1f}s")
+            except Exception as e:
+                delay = self._failed(e, attempt, started)
+                if delay is None:
+                    self._count("failures")
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            self._count("successes")
+            return result
+
+    async def acall(self, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        self._admit()
+        try:
+            return await self._acall(fn, *args, **kwargs)
+        finally:
+            self.breaker.release_probe()  # e.g. the calling task was cancelled
+
+    async def _acall(self, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout(started)
+            try:
+                try:
+                    result = await asyncio.wait_for(fn(*args, **kwargs), timeout)
+                except asyncio.TimeoutError:
+                    raise LLMTimeoutError(f"LLM call timed out after {timeout:.1f}s")
+            except Exception as e:
+                delay = self._failed(e, attempt, started)
+                if delay is None:
+                    self._count("failures")
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            self._count("successes")
+            return result
+
+    def stream(self, fn: Callable[..., Iterator[str]], *args: Any, **kwargs: Any) -> Iterator[str]:
+        """
+        Streaming variant: the first chunk must arrive within the attempt
+        timeout, and failures are retried only until it does (chunks
+        already yielded cannot be taken back). Later chunks have no timeout.
+        """
+        self._admit()
+        try:
+            yield from self._stream(fn, *args, **kwargs)
+        finally:
+            self.breaker.release_probe()  # e.g. the caller stopped reading
+
+    def _stream(self, fn: Callable[..., Iterator[str]], *args: Any, **kwargs: Any) -> Iterator[str]:
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            yielded = False
+            try:
+                it = iter(fn(*args, **kwargs))
+                chunk = self._first_chunk(it, self._attempt_timeout(started))
+                while chunk is not _EXHAUSTED:
+                    yielded = True
+                    yield chunk
+                    chunk = next(it, _EXHAUSTED)
+            except Exception as e:
+                delay = self._failed(e, self.retries if yielded else attempt, started)
+                if delay is None:
+                    self._count("failures")
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            self._count("successes")
+            return
+
+    def _first_chunk(self, it: Iterator[str], timeout: Optional[float]) -> Any:
+        if timeout is None:
+            return next(it, _EXHAUSTED)
+        fut = self.executor().submit(next, it, _EXHAUSTED)
+        try:
+            return fut.result(timeout=max(timeout, 0.0))
+        except FutureTimeoutError:
+            # Abandoned: close the stream once the pending next() returns
+            fut.cancel()
+            fut.add_done_callback(lambda _: _close_quietly(it))
+            raise LLMTimeoutError(f"LLM stream produced no output within {timeout:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        counts["breaker"] = self.breaker.stats()
+        return counts
+
+
+def _close_quietly(it: Iterator[str]) -> None:
+    close = getattr(it, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
+
+
+_default_policy: Optional[ResiliencePolicy] = None
+_default_policy_lock = threading.Lock()
+
+_fallbacks: Dict[str, Dict[str, int]] = {}
+_fallbacks_lock = threading.Lock()
+
+
+def get_resilience_policy() -> ResiliencePolicy:
+    """Process-wide policy: one circuit breaker shared by all sessions."""
+    global _default_policy
+    if _default_policy is None:
+        with _default_policy_lock:
+            if _default_policy is None:
+                _default_policy = ResiliencePolicy()
+    return _default_policy
+
+
+def record_fallback(operation: str, reason: str) -> None:
+    """Count a stub fallback, e.g. ("normalize_answer", "circuit_open")."""
+    with _fallbacks_lock:
+        per_op = _fallbacks.setdefault(operation, {})
+        per_op[reason] = per_op.get(reason, 0) + 1
+
+
+def fallback_stats() -> Dict[str, Dict[str, int]]:
+    with _fallbacks_lock:
+        return {op: dict(reasons) for op, reasons in _fallbacks.items()}
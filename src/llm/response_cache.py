@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    prompt_name TEXT NOT NULL,
+    response    TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    created     REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+"""
+
+
+def cache_key(prompt_name: str, prompt: str, max_output_tokens: int) -> str:
+    h = hashlib.sha256()
+    for part in (prompt_name, str(max_output_tokens), prompt):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """
+    Disk-backed (SQLite) cache of raw model responses.
+
+    - key: sha256(template name, max tokens, rendered prompt)
+    - LRU eviction by entry count and total response bytes
+    - entries older than ttl_seconds are treated as misses and purged
+    - hit / miss counters per prompt template
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 20000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+        self.evictions = 0
+
+    def get(self, prompt_name: str, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._misses[prompt_name] = self._misses.get(prompt_name, 0) + 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._hits[prompt_name] = self._hits.get(prompt_name, 0) + 1
+            return row[0]
+
+    def put(self, prompt_name: str, key: str, response: str) -> None:
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, prompt_name, response, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, prompt_name, response, size, now, now),
+            )
+            self._evict_locked()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def _evict_locked(self) -> None:
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        # Drop least recently used rows until both limits hold
+        excess_rows = max(0, count - self.max_entries)
+        excess_bytes = max(0, total - self.max_bytes)
+        victims = []
+        freed = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access"
+        ):
+            if len(victims) >= excess_rows and freed >= excess_bytes:
+                break
+            victims.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            per_prompt = {}
+            for name in sorted(set(self._hits) | set(self._misses)):
+                hits = self._hits.get(name, 0)
+                misses = self._misses.get(name, 0)
+                per_prompt[name] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                }
+        return {
+            "entries": count,
+            "bytes": total,
+            "evictions": self.evictions,
+            "per_prompt": per_prompt,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,188 @@
+"""
+CHUNKER COMPARISON
+
+Chunks a labelled knowledge-base page (CONFLUENCE_READY_TEMPLATE.md: one
+top-level section per wizard field) with the old character chunker (on
+whitespace-collapsed text, as the old Confluence extraction produced) and
+the structure-aware chunker, embeds both, and runs every FIELD_TO_QUERY
+query against each index.
+
+Reported per chunker:
+  index size   chunks, embedded tokens (estimate_tokens)
+  ingest time  chunking + embedding
+  usage        share of a retrieved chunk that reaches the LLM
+               (retrieve_snippets clips hits to 700 chars)
+  quality      precision@k / hit@1 of the clipped snippets: a snippet
+               counts if most of its word 4-grams come from the queried
+               field's section
+
+The default embedder is a lexical hashing model (no downloads, results
+are deterministic); --model uses a real SentenceTransformer.
+
+Usage:
+    PYTHONPATH=. python -m src.rag.bench_chunking
+    PYTHONPATH=. python -m src.rag.bench_chunking --model \\
+        sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import math
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from ..llm.context_builder import estimate_tokens
+from .field_queries import FIELD_TO_QUERY
+from .ingest import RAG_CHUNK_OVERLAP_TOKENS, RAG_CHUNK_TOKENS, chunk_document, chunk_text
+
+_WORD_RE = re.compile(r"\w+")
+_SNIPPET_CHARS = 700  # retrieve_snippets' max_chars_each
+
+
+class HashingEmbedder:
+    """Bag of words hashed into `dim` buckets, L2-normalized."""
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False, **kwargs: Any) -> List[List[float]]:
+        out = []
+        for text in texts:
+            vec = [0.0] * self.dim
+            for word in _WORD_RE.findall(text.lower()):
+                vec[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dim] += 1.0
+            norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+            out.append([v / norm for v in vec])
+        return out
+
+
+def _shingles(text: str, n: int = 4) -> set:
+    words = _WORD_RE.findall(text.lower())
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _field_sections(text: str) -> Dict[str, set]:
+    """Word 4-grams of each field's top-level section ("# 3. Target Customer Group (...)")."""
+    sections: Dict[str, set] = {}
+    current: Optional[str] = None
+    buf: List[str] = []
+    for line in text.splitlines() + ["# end"]:
+        if line.startswith("# "):
+            if current:
+                sections[current] = _shingles("\n".join(buf))
+            current = next((f for f in FIELD_TO_QUERY if f in line), None)
+            buf = []
+        elif current:
+            buf.append(line)
+    return sections
+
+
+def _label(snippet: str, sections: Dict[str, set]) -> Optional[str]:
+    grams = _shingles(snippet)
+    scores = {field: len(grams & owned) for field, owned in sections.items()}
+    best = max(scores, key=scores.get)
+    return best if scores[best] else None
+
+
+def _strip_heading_line(chunk: str) -> str:
+    # Structured chunks start with their heading path; label on the body so
+    # heading words don't favour them
+    return chunk.split("\n", 1)[1] if "\n" in chunk else chunk
+
+
+def _evaluate(
+    name: str,
+    chunks: List[str],
+    label_texts: List[str],
+    chunk_s: float,
+    embedder: Any,
+    sections: Dict[str, set],
+    top_k: int,
+) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    vectors = embedder.encode(chunks, show_progress_bar=False)
+    vectors = vectors.tolist() if hasattr(vectors, "tolist") else vectors
+    embed_s = time.perf_counter() - t0
+
+    precision, hit1 = [], []
+    used = []
+    for field, query in FIELD_TO_QUERY.items():
+        q = embedder.encode([query], show_progress_bar=False)
+        q = (q.tolist() if hasattr(q, "tolist") else q)[0]
+        scores = [sum(a * b for a, b in zip(q, v)) for v in vectors]
+        ranked = sorted(range(len(chunks)), key=lambda i: -scores[i])[:top_k]
+        labels = [_label(label_texts[i][:_SNIPPET_CHARS], sections) for i in ranked]
+        precision.append(sum(1 for lab in labels if lab == field) / top_k)
+        hit1.append(1.0 if labels and labels[0] == field else 0.0)
+        used.extend(min(1.0, _SNIPPET_CHARS / max(1, len(chunks[i]))) for i in ranked)
+
+    tokens = [estimate_tokens(c) for c in chunks]
+    return {
+        "chunker": name,
+        "chunks": len(chunks),
+        "embedded_tokens": sum(tokens),
+        "avg_chunk_tokens": round(sum(tokens) / len(tokens), 1),
+        "chunk_ms": round(1000 * chunk_s, 1),
+        "embed_ms": round(1000 * embed_s, 1),
+        "used_share": round(sum(used) / len(used), 3),
+        f"precision@{top_k}": round(sum(precision) / len(precision), 3),
+        "hit@1": round(sum(hit1) / len(hit1), 3),
+    }
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare the character and structure-aware chunkers.")
+    parser.add_argument("--doc", default="CONFLUENCE_READY_TEMPLATE.md")
+    parser.add_argument("--model", default=None, help="SentenceTransformer name (default: lexical hashing)")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--max-chars", type=int, default=3500, help="old chunker size")
+    parser.add_argument("--target-tokens", type=int, default=RAG_CHUNK_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=RAG_CHUNK_OVERLAP_TOKENS)
+    args = parser.parse_args(argv)
+
+    with open(args.doc, "r", encoding="utf-8") as f:
+        text = f.read()
+    sections = _field_sections(text)
+
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+
+        embedder = SentenceTransformer(args.model)
+        print(f"model: {args.model}")
+    else:
+        embedder = HashingEmbedder()
+        print("model: lexical hashing (bag of words)")
+
+    # Old path: Confluence text with all whitespace collapsed, fixed slices
+    t0 = time.perf_counter()
+    old_chunks = chunk_text(re.sub(r"\s+", " ", text).strip(), max_chars=args.max_chars)
+    old_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    new_chunks = [
+        c.text for c in chunk_document(
+            text, title="BRD Knowledge Base",
+            target_tokens=args.target_tokens, overlap_tokens=args.overlap_tokens,
+        )
+    ]
+    new_s = time.perf_counter() - t0
+
+    rows = [
+        _evaluate(f"chars:{args.max_chars}", old_chunks, old_chunks, old_s, embedder, sections, args.top_k),
+        _evaluate(
+            f"structured:{args.target_tokens}:{args.overlap_tokens}",
+            new_chunks, [_strip_heading_line(c) for c in new_chunks], new_s, embedder, sections, args.top_k,
+        ),
+    ]
+    cols = list(rows[0])
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in cols]
+    print("  ".join(c.rjust(w) for c, w in zip(cols, widths)))
+    for r in rows:
+        print("  ".join(str(r[c]).rjust(w) for c, w in zip(cols, widths)))
+
+
+if __name__ == "__main__":
+    main()
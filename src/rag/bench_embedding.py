@@ -0,0 +1,111 @@
+"""
+EMBEDDING MICRO-BATCHING BENCHMARK
+
+N client threads each embed single query strings (like concurrent wizard
+turns). Compares calling the model directly with going through
+EmbeddingService, and reports throughput and latency per concurrency level.
+
+--model uses a real SentenceTransformer; the default synthetic model costs
+a fixed per-call overhead plus a per-text cost and runs one call at a time
+(like a model saturating the same cores), which is the shape that makes
+batching pay off.
+
+Usage:
+    PYTHONPATH=. python -m src.rag.bench_embedding
+    PYTHONPATH=. python -m src.rag.bench_embedding --model \\
+        sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2 --requests 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from .embedding_service import EmbeddingService
+from .field_queries import FIELD_TO_QUERY
+
+
+class SyntheticEmbedder:
+    """call_ms per encode() call + text_ms per text, serialized."""
+
+    def __init__(self, call_ms: float = 8.0, text_ms: float = 0.4, dim: int = 384):
+        self.call_s = call_ms / 1000.0
+        self.text_s = text_ms / 1000.0
+        self.dim = dim
+        self._lock = threading.Lock()
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False, **kwargs: Any) -> List[List[float]]:
+        with self._lock:
+            time.sleep(self.call_s + self.text_s * len(texts))
+        return [[float(len(t) % 7)] * self.dim for t in texts]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def _run(encode_one: Callable[[str], Any], concurrency: int, requests: int) -> Dict[str, float]:
+    queries = list(FIELD_TO_QUERY.values())
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def client(i: int) -> None:
+        for j in range(requests // concurrency):
+            q = queries[(i + j) % len(queries)] + f" #{i}-{j}"
+            t0 = time.perf_counter()
+            encode_one(q)
+            dt = time.perf_counter() - t0
+            with lock:
+                latencies.append(dt)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    wall = time.perf_counter() - t0
+    return {
+        "req_per_s": len(latencies) / wall,
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p95_ms": 1000 * _percentile(latencies, 95),
+    }
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark embedding micro-batching.")
+    parser.add_argument("--model", default=None, help="SentenceTransformer name (default: synthetic)")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+
+        embedder = SentenceTransformer(args.model)
+        embedder.encode(["warm up"], show_progress_bar=False)
+        print(f"model: {args.model}")
+    else:
+        embedder = SyntheticEmbedder()
+        print("model: synthetic (8 ms/call + 0.4 ms/text, serialized)")
+
+    service = EmbeddingService(embedder, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    print(f"{'clients':>7} {'mode':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            direct = _run(lambda q: embedder.encode([q], show_progress_bar=False), concurrency, args.requests)
+            batched = _run(lambda q: service.encode([q]), concurrency, args.requests)
+            for mode, r in (("direct", direct), ("batched", batched)):
+                print(f"{concurrency:>7} {mode:>8} {r['req_per_s']:>9.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}")
+        print(service.stats())
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
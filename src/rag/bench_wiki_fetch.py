@@ -0,0 +1,210 @@
+"""
+CONFLUENCE FETCH BENCHMARK
+
+Starts a local stub Confluence (REST search + content endpoints) and
+fetches a whole space with ConfluenceClient, sequentially (old path:
+bodies expanded in the search results, one page of results at a time)
+and concurrently (ID listing without bodies, then bodies downloaded in
+parallel ID batches).
+
+The stub models the server cost of a request as base_ms plus body_ms per
+page body rendered, caps body-expanded search pages at 25 (like
+Confluence Cloud), and answers 429 + Retry-After once more than
+--server-max-concurrency requests are in flight. --error-rate injects
+random 503s.
+
+Usage:
+    PYTHONPATH=. python -m src.rag.bench_wiki_fetch
+    PYTHONPATH=. python -m src.rag.bench_wiki_fetch --pages 500 --workers 1,4,8,16 \\
+        --server-max-concurrency 6 --error-rate 0.02
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from .wiki_client import ConfluenceClient
+
+_BODY_SEARCH_CAP = 25
+
+
+class StubConfluence:
+    def __init__(
+        self,
+        pages: int,
+        base_ms: float,
+        body_ms: float,
+        max_concurrency: int,
+        retry_after: str,
+        error_rate: float,
+    ):
+        self.pages = [
+            {
+                "id": str(100000 + i),
+                "title": f"Page {i}",
+                "version": {"number": 1 + i % 3},
+                "body": {"storage": {"value": f"<p>{'Lorem ipsum dolor sit amet. ' * 80}</p>"}},
+            }
+            for i in range(pages)
+        ]
+        self.by_id = {p["id"]: p for p in self.pages}
+        self.base_s = base_ms / 1000.0
+        self.body_s = body_ms / 1000.0
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.requests = self.throttled = self.errors = 0
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _respond(self, path: str, query: Dict[str, List[str]]) -> Tuple[float, Dict[str, Any]]:
+        """(server cost in seconds, JSON body)"""
+        expand = query.get("expand", [""])[0]
+        with_body = "body" in expand
+
+        def render(page: Dict[str, Any]) -> Dict[str, Any]:
+            out = {k: v for k, v in page.items() if k != "body"}
+            if with_body:
+                out["body"] = page["body"]
+            return out
+
+        m = re.match(r"^/rest/api/content/(\d+)$", path)
+        if m:
+            page = self.by_id.get(m.group(1))
+            return self.base_s + self.body_s, render(page) if page else {}
+
+        # Search: "id in (...)" or the whole space
+        m = re.search(r"id in \(([^)]*)\)", query.get("cql", [""])[0])
+        matches = [self.by_id[i] for i in m.group(1).split(",") if i in self.by_id] if m else self.pages
+        start = int(query.get("start", ["0"])[0])
+        limit = int(query.get("limit", ["25"])[0])
+        if with_body:
+            limit = min(limit, _BODY_SEARCH_CAP)
+        results = [render(p) for p in matches[start:start + limit]]
+        links = {"next": "/rest/api/content/search?next"} if start + limit < len(matches) else {}
+        cost = self.base_s + (self.body_s * len(results) if with_body else 0.0)
+        return cost, {"results": results, "start": start, "limit": limit, "size": len(results), "_links": links}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so pooling matters
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _send(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                with stub._lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    over = stub.in_flight > stub.max_concurrency
+                    if over:
+                        stub.throttled += 1
+                try:
+                    if over:
+                        self._send(429, {"message": "Rate limited"}, {"Retry-After": stub.retry_after})
+                        return
+                    if stub.error_rate and random.random() < stub.error_rate:
+                        with stub._lock:
+                            stub.errors += 1
+                        self._send(503, {"message": "Service unavailable"})
+                        return
+                    url = urlparse(self.path)
+                    cost, payload = stub._respond(url.path, parse_qs(url.query))
+                    time.sleep(cost)
+                    self._send(200, payload)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+        return Handler
+
+
+def _bench(stub: StubConfluence, workers: int, pages: int) -> Dict[str, Any]:
+    client = ConfluenceClient(stub.url, username="bench", api_token="bench", max_workers=workers)
+    stub.reset_counters()
+    t0 = time.perf_counter()
+    fetched = client.fetch_pages(space_key="BENCH", limit=pages)
+    wall = time.perf_counter() - t0
+    assert len(fetched) == pages and all("body" in p for p in fetched), "incomplete fetch"
+    limiter = client.limiter.stats()
+    client.session.close()
+    return {
+        "seconds": wall,
+        "pages_per_s": pages / wall,
+        "requests": stub.requests,
+        "http_429": stub.throttled,
+        "http_5xx": stub.errors,
+        "min_limit": limiter["min_limit_seen"],
+    }
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Confluence page fetching against a stub server.")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", default="1,4,8,16", help="1 = sequential (old path)")
+    parser.add_argument("--base-ms", type=float, default=40.0, help="server cost per request")
+    parser.add_argument("--body-ms", type=float, default=15.0, help="server cost per page body rendered")
+    parser.add_argument("--server-max-concurrency", type=int, default=8, help="429 above this many in-flight requests")
+    parser.add_argument("--retry-after", default="1", help="Retry-After header value sent with 429s")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args(argv)
+
+    stub = StubConfluence(
+        args.pages, args.base_ms, args.body_ms, args.server_max_concurrency, args.retry_after, args.error_rate
+    )
+    print(
+        f"stub: {args.pages} pages, {args.base_ms:g} ms/request + {args.body_ms:g} ms/body, "
+        f"429 above {args.server_max_concurrency} in flight, {args.error_rate:.0%} 503s"
+    )
+    print(f"{'workers':>7} {'seconds':>8} {'pages/s':>8} {'speedup':>8} {'reqs':>6} {'429':>5} {'5xx':>5} {'min lim':>7}")
+    try:
+        baseline = None
+        for workers in [int(w) for w in args.workers.split(",")]:
+            r = _bench(stub, workers, args.pages)
+            baseline = baseline or r["seconds"]
+            print(
+                f"{workers:>7} {r['seconds']:>8.2f} {r['pages_per_s']:>8.1f} {baseline / r['seconds']:>7.1f}x "
+                f"{r['requests']:>6} {r['http_429']:>5} {r['http_5xx']:>5} {r['min_limit']:>7}"
+            )
+    finally:
+        stub.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import fcntl  # POSIX advisory locks
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+# Persistent chunk embedding cache (RAG_EMBED_CACHE=0 disables)
+RAG_EMBED_CACHE_ENABLED = os.getenv("RAG_EMBED_CACHE", "1") == "1"
+
+_INDEX_RECORD = struct.Struct("<32sQ")  # sha256 digest, slot
+
+
+def _model_dir_name(model_name: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", model_name).strip("_")[:60]
+    return f"{slug}_{hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:8]}"
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Chunk embeddings keyed by (model name, sha256 of chunk text).
+
+    Layout (one directory per model):
+      meta.json     {"model": ..., "dim": N}
+      vectors.f32   float32 vectors, one fixed-size slot each (memory-mapped)
+      index.bin     append-only (sha256, slot) records -> in-memory dict
+
+    Both files are append-only: a vector is written before its index
+    record, so a crash leaves at most an unreferenced slot or a torn
+    trailing record (ignored on load). Appends take an flock, and each
+    writer first picks up records appended by other processes.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str):
+        self.model_name = model_name
+        self.dir = os.path.join(cache_dir, _model_dir_name(model_name))
+        os.makedirs(self.dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.index_path = os.path.join(self.dir, "index.bin")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.lock_path = os.path.join(self.dir, "cache.lock")
+
+        self.dim: Optional[int] = None
+        self._slots: Dict[bytes, int] = {}
+        self._index_pos = 0
+        self._mm: Optional[mmap.mmap] = None
+        self._mm_size = 0
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        self._load_meta()
+        with self._lock:
+            self._read_index()
+
+    # ---- storage ----
+    def _load_meta(self) -> None:
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+        if meta.get("model") == self.model_name:
+            self.dim = int(meta["dim"])
+
+    def _write_meta(self, dim: int) -> None:
+        tmp = f"{self.meta_path}.tmp{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "dim": dim}, f)
+        os.replace(tmp, self.meta_path)
+        self.dim = dim
+
+    @property
+    def _slot_bytes(self) -> int:
+        return 4 * (self.dim or 0)
+
+    def _read_index(self) -> None:
+        """Read index records appended since the last call (by anyone)."""
+        try:
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_pos)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        usable = len(data) - len(data) % _INDEX_RECORD.size  # drop a torn tail
+        for off in range(0, usable, _INDEX_RECORD.size):
+            digest, slot = _INDEX_RECORD.unpack_from(data, off)
+            self._slots[digest] = slot
+        self._index_pos += usable
+
+    def _mapped(self, end: int) -> Optional[mmap.mmap]:
+        """Read-only map of vectors.f32 covering at least `end` bytes."""
+        if self._mm is not None and self._mm_size >= end:
+            return self._mm
+        try:
+            size = os.path.getsize(self.vectors_path)
+        except OSError:
+            return None
+        if size < end or size == 0:
+            return None
+        if self._mm is not None:
+            self._mm.close()
+        with open(self.vectors_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        self._mm_size = size
+        return self._mm
+
+    def _read_vector(self, slot: int) -> Optional[List[float]]:
+        start = slot * self._slot_bytes
+        mm = self._mapped(start + self._slot_bytes)
+        if mm is None:
+            return None
+        return list(struct.unpack_from(f"<{self.dim}f", mm, start))
+
+    # ---- public API ----
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached vector per text, None for misses."""
+        out: List[Optional[List[float]]] = []
+        with self._lock:
+            if self.dim is None:
+                self._load_meta()
+            if any(text_digest(t) not in self._slots for t in texts):
+                self._read_index()  # other processes may have added them
+            for t in texts:
+                slot = self._slots.get(text_digest(t))
+                vec = self._read_vector(slot) if slot is not None and self.dim else None
+                if vec is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                out.append(vec)
+        return out
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        if not texts:
+            return
+        with self._lock:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                self._load_meta()
+                self._read_index()
+                if self.dim is None:
+                    self._write_meta(len(vectors[0]))
+
+                new = []
+                seen = set()
+                for t, v in zip(texts, vectors):
+                    d = text_digest(t)
+                    if d in self._slots or d in seen:
+                        continue
+                    if len(v) != self.dim:
+                        raise ValueError(f"Embedding dim {len(v)} != cache dim {self.dim}")
+                    seen.add(d)
+                    new.append((d, v))
+                if not new:
+                    return
+
+                with open(self.vectors_path, "ab") as f:
+                    first_slot = f.seek(0, os.SEEK_END) // self._slot_bytes
+                    # Re-align after a torn vector write
+                    f.truncate(first_slot * self._slot_bytes)
+                    f.seek(first_slot * self._slot_bytes)
+                    f.write(b"".join(struct.pack(f"<{self.dim}f", *v) for _, v in new))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                records = b"".join(
+                    _INDEX_RECORD.pack(d, first_slot + i) for i, (d, _) in enumerate(new)
+                )
+                with open(self.index_path, "ab") as f:
+                    size = f.seek(0, os.SEEK_END)
+                    if size % _INDEX_RECORD.size:
+                        f.truncate(size - size % _INDEX_RECORD.size)
+                    f.write(records)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._read_index()
+                self.writes += len(new)
+            finally:
+                os.close(fd)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            disk = 0
+            for path in (self.vectors_path, self.index_path, self.meta_path):
+                try:
+                    disk += os.path.getsize(path)
+                except OSError:
+                    pass
+            return {
+                "model": self.model_name,
+                "entries": len(self._slots),
+                "dim": self.dim,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "writes": self.writes,
+                "bytes_on_disk": disk,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+                self._mm_size = 0
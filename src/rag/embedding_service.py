@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Micro-batching of encode calls (RAG_EMBED_MAX_BATCH=1 effectively disables)
+RAG_EMBED_MAX_BATCH = int(os.getenv("RAG_EMBED_MAX_BATCH", "64"))
+RAG_EMBED_MAX_WAIT_MS = float(os.getenv("RAG_EMBED_MAX_WAIT_MS", "5"))
+
+_STOP = object()
+
+
+class EmbeddingService:
+    """
+    Collects encode requests from many threads / coroutines and runs them
+    through the model as one batch.
+
+    A batch is closed when it holds max_batch texts or max_wait_ms after
+    its first request arrived, whichever comes first. Requests queued while
+    the model is busy join the next batch; a lone request on an idle
+    service is encoded immediately. A single request larger than
+    max_batch runs alone (the model batches it internally).
+
+    submit() returns a Future per request; encode() / aencode() wait on it.
+    """
+
+    def __init__(
+        self,
+        embedder: Any,
+        max_batch: int = RAG_EMBED_MAX_BATCH,
+        max_wait_ms: float = RAG_EMBED_MAX_WAIT_MS,
+    ):
+        self.embedder = embedder
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._carry: Optional[Tuple[List[str], Future, float]] = None
+        self._closed = False
+        # submit() checks _closed and enqueues under this lock, so nothing
+        # is queued behind the _STOP that close() puts
+        self._submit_lock = threading.Lock()
+        self._last_batch_requests = 0
+
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self.queue_wait_s = 0.0
+        self.encode_s = 0.0
+
+        self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+        self._worker.start()
+
+    # ---- public API ----
+    def submit(self, texts: List[str]) -> "Future[List[List[float]]]":
+        fut: "Future[List[List[float]]]" = Future()
+        if not texts:
+            fut.set_result([])
+            return fut
+        with self._submit_lock:
+            if not self._closed:
+                self._queue.put((list(texts), fut, time.perf_counter()))
+                return fut
+        fut.set_exception(RuntimeError("EmbeddingService is closed"))
+        return fut
+
+    def encode(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        return self.submit(texts).result(timeout=timeout)
+
+    async def aencode(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def close(self) -> None:
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        if self._worker is not threading.current_thread():
+            self._worker.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "texts": self.texts,
+                "avg_batch_texts": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "avg_queue_wait_ms": round(1000 * self.queue_wait_s / self.requests, 3) if self.requests else 0.0,
+                "avg_encode_ms": round(1000 * self.encode_s / self.batches, 3) if self.batches else 0.0,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+    # ---- worker ----
+    def _next(self, timeout: Optional[float]) -> Any:
+        if self._carry is not None:
+            item, self._carry = self._carry, None
+            return item
+        if timeout is None:
+            return self._queue.get()
+        if timeout <= 0:
+            return self._queue.get_nowait()
+        return self._queue.get(timeout=timeout)
+
+    def _collect(self, first: Tuple[List[str], Future, float]) -> Tuple[List[Tuple[List[str], Future, float]], bool]:
+        batch = [first]
+        size = len(first[0])
+        # Lone request on an idle service: don't make it wait for company.
+        # Under load, requests queue up during the previous encode anyway.
+        wait = self.max_wait
+        if self._last_batch_requests <= 1 and self._queue.empty():
+            wait = 0.0
+        deadline = time.perf_counter() + wait
+        while size < self.max_batch:
+            try:
+                item = self._next(deadline - time.perf_counter())
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            if size + len(item[0]) > self.max_batch:
+                self._carry = item  # starts the next batch
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch, False
+
+    def _run(self) -> None:
+        try:
+            stop = False
+            while not stop:
+                first = self._next(None)
+                if first is _STOP:
+                    break
+                batch, stop = self._collect(first)
+                self._encode_batch(batch)
+        finally:
+            # Fail anything still queued when the worker exits (close(), or
+            # an unexpected error), so no encode() waits forever
+            with self._submit_lock:
+                self._closed = True
+            while True:
+                try:
+                    item = self._next(0)
+                except queue.Empty:
+                    break
+                if item is not _STOP and item[1].set_running_or_notify_cancel():
+                    item[1].set_exception(RuntimeError("EmbeddingService is closed"))
+
+    def _encode_batch(self, batch: List[Tuple[List[str], Future, float]]) -> None:
+        self._last_batch_requests = len(batch)
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [t for item in batch for t in item[0]]
+        started = time.perf_counter()
+        try:
+            vectors = self.embedder.encode(texts, show_progress_bar=False)
+            vectors = vectors.tolist() if hasattr(vectors, "tolist") else [list(v) for v in vectors]
+        except BaseException as e:
+            for _, fut, _ in batch:
+                fut.set_exception(e)
+            return
+        finished = time.perf_counter()
+
+        pos = 0
+        for item_texts, fut, _ in batch:
+            fut.set_result(vectors[pos:pos + len(item_texts)])
+            pos += len(item_texts)
+
+        with self._lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.texts += len(texts)
+            self.queue_wait_s += sum(started - enqueued for _, _, enqueued in batch)
+            self.encode_s += finished - started
@@ -1,11 +1,25 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+import json
 import os
+import threading
+import uuid
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 
+from .embedding_cache import RAG_EMBED_CACHE_ENABLED, EmbeddingCache
+from .embedding_service import EmbeddingService
+from .field_queries import FIELD_TO_QUERY
+
+
+DEFAULT_INDEX_DIR = "data/indexes"
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# Hits kept per field in the precomputed field tables (>= retrieval top_k)
+FIELD_TABLE_TOP_K = int(os.getenv("RAG_FIELD_TABLE_TOP_K", "5"))
+
 
 @dataclass
 class RAGIndex:
@@ -21,8 +35,9 @@ class VectorStore:
     """
     ChromaDB-based vector store implementation.
     """
-    def __init__(self, base_dir: str = "data/indexes", embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"):
+    def __init__(self, base_dir: str = DEFAULT_INDEX_DIR, embedding_model: str = DEFAULT_EMBEDDING_MODEL):
         self.base_dir = base_dir
+        self.embedding_model = embedding_model
         os.makedirs(base_dir, exist_ok=True)
         
         # Initialize ChromaDB client
@@ -39,6 +54,21 @@ class VectorStore:
             print("Falling back to stub mode. Install sentence-transformers for full functionality.")
             self.embedder = None
 
+        # Encode calls from concurrent requests are micro-batched
+        self.embedding_service = EmbeddingService(self.embedder) if self.embedder else None
+
+        # Chunk embeddings by content hash: unchanged chunks are never re-encoded
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        if self.embedder and RAG_EMBED_CACHE_ENABLED:
+            self.embedding_cache = EmbeddingCache(os.path.join(base_dir, "embedding_cache"), embedding_model)
+
+        # Query text -> embedding (field queries are a small fixed set)
+        self._query_embeddings: Dict[str, List[float]] = {}
+        # index_id -> (mtime, field table) ; per-index refresh locks
+        self._field_tables: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._table_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
     def create_index(self, index_id: str) -> RAGIndex:
         """Create or get a ChromaDB collection"""
         collection_name = f"rag_index_{index_id}"
@@ -59,40 +89,105 @@ class VectorStore:
         index: RAGIndex,
         texts: List[str],
         metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        refresh_field_tables: bool = True,
+        embeddings: Optional[List[List[float]]] = None,
     ) -> None:
-        """Add texts to the vector store with embeddings"""
+        """
+        Add texts to the vector store with embeddings.
+        ids: stable chunk IDs (existing IDs are overwritten); default is a
+        fresh unique ID per text, so repeated adds never collide.
+        embeddings: precomputed vectors (from embed_chunks), e.g. when
+        embedding and writing run as separate pipeline stages.
+        refresh_field_tables=False defers the per-field top-k refresh
+        (call refresh_field_tables() once after a batch of adds).
+        """
         if not self.embedder:
             raise NotImplementedError("Embedding model not available. Install sentence-transformers.")
         
         if not texts:
             return
         
-        collection_name = index.meta.get("collection_name", f"rag_index_{index.index_id}")
-        try:
-            collection = self.client.get_collection(collection_name)
-        except:
-            collection = self.client.create_collection(
-                name=collection_name,
-                metadata={"index_id": index.index_id}
-            )
+        collection = self._collection(index)
         
-        # Generate embeddings
-        embeddings = self.embedder.encode(texts, show_progress_bar=False).tolist()
+        # Generate embeddings (cached by chunk content)
+        if embeddings is None:
+            embeddings = self.embed_chunks(texts)
         
         # Prepare metadatas
         if metadatas is None:
             metadatas = [{}] * len(texts)
         
         # Generate IDs
-        ids = [f"{index.index_id}_{i}" for i in range(len(texts))]
+        if ids is None:
+            ids = [f"{index.index_id}_{uuid.uuid4().hex}" for _ in texts]
         
-        # Add to collection
-        collection.add(
+        # Add to collection (upsert: re-adding a stable ID replaces the chunk)
+        collection.upsert(
             embeddings=embeddings,
             documents=texts,
             metadatas=metadatas,
             ids=ids
         )
+        self._bump_version(collection, index.index_id)
+        if refresh_field_tables:
+            self.refresh_field_tables(index.index_id)
+
+    def delete_texts(
+        self,
+        index: RAGIndex,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        refresh_field_tables: bool = True,
+    ) -> None:
+        """Delete chunks by ID and/or metadata filter (e.g. {"page_id": "123"})."""
+        if not ids and not where:
+            return
+        try:
+            collection = self.client.get_collection(
+                index.meta.get("collection_name", f"rag_index_{index.index_id}")
+            )
+        except Exception:
+            return  # nothing to delete
+        if ids:
+            collection.delete(ids=ids)
+        if where:
+            collection.delete(where=where)
+        self._bump_version(collection, index.index_id)
+        if refresh_field_tables:
+            self.refresh_field_tables(index.index_id)
+
+    def _collection(self, index: RAGIndex):
+        collection_name = index.meta.get("collection_name", f"rag_index_{index.index_id}")
+        try:
+            return self.client.get_collection(collection_name)
+        except:
+            return self.client.create_collection(
+                name=collection_name,
+                metadata={"index_id": index.index_id}
+            )
+
+    def _bump_version(self, collection, index_id: str) -> None:
+        # Stored on the collection so every process sees content changes.
+        # A fresh token rather than a counter: two writers bumping at once
+        # can't end up on the same value, so no lock is needed
+        meta = dict(collection.metadata or {})
+        meta["index_id"] = index_id
+        meta["version"] = uuid.uuid4().hex
+        collection.modify(metadata=meta)
+
+    def index_version(self, index_id: str) -> Optional[str]:
+        """
+        Opaque token that changes whenever the index content changes
+        (None if the index does not exist). Used to invalidate caches
+        derived from query results.
+        """
+        try:
+            collection = self.client.get_collection(f"rag_index_{index_id}")
+        except Exception:
+            return None
+        meta = collection.metadata or {}
+        return f"{meta.get('version', 0)}:{collection.count()}"
 
     def query(
         self,
@@ -113,12 +208,9 @@ class VectorStore:
         except:
             return []  # Collection doesn't exist
         
-        # Generate query embedding
-        query_embedding = self.embedder.encode([query_text], show_progress_bar=False).tolist()[0]
-        
         # Query collection
         results = collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=[self._query_embedding(query_text)],
             n_results=top_k
         )
         
@@ -134,3 +226,178 @@ class VectorStore:
                 hits.append(hit)
         
         return hits
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts through the shared micro-batching service."""
+        if self.embedding_service is not None:
+            return self.embedding_service.encode(texts)
+        return self.embedder.encode(texts, show_progress_bar=False).tolist()
+
+    def embed_chunks(self, texts: List[str]) -> List[List[float]]:
+        """Embed document chunks, reusing cached vectors for unchanged text."""
+        if self.embedding_cache is None:
+            return self.embed(texts)
+        vectors = self.embedding_cache.get_many(texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            fresh = self.embed([texts[i] for i in missing])
+            self.embedding_cache.put_many([texts[i] for i in missing], fresh)
+            for i, v in zip(missing, fresh):
+                vectors[i] = v
+        return vectors
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "embedding_service": self.embedding_service.stats() if self.embedding_service else {},
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else {},
+        }
+
+    def _query_embedding(self, query_text: str) -> List[float]:
+        emb = self._query_embeddings.get(query_text)
+        if emb is None:
+            emb = self.embed([query_text])[0]
+            if len(self._query_embeddings) < 1024:
+                self._query_embeddings[query_text] = emb
+        return emb
+
+    # ---- Per-field retrieval tables ----
+    # FIELD_TO_QUERY is static, so for a given index version the top-k hits
+    # per field never change: they are computed after each ingest and
+    # stored next to the index, turning retrieval into a lookup.
+    def field_table_path(self, index_id: str) -> str:
+        return os.path.join(self.base_dir, "field_tables", f"{index_id}.json")
+
+    def refresh_field_tables(self, index_id: str, top_k: int = FIELD_TABLE_TOP_K) -> Optional[Dict[str, Any]]:
+        """
+        Recompute the top-k hits of every FIELD_TO_QUERY query. Runs one
+        ANN query per field (no chunk re-embedding), so its cost does not
+        grow with the number of changed chunks; deletions are covered too.
+        """
+        if not self.embedder:
+            return None
+        with self._lock:
+            lock = self._table_locks.setdefault(index_id, threading.Lock())
+        with lock:
+            # Version first: a concurrent add makes the table look stale
+            version = self.index_version(index_id)
+            if version is None:
+                return None
+            index = RAGIndex(index_id=index_id, meta={"collection_name": f"rag_index_{index_id}"})
+            table = {
+                "index_version": version,
+                "top_k": top_k,
+                "fields": {
+                    field: self.query(index, query_text=query, top_k=top_k)
+                    for field, query in FIELD_TO_QUERY.items()
+                },
+            }
+            path = self.field_table_path(index_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.tmp{threading.get_ident()}"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(table, f, ensure_ascii=False)
+            os.replace(tmp, path)
+            self._field_tables[index_id] = (os.path.getmtime(path), table)
+            return table
+
+    def _load_field_table(self, index_id: str) -> Optional[Dict[str, Any]]:
+        path = self.field_table_path(index_id)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._field_tables.get(index_id)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._field_tables[index_id] = (mtime, table)
+        return table
+
+    def lookup_field(self, index_id: str, field_name: str, top_k: int = 3) -> Optional[List[dict]]:
+        """
+        Precomputed hits for a field, or None if there is no table, it is
+        older than the index, or it holds fewer than top_k hits per field.
+        """
+        table = self._load_field_table(index_id)
+        if table is None or table.get("top_k", 0) < top_k:
+            return None
+        if table.get("index_version") != self.index_version(index_id):
+            return None
+        hits = table.get("fields", {}).get(field_name)
+        return None if hits is None else hits[:top_k]
+
+    def close(self) -> None:
+        """Release the embedding model and the ChromaDB client."""
+        if self.embedding_service is not None:
+            self.embedding_service.close()
+            self.embedding_service = None
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+            self.embedding_cache = None
+        self.embedder = None
+        clear_cache = getattr(self.client, "clear_system_cache", None)
+        if clear_cache:
+            try:
+                clear_cache()
+            except Exception:
+                pass
+        self.client = None
+
+
+# -----------------------------
+# Process-wide store registry
+# -----------------------------
+# Loading SentenceTransformer and opening a PersistentClient takes seconds,
+# so one VectorStore is shared per (base_dir, embedding_model) and reused by
+# every session / request in the process.
+_stores: Dict[Tuple[str, str], VectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_vector_store(
+    base_dir: str = DEFAULT_INDEX_DIR,
+    embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+) -> VectorStore:
+    """
+    Return the shared VectorStore for (base_dir, embedding_model).
+    Created lazily on first use; thread-safe.
+    """
+    key = (os.path.abspath(base_dir), embedding_model)
+    store = _stores.get(key)
+    if store is not None:
+        return store
+
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = VectorStore(base_dir=base_dir, embedding_model=embedding_model)
+            _stores[key] = store
+        return store
+
+
+def warm_up(
+    base_dir: str = DEFAULT_INDEX_DIR,
+    embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+) -> VectorStore:
+    """
+    Call at server startup so the first user message does not pay
+    the model / client load time.
+    """
+    store = get_vector_store(base_dir=base_dir, embedding_model=embedding_model)
+    if store.embedder is not None:
+        # First encode initializes tokenizer / torch kernels
+        store.embed(["warm up"])
+    return store
+
+
+def shutdown_vector_stores() -> None:
+    """Close and forget all shared stores (server shutdown hook)."""
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
@@ -1,12 +1,27 @@
 from __future__ import annotations
 
 import os
+import re
 import uuid
-from typing import List, Tuple
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
 
+from ..llm.context_builder import estimate_tokens
 from .index import VectorStore, RAGIndex
 
 
+# Chunking: "structured" splits on headings / paragraphs / sentences up to
+# RAG_CHUNK_TOKENS (sized to what retrieval actually passes to the LLM);
+# "chars" is the old fixed-size character slicing
+RAG_CHUNKER = os.getenv("RAG_CHUNKER", "structured")
+RAG_CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", "160"))
+RAG_CHUNK_OVERLAP_TOKENS = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "32"))
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*$")
+_RULE_RE = re.compile(r"^([-*_])\1{2,}$")  # "---" horizontal rule
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?…;:])\s+")
+
+
 def extract_text(file_path: str) -> str:
     """
     Stub: implement PDF/DOCX/TXT extraction later.
@@ -36,6 +51,153 @@ def chunk_text(text: str, max_chars: int = 3500) -> List[str]:
     return chunks
 
 
+@dataclass
+class TextChunk:
+    text: str
+    heading_path: List[str] = field(default_factory=list)
+
+
+def _sections(text: str) -> List[Tuple[List[str], List[str]]]:
+    """
+    (heading path, paragraphs) per section. Headings are markdown-style
+    lines ("## Title"); paragraphs are separated by blank lines and keep
+    their line breaks (lists, table rows).
+    """
+    sections: List[Tuple[List[str], List[str]]] = []
+    path: List[Tuple[int, str]] = []
+    paragraphs: List[str] = []
+    lines: List[str] = []
+
+    def flush_paragraph() -> None:
+        if lines:
+            paragraphs.append("\n".join(lines))
+            lines.clear()
+
+    def flush_section() -> None:
+        flush_paragraph()
+        if paragraphs:
+            sections.append(([title for _, title in path], list(paragraphs)))
+            paragraphs.clear()
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        m = _HEADING_RE.match(line)
+        if m:
+            flush_section()
+            level = len(m.group(1))
+            path = [(lvl, title) for lvl, title in path if lvl < level] + [(level, m.group(2))]
+        elif line and not _RULE_RE.match(line):
+            lines.append(line)
+        else:
+            flush_paragraph()
+    flush_section()
+    return sections
+
+
+def _split_unit(text: str, max_tokens: int) -> List[Tuple[str, str]]:
+    """
+    Split text into (piece, joiner) pieces of at most max_tokens: by lines,
+    then sentences, then words. joiner is how the piece attaches to the
+    previous one when both land in the same chunk.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [(text, "\n\n")]
+    for splitter, joiner in (("\n", "\n"), (_SENTENCE_SPLIT, " ")):
+        parts = text.split(splitter) if isinstance(splitter, str) else splitter.split(text)
+        parts = [p.strip() for p in parts if p.strip()]
+        if len(parts) > 1:
+            out: List[Tuple[str, str]] = []
+            for part in parts:
+                out.extend((piece, joiner) for piece, _ in _split_unit(part, max_tokens))
+            return out
+    # One long "sentence": cut between words
+    out, words, used = [], [], 0
+    for word in text.split():
+        n = estimate_tokens(word)
+        if words and used + n > max_tokens:
+            out.append((" ".join(words), " "))
+            words, used = [], 0
+        words.append(word)
+        used += n
+    if words:
+        out.append((" ".join(words), " "))
+    return out
+
+
+def chunk_document(
+    text: str,
+    title: Optional[str] = None,
+    target_tokens: int = RAG_CHUNK_TOKENS,
+    overlap_tokens: int = RAG_CHUNK_OVERLAP_TOKENS,
+) -> List[TextChunk]:
+    """
+    Structure-aware chunking. Chunks never cross a heading; within a
+    section, paragraphs (or their lines / sentences, if a paragraph is too
+    big) are packed up to target_tokens. Consecutive chunks of a section
+    share up to overlap_tokens of trailing sentences.
+
+    Each chunk's text starts with its heading path ("Title > Section"),
+    which is also returned as heading_path, so a chunk makes sense on its
+    own both to the embedding model and to the LLM reading the snippet.
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    overlap_tokens = max(0, min(overlap_tokens, target_tokens // 2))
+    chunks: List[TextChunk] = []
+
+    for headings, paragraphs in _sections(text):
+        path = ([title] if title else []) + headings
+        prefix = " > ".join(path)
+        budget = max(16, target_tokens - estimate_tokens(prefix))
+
+        def emit(units: List[Tuple[str, str]]) -> None:
+            body = units[0][0] + "".join(joiner + piece for piece, joiner in units[1:])
+            chunks.append(TextChunk(f"{prefix}\n{body}" if prefix else body, list(path)))
+
+        units = [u for paragraph in paragraphs for u in _split_unit(paragraph, budget)]
+        current: List[Tuple[str, str]] = []
+        used = 0
+        for piece, joiner in units:
+            n = estimate_tokens(piece)
+            if current and used + n > budget:
+                emit(current)
+                # Carry the tail of the previous chunk as overlap
+                tail: List[Tuple[str, str]] = []
+                carried = 0
+                for unit in reversed(current):
+                    size = estimate_tokens(unit[0])
+                    if carried + size > overlap_tokens:
+                        break
+                    tail.insert(0, unit)
+                    carried += size
+                current, used = (tail, carried) if carried + n <= budget else ([], 0)
+            current.append((piece, joiner))
+            used += n
+        if current:
+            emit(current)
+    return chunks
+
+
+def chunker_signature(mode: str = RAG_CHUNKER, max_chars: int = 3500) -> str:
+    """Identifies the chunking settings (chunks made with others are re-chunked)."""
+    if mode == "chars":
+        return f"chars:{max_chars}"
+    return f"structured:{RAG_CHUNK_TOKENS}:{RAG_CHUNK_OVERLAP_TOKENS}"
+
+
+def split_text(
+    text: str,
+    title: Optional[str] = None,
+    mode: str = RAG_CHUNKER,
+    max_chars: int = 3500,
+) -> List[TextChunk]:
+    """Chunk text with the configured chunker."""
+    if mode == "chars":
+        return [TextChunk(c) for c in chunk_text(text, max_chars=max_chars)]
+    return chunk_document(text, title=title)
+
+
 def ingest_file(
     file_path: str,
     vector_store: VectorStore,
@@ -45,7 +207,7 @@ def ingest_file(
     Returns index_id to store in session state.
     """
     text = extract_text(file_path)
-    chunks = chunk_text(text, max_chars=max_chunk_chars)
+    chunks = split_text(text, title=os.path.basename(file_path), max_chars=max_chunk_chars)
 
     index_id = str(uuid.uuid4())
     index = vector_store.create_index(index_id)
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .index import VectorStore, get_vector_store
+from .retriever import retrieve_snippets
+
+
+# Speculative retrieval for the wizard's next field (RAG_PREFETCH=0 disables)
+RAG_PREFETCH_ENABLED = os.getenv("RAG_PREFETCH", "1") == "1"
+RAG_PREFETCH_WORKERS = int(os.getenv("RAG_PREFETCH_WORKERS", "2"))
+RAG_PREFETCH_MAX_SESSIONS = int(os.getenv("RAG_PREFETCH_MAX_SESSIONS", "10000"))
+# Longest take() waits for an in-flight prefetch before retrieving inline
+RAG_PREFETCH_WAIT_S = float(os.getenv("RAG_PREFETCH_WAIT_S", "2"))
+
+
+@dataclass
+class _Prefetch:
+    index_id: str
+    field_name: str
+    top_k: int
+    index_version: Optional[str]
+    future: "Future[List[str]]"
+
+
+class RAGPrefetcher:
+    """
+    Runs the next turn's retrieval in the background while the user is
+    typing. One slot per session (only the upcoming field matters).
+
+    take() hands out a result only if it was computed for the same index,
+    field and top_k, and the index has not changed since (index_version).
+    """
+
+    def __init__(
+        self,
+        vector_store: Optional[VectorStore] = None,
+        max_workers: int = RAG_PREFETCH_WORKERS,
+        max_sessions: int = RAG_PREFETCH_MAX_SESSIONS,
+        wait_s: float = RAG_PREFETCH_WAIT_S,
+    ):
+        self._vector_store = vector_store
+        self.max_sessions = max_sessions
+        self.wait_s = wait_s
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-prefetch")
+        self._slots: "OrderedDict[str, _Prefetch]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.scheduled = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    @property
+    def vector_store(self) -> VectorStore:
+        return self._vector_store or get_vector_store()
+
+    def _index_version(self, index_id: str) -> Optional[str]:
+        try:
+            return self.vector_store.index_version(index_id)
+        except Exception:
+            return None
+
+    def _retrieve(self, field_name: str, index_id: str, top_k: int) -> List[str]:
+        return retrieve_snippets(field_name, index_id, self.vector_store, top_k=top_k)
+
+    def schedule(self, session_id: str, index_id: Optional[str], field_name: Optional[str], top_k: int = 3) -> None:
+        if not index_id or not field_name:
+            return
+        with self._lock:
+            slot = self._slots.get(session_id)
+            if slot and (slot.index_id, slot.field_name, slot.top_k) == (index_id, field_name, top_k):
+                return  # already fetching / fetched
+        version = self._index_version(index_id)
+        future = self._executor.submit(self._retrieve, field_name, index_id, top_k)
+        with self._lock:
+            self._slots[session_id] = _Prefetch(index_id, field_name, top_k, version, future)
+            self._slots.move_to_end(session_id)
+            while len(self._slots) > self.max_sessions:
+                _, old = self._slots.popitem(last=False)
+                old.future.cancel()
+            self.scheduled += 1
+
+    def take(self, session_id: str, index_id: str, field_name: str, top_k: int = 3) -> Optional[List[str]]:
+        """
+        Prefetched snippets for this turn, or None (caller retrieves inline).
+        Waits for an in-flight prefetch: it started earlier than an inline
+        query would, so it finishes sooner. The wait is capped at wait_s
+        (callers hold the session lock), after which this returns None.
+        """
+        with self._lock:
+            slot = self._slots.pop(session_id, None)
+        if slot is None or (slot.index_id, slot.field_name, slot.top_k) != (index_id, field_name, top_k):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            snippets = slot.future.result(timeout=self.wait_s)
+        except FutureTimeoutError:
+            slot.future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            return None
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            return None
+
+        # Index re-ingested since the prefetch was scheduled
+        if slot.index_version is None or self._index_version(index_id) != slot.index_version:
+            with self._lock:
+                self.stale += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return snippets
+
+    def invalidate_index(self, index_id: str) -> None:
+        """Drop every pending result computed against index_id."""
+        with self._lock:
+            for sid in [sid for sid, slot in self._slots.items() if slot.index_id == index_id]:
+                self._slots.pop(sid).future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            taken = self.hits + self.misses + self.stale + self.errors + self.timeouts
+            return {
+                "scheduled": self.scheduled,
+                "pending": len(self._slots),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "hit_rate": round(self.hits / taken, 4) if taken else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            for slot in self._slots.values():
+                slot.future.cancel()
+            self._slots.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_prefetcher: Optional[RAGPrefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Optional[RAGPrefetcher]:
+    """Process-wide prefetcher (None if RAG_PREFETCH=0)."""
+    global _prefetcher
+    if not RAG_PREFETCH_ENABLED:
+        return None
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = RAGPrefetcher()
+    return _prefetcher
+
+
+def shutdown_prefetcher() -> None:
+    global _prefetcher
+    with _prefetcher_lock:
+        prefetcher, _prefetcher = _prefetcher, None
+    if prefetcher is not None:
+        prefetcher.close()
@@ -1,30 +1,42 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 
-from .index import VectorStore, RAGIndex
+from .index import FIELD_TABLE_TOP_K, VectorStore, RAGIndex, get_vector_store
 from .field_queries import FIELD_TO_QUERY
 
 
 def retrieve_snippets(
     field_name: str,
     index_id: str,
-    vector_store: VectorStore,
+    vector_store: Optional[VectorStore] = None,
     top_k: int = 3,
     max_chars_each: int = 700,
 ) -> List[str]:
     """
     Returns list[str] snippets to feed into LLM context.
     This is token-safe by design (short clipped text).
+    If vector_store is None, the process-wide shared store is used.
+    Wizard fields are served from the index's precomputed field table.
     """
     if not index_id:
         return []
 
+    if vector_store is None:
+        vector_store = get_vector_store()
+
     query = FIELD_TO_QUERY.get(field_name, field_name)
     index = RAGIndex(index_id=index_id, meta={})
 
     try:
-        hits = vector_store.query(index, query_text=query, top_k=top_k)
+        hits = None
+        if field_name in FIELD_TO_QUERY:
+            # Precomputed at ingest time; (re)built once if missing or stale
+            hits = vector_store.lookup_field(index_id, field_name, top_k=top_k)
+            if hits is None and vector_store.refresh_field_tables(index_id, top_k=max(top_k, FIELD_TABLE_TOP_K)):
+                hits = vector_store.lookup_field(index_id, field_name, top_k=top_k)
+        if hits is None:
+            hits = vector_store.query(index, query_text=query, top_k=top_k)
     except NotImplementedError:
         return []  # stub: no store yet
 
@@ -1,11 +1,32 @@
 from __future__ import annotations
 
 import os
+import random
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
 from typing import List, Dict, Optional, Any
 from abc import ABC, abstractmethod
 
 
+# Parallel page downloads (WIKI_FETCH_WORKERS=1 restores sequential fetching)
+WIKI_FETCH_WORKERS = int(os.getenv("WIKI_FETCH_WORKERS", "8"))
+WIKI_FETCH_TIMEOUT_S = float(os.getenv("WIKI_FETCH_TIMEOUT_S", "30"))
+WIKI_FETCH_RETRIES = int(os.getenv("WIKI_FETCH_RETRIES", "5"))
+WIKI_FETCH_BACKOFF_S = float(os.getenv("WIKI_FETCH_BACKOFF_S", "0.5"))
+WIKI_FETCH_BACKOFF_MAX_S = float(os.getenv("WIKI_FETCH_BACKOFF_MAX_S", "30"))
+
+_BODY_EXPAND = "body.storage,version,space"
+# Search page size for ID/version listings (no bodies, so it can be large)
+_LIST_PAGE_SIZE = 200
+# Pages per body download request (Confluence caps body-expanded searches)
+_BODY_BATCH = 25
+
+
 class WikiClient(ABC):
     """Abstract base class for wiki clients"""
     
@@ -23,12 +44,108 @@ class WikiClient(ABC):
     def extract_text(self, page_data: Dict[str, Any]) -> str:
         """Extract plain text from page data"""
         pass
+    
+    def fetch_pages_by_id(self, page_ids: List[str]) -> List[Dict[str, Any]]:
+        """Fetch several pages by ID (in order; pages that fail are skipped)"""
+        pages = []
+        for page_id in page_ids:
+            try:
+                pages.append(self.fetch_page(page_id))
+            except Exception as e:
+                print(f"Error fetching page {page_id}: {e}")
+        return pages
+    
+    def list_page_versions(self, space_key: Optional[str] = None, limit: int = 10000) -> Dict[str, int]:
+        """page_id -> version number for every page (no bodies); used by incremental sync"""
+        raise NotImplementedError(f"{type(self).__name__} does not support incremental sync")
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps in-flight requests, AIMD style: the limit halves on a throttled
+    (429) or failed (5xx) response and grows by one after `limit` clean
+    responses in a row, never above max_limit. A Retry-After (or backoff
+    delay) pauses every worker, not just the one that was throttled.
+    
+    acquire() returns the current epoch; failures of requests started
+    before the last decrease don't halve again (one burst of 429s is one
+    congestion signal, not N).
+    """
+    
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._streak = 0
+        self._epoch = 0
+        self._cond = threading.Condition()
+        
+        self.throttled = 0
+        self.min_limit_seen = self.limit
+    
+    def acquire(self) -> int:
+        with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self._in_flight < self.limit:
+                    self._in_flight += 1
+                    return self._epoch
+                self._cond.wait(timeout=wait if wait > 0 else None)
+    
+    def release(self, epoch: int, ok: bool = True, delay: float = 0.0) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if ok:
+                self._streak += 1
+                if self._streak >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._streak = 0
+            else:
+                self.throttled += 1
+                self._streak = 0
+                if epoch == self._epoch:
+                    self._epoch += 1
+                    self.limit = max(1, self.limit // 2)
+                    self.min_limit_seen = min(self.min_limit_seen, self.limit)
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._cond.notify_all()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "max_limit": self.max_limit,
+                "min_limit_seen": self.min_limit_seen,
+                "in_flight": self._in_flight,
+                "throttled": self.throttled,
+            }
+
+
+def _retry_after_s(response: requests.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
 
 
 class ConfluenceClient(WikiClient):
     """
     Atlassian Confluence wiki client
     
+    Listings are fetched without bodies; page bodies are then downloaded
+    in ID batches by up to max_workers threads over a pooled HTTP
+    session (keep-alive connections are reused across batches). 429 / 5xx
+    responses are retried (honouring Retry-After) and shrink concurrency
+    via AdaptiveConcurrencyLimiter.
+    
     Usage:
         client = ConfluenceClient(
             base_url="https://your-domain.atlassian.net/wiki",
@@ -44,6 +161,9 @@ class ConfluenceClient(WikiClient):
         username: Optional[str] = None,
         api_token: Optional[str] = None,
         password: Optional[str] = None,
+        max_workers: int = WIKI_FETCH_WORKERS,
+        timeout: float = WIKI_FETCH_TIMEOUT_S,
+        retries: int = WIKI_FETCH_RETRIES,
     ):
         self.base_url = base_url.rstrip('/')
         self.username = username or os.getenv("CONFLUENCE_USERNAME")
@@ -55,19 +175,100 @@ class ConfluenceClient(WikiClient):
         if not (self.api_token or self.password):
             raise ValueError("Confluence API token or password required (env: CONFLUENCE_API_TOKEN or CONFLUENCE_PASSWORD)")
         
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.limiter = AdaptiveConcurrencyLimiter(self.max_workers)
+        
         self.auth = (self.username, self.api_token or self.password)
         self.session = requests.Session()
         self.session.auth = self.auth
+        # One keep-alive connection per worker; retries are handled in _get
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+    
+    def _get(self, url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """GET JSON, retrying 429 / 5xx / connection errors with backoff"""
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            backoff = min(WIKI_FETCH_BACKOFF_MAX_S, WIKI_FETCH_BACKOFF_S * (2 ** attempt))
+            backoff *= random.uniform(0.5, 1.0)
+            epoch = self.limiter.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self.limiter.release(epoch, ok=False, delay=backoff)
+                if last:
+                    raise
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                delay = _retry_after_s(response)
+                delay = min(WIKI_FETCH_BACKOFF_MAX_S, delay) if delay is not None else backoff
+                self.limiter.release(epoch, ok=False, delay=delay)
+                if last:
+                    response.raise_for_status()
+                continue
+            self.limiter.release(epoch, ok=True)
+            response.raise_for_status()
+            return response.json()
+        raise RuntimeError("unreachable")
     
     def fetch_page(self, page_id: str) -> Dict[str, Any]:
         """Fetch a single Confluence page by ID"""
         url = f"{self.base_url}/rest/api/content/{page_id}"
         params = {
-            "expand": "body.storage,version,space"
+            "expand": _BODY_EXPAND
         }
-        response = self.session.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+        return self._get(url, params=params)
+    
+    def fetch_pages_by_id(self, page_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Download page bodies by ID: CQL `id in (...)` searches of
+        _BODY_BATCH pages each, run by up to max_workers threads.
+        Returns pages in the requested order; missing pages are skipped.
+        IDs that are not numeric never reach the CQL and count as missing.
+        """
+        page_ids = list(dict.fromkeys(str(page_id) for page_id in page_ids))
+        valid = [page_id for page_id in page_ids if page_id.isascii() and page_id.isdigit()]
+        batches = [valid[i:i + _BODY_BATCH] for i in range(0, len(valid), _BODY_BATCH)]
+        
+        def fetch(batch: List[str]) -> List[Dict[str, Any]]:
+            try:
+                return self._search(f"id in ({','.join(batch)})", _BODY_EXPAND, len(batch), page_size=len(batch))
+            except Exception as e:
+                print(f"Error fetching pages {batch[0]}..{batch[-1]}: {e}")
+                return []
+        
+        if self.max_workers == 1 or len(batches) <= 1:
+            results = [fetch(batch) for batch in batches]
+        else:
+            workers = min(self.max_workers, len(batches))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wiki-fetch") as pool:
+                results = list(pool.map(fetch, batches))
+        
+        by_id = {str(page["id"]): page for batch in results for page in batch}
+        missing = [page_id for page_id in page_ids if page_id not in by_id]
+        if missing:
+            print(f"Could not fetch {len(missing)} pages: {', '.join(missing[:10])}")
+        return [by_id[page_id] for page_id in page_ids if page_id in by_id]
+    
+    def _search(self, cql: str, expand: str, limit: int, page_size: int) -> List[Dict[str, Any]]:
+        url = f"{self.base_url}/rest/api/content/search"
+        params = {"cql": cql, "expand": expand, "limit": min(limit, page_size)}
+        results: List[Dict[str, Any]] = []
+        start = 0
+        while len(results) < limit:
+            params["start"] = start
+            data = self._get(url, params=params)
+            pages = data.get("results", [])
+            if not pages:
+                break
+            results.extend(pages)
+            if not data.get("_links", {}).get("next"):
+                break
+            start += len(pages)
+        return results[:limit]
     
     def fetch_pages(
         self,
@@ -78,48 +279,44 @@ class ConfluenceClient(WikiClient):
         """
         Fetch multiple Confluence pages
         
+        Lists matching page IDs first (no bodies), then downloads the
+        bodies in parallel. With max_workers=1 bodies are expanded in the
+        search results instead.
+        
         Args:
             space_key: Filter by space key (e.g., "ENG", "PROD")
             limit: Maximum number of pages to fetch
             cql: Confluence Query Language query (e.g., "type=page AND space=ENG")
         """
-        url = f"{self.base_url}/rest/api/content/search"
-        params = {
-            "expand": "body.storage,version,space",
-            "limit": limit,
+        cql = cql or self._space_cql(space_key)
+        if self.max_workers == 1:
+            return self._search(cql, _BODY_EXPAND, limit, page_size=limit)
+        listed = self._search(cql, "version", limit, page_size=_LIST_PAGE_SIZE)
+        return self.fetch_pages_by_id([str(page["id"]) for page in listed])
+    
+    @staticmethod
+    def _space_cql(space_key: Optional[str]) -> str:
+        return f"type=page AND space={space_key}" if space_key else "type=page"
+    
+    def list_page_versions(self, space_key: Optional[str] = None, limit: int = 10000) -> Dict[str, int]:
+        """
+        page_id -> version number for every page in the space.
+        Only the version is expanded, so this is cheap even for large spaces.
+        """
+        listed = self._search(self._space_cql(space_key), "version", limit, page_size=_LIST_PAGE_SIZE)
+        return {
+            str(page["id"]): int(page.get("version", {}).get("number", 0))
+            for page in listed
         }
-        
-        if cql:
-            params["cql"] = cql
-        elif space_key:
-            params["cql"] = f"type=page AND space={space_key}"
-        else:
-            params["cql"] = "type=page"
-        
-        all_pages = []
-        start = 0
-        
-        while True:
-            params["start"] = start
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            pages = data.get("results", [])
-            if not pages:
-                break
-            
-            all_pages.extend(pages)
-            
-            if len(all_pages) >= limit or not data.get("_links", {}).get("next"):
-                break
-            
-            start += len(pages)
-        
-        return all_pages[:limit]
     
     def extract_text(self, page_data: Dict[str, Any]) -> str:
-        """Extract plain text from Confluence page"""
+        """
+        Extract plain text from Confluence page
+        
+        Keeps the page structure for the chunker: headings become
+        markdown-style "## Title" lines, blocks (paragraphs, list items,
+        table rows) end up on their own lines.
+        """
         body = page_data.get("body", {})
         storage = body.get("storage", {})
         html_content = storage.get("value", "")
@@ -128,12 +325,26 @@ class ConfluenceClient(WikiClient):
         import re
         from html import unescape
         
+        # Headings -> "## Title"
+        text = re.sub(
+            r'<h([1-6])[^>]*>(.*?)</h\1>',
+            lambda m: "\n\n" + "#" * int(m.group(1)) + " " + re.sub(r'<[^>]+>', '', m.group(2)) + "\n\n",
+            html_content,
+            flags=re.IGNORECASE | re.DOTALL,
+        )
+        # Block boundaries -> line breaks
+        text = re.sub(r'<li[^>]*>', '\n- ', text, flags=re.IGNORECASE)
+        text = re.sub(r'</t[dh]>', ' | ', text, flags=re.IGNORECASE)
+        text = re.sub(r'<br\s*/?>|</tr>', '\n', text, flags=re.IGNORECASE)
+        text = re.sub(r'</(p|div|ul|ol|table|blockquote|pre)>', '\n\n', text, flags=re.IGNORECASE)
         # Remove HTML tags
-        text = re.sub(r'<[^>]+>', '', html_content)
+        text = re.sub(r'<[^>]+>', '', text)
         # Decode HTML entities
         text = unescape(text)
-        # Clean up whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+        # Clean up whitespace (within lines; at most one blank line)
+        text = re.sub(r'[^\S\n]+', ' ', text)
+        text = re.sub(r' *\n *', '\n', text)
+        text = re.sub(r'\n{3,}', '\n\n', text).strip()
         
         return text
 
@@ -1,10 +1,24 @@
 from __future__ import annotations
 
 import os
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timezone
+from typing import Callable, List, Dict, Any, Optional
 from .wiki_client import WikiClient, ConfluenceClient, create_wiki_client
 from .index import VectorStore, RAGIndex
-from .ingest import chunk_text
+from .ingest import chunker_signature
+from .wiki_pipeline import (
+    IngestProgress,
+    WikiIngestPipeline,
+    load_manifest,
+    save_manifest,
+)
+
+
+def _print_progress(progress: IngestProgress) -> None:
+    print(
+        f"Ingested {progress.pages_done}/{progress.pages_total} pages "
+        f"({progress.chunks_written} chunks, {progress.seconds:.1f}s)"
+    )
 
 
 def ingest_wiki_pages(
@@ -15,18 +29,28 @@ def ingest_wiki_pages(
     limit: int = 100,
     max_chunk_chars: int = 3500,
     index_id: Optional[str] = None,
+    on_progress: Optional[Callable[[IngestProgress], None]] = _print_progress,
+    resume: bool = False,
 ) -> str:
     """
     Fetch pages from wiki and ingest them into RAG index.
     
+    Pages stream through WikiIngestPipeline in fixed-size batches, so
+    memory stays flat and chunks land in the index as they are written.
+    The manifest is checkpointed after every batch: with resume=True
+    (and the same index_id) an interrupted run continues with the pages
+    it had not written yet.
+    
     Args:
         wiki_client: WikiClient instance (Confluence, MediaWiki, etc.)
         vector_store: VectorStore instance
         page_ids: Specific page IDs to fetch (if None, fetches all pages)
         space_key: Space/key to filter pages (wiki-specific)
         limit: Maximum number of pages to fetch
-        max_chunk_chars: Maximum characters per chunk
+        max_chunk_chars: Maximum characters per chunk (RAG_CHUNKER=chars only)
         index_id: Existing index ID to add to, or None to create new
+        on_progress: Called with an IngestProgress after each page batch
+        resume: Continue an interrupted ingest of this index
     
     Returns:
         index_id: The RAG index ID (can be stored in session state)
@@ -63,65 +87,142 @@ def ingest_wiki_pages(
         index_id = str(uuid.uuid4())
         index = vector_store.create_index(index_id)
     
-    # Fetch pages
-    if page_ids:
+    manifest = load_manifest(vector_store, index_id)
+    pending = WikiIngestPipeline.resume_page_ids(manifest) if resume else []
+    if pending:
+        print(f"Resuming ingest of index {index_id}: {len(pending)} pages left")
+        page_ids = pending
+    elif page_ids:
         # Fetch specific pages
-        pages = []
-        for page_id in page_ids:
-            try:
-                page = wiki_client.fetch_page(page_id)
-                pages.append(page)
-            except Exception as e:
-                print(f"Error fetching page {page_id}: {e}")
-                continue
+        page_ids = [str(page_id) for page_id in page_ids]
     else:
-        # Fetch all pages (with filters)
-        pages = wiki_client.fetch_pages(space_key=space_key, limit=limit)
-    
-    print(f"Fetched {len(pages)} pages from wiki")
+        # List the space without bodies; bodies are fetched batch by batch
+        try:
+            page_ids = list(wiki_client.list_page_versions(space_key=space_key, limit=limit))
+        except NotImplementedError:
+            page_ids = [str(p.get("id")) for p in wiki_client.fetch_pages(space_key=space_key, limit=limit)]
     
-    # Extract text and chunk
-    all_chunks = []
-    all_metadatas = []
+    print(f"Ingesting {len(page_ids)} pages into index {index_id}")
     
-    for page in pages:
-        try:
-            text = wiki_client.extract_text(page)
-            if not text or len(text.strip()) < 50:
-                continue  # Skip empty or very short pages
-            
-            chunks = chunk_text(text, max_chars=max_chunk_chars)
-            
-            # Create metadata for each chunk
-            page_title = page.get("title", page.get("displayTitle", "Unknown"))
-            page_id = page.get("id", page.get("pageid", "unknown"))
-            page_url = page.get("_links", {}).get("webui", page.get("url", ""))
-            
-            for i, chunk in enumerate(chunks):
-                all_chunks.append(chunk)
-                all_metadatas.append({
-                    "source": "wiki",
-                    "page_id": str(page_id),
-                    "page_title": page_title,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks),
-                    "url": page_url,
-                })
-        except Exception as e:
-            print(f"Error processing page {page.get('id', 'unknown')}: {e}")
-            continue
-    
-    # Add to vector store
-    if all_chunks:
-        print(f"Adding {len(all_chunks)} chunks to vector store...")
-        vector_store.add_texts(index, all_chunks, metadatas=all_metadatas)
-        print(f"Successfully ingested {len(pages)} pages into index {index_id}")
+    # Replace each page's chunks (stable IDs: re-ingesting never duplicates)
+    pipeline = WikiIngestPipeline(
+        wiki_client, vector_store, index, manifest,
+        max_chunk_chars=max_chunk_chars, on_progress=on_progress,
+    )
+    result = pipeline.run(page_ids)
+    if result["pages"]:
+        vector_store.refresh_field_tables(index_id)
+    if result["chunks_written"]:
+        print(f"Successfully ingested {result['pages']} pages ({result['chunks_written']} chunks) into index {index_id}")
     else:
         print("No chunks to add")
+    if result["failed"]:
+        print(f"{result['failed']} pages failed; run again with resume=True to retry them")
     
     return index_id
 
 
+def _in_space(page_meta: Dict[str, Any], manifest: Dict[str, Any], space_key: Optional[str]) -> bool:
+    """Whether a manifest page belongs to space_key (None = the whole wiki)."""
+    if not space_key:
+        return True
+    # Entries written before pages recorded their space: a previous sync
+    # of the same space owns them
+    return page_meta.get("space", manifest.get("space_key")) == space_key
+
+
+def sync_wiki_space(
+    wiki_client: WikiClient,
+    vector_store: VectorStore,
+    space_key: Optional[str] = None,
+    index_id: Optional[str] = None,
+    limit: int = 10000,
+    max_chunk_chars: int = 3500,
+    full: bool = False,
+    on_progress: Optional[Callable[[IngestProgress], None]] = _print_progress,
+) -> Dict[str, Any]:
+    """
+    Bring an index up to date with a wiki space, touching only what changed.
+    
+    1. List page_id -> version for the whole space (no bodies).
+    2. Stream only pages whose version (or chunker settings) differs from
+       the manifest through WikiIngestPipeline (their old chunks are
+       replaced).
+    3. Delete chunks of pages of this space that are gone from it,
+       refresh field tables once. Pages the manifest records under another
+       space (or ingested by ID) are left alone, and nothing is deleted if
+       the listing hit `limit` (it may not cover the whole space).
+    
+    The manifest is updated after every written batch, so an interrupted
+    sync simply picks up the remaining pages next time.
+    full=True ignores the manifest and re-ingests every page.
+    
+    Returns:
+        Dict with index_id, added, updated, deleted, unchanged, chunks_written
+    """
+    import uuid
+    
+    if index_id:
+        index = RAGIndex(index_id=index_id, meta={"collection_name": f"rag_index_{index_id}"})
+    else:
+        index_id = str(uuid.uuid4())
+        index = vector_store.create_index(index_id)
+    
+    manifest = load_manifest(vector_store, index_id)
+    known: Dict[str, Any] = manifest["pages"]
+    started = datetime.now(timezone.utc)
+    
+    remote = wiki_client.list_page_versions(space_key=space_key, limit=limit)
+    # Pages chunked with other settings are re-chunked too
+    signature = chunker_signature(max_chars=max_chunk_chars)
+    changed = {
+        page_id for page_id, version in remote.items()
+        if full
+        or known.get(page_id, {}).get("version") != version
+        or known.get(page_id, {}).get("chunker") != signature
+    }
+    if len(remote) >= limit:
+        # Truncated listing: pages past the limit are not gone
+        print(f"Wiki sync listed {len(remote)} pages (limit {limit}); skipping deletions")
+        removed = []
+    else:
+        removed = [
+            page_id for page_id, meta in known.items()
+            if page_id not in remote and _in_space(meta, manifest, space_key)
+        ]
+    
+    added = sum(1 for page_id in changed if page_id not in known)
+    pipeline = WikiIngestPipeline(
+        wiki_client, vector_store, index, manifest,
+        max_chunk_chars=max_chunk_chars, on_progress=on_progress,
+    )
+    result = pipeline.run(sorted(changed))
+    
+    if removed:
+        vector_store.delete_texts(index, where={"page_id": {"$in": removed}}, refresh_field_tables=False)
+        for page_id in removed:
+            known.pop(page_id, None)
+    
+    if result["pages"] or removed:
+        vector_store.refresh_field_tables(index_id)
+    
+    manifest["space_key"] = space_key
+    manifest["last_sync"] = started.isoformat()
+    save_manifest(vector_store, index_id, manifest)
+    
+    summary = {
+        "index_id": index_id,
+        "added": added,
+        "updated": len(changed) - added,
+        "deleted": len(removed),
+        "unchanged": len(remote) - len(changed),
+        "failed": result["failed"],
+        "chunks_written": result["chunks_written"],
+    }
+    print(f"Wiki sync for index {index_id}: {summary}")
+    return summary
+
+
 def ingest_wiki_from_config(
     wiki_type: str,
     vector_store: VectorStore,
@@ -129,17 +230,24 @@ def ingest_wiki_from_config(
     space_key: Optional[str] = None,
     limit: int = 100,
     index_id: Optional[str] = None,
+    sync: bool = False,
+    resume: bool = False,
     **wiki_kwargs
 ) -> str:
     """
     Convenience function to ingest Confluence wiki pages from configuration.
+    With sync=True (and no page_ids) the space is synced incrementally
+    (see sync_wiki_space) instead of re-ingesting every page.
     
     Args:
         wiki_type: Must be "confluence" (only Confluence is supported)
         vector_store: VectorStore instance
         page_ids: Specific page IDs to fetch
         space_key: Space/key to filter pages
-        limit: Maximum number of pages
+        limit: Maximum number of pages (not used by sync, which lists the whole space)
+        index_id: Existing index ID to add to / sync, or None to create new
+        sync: Only fetch and re-embed pages changed since the last sync
+        resume: Continue an interrupted (non-sync) ingest of index_id
         **wiki_kwargs: Additional arguments for Confluence client (base_url, username, api_token, etc.)
     
     Returns:
@@ -159,6 +267,13 @@ def ingest_wiki_from_config(
         raise ValueError(f"Only Confluence is supported. Got: {wiki_type}")
     
     wiki_client = create_wiki_client(**wiki_kwargs)
+    if sync and not page_ids:
+        return sync_wiki_space(
+            wiki_client=wiki_client,
+            vector_store=vector_store,
+            space_key=space_key,
+            index_id=index_id,
+        )["index_id"]
     return ingest_wiki_pages(
         wiki_client=wiki_client,
         vector_store=vector_store,
@@ -166,4 +281,5 @@ def ingest_wiki_from_config(
         space_key=space_key,
         limit=limit,
         index_id=index_id,
+        resume=resume,
     )
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .index import RAGIndex, VectorStore
+from .ingest import RAG_CHUNKER, chunker_signature, split_text
+from .wiki_client import WikiClient
+
+
+# Streaming ingestion: pages are fetched, chunked, embedded and written in
+# fixed-size batches; at most WIKI_INGEST_QUEUE_DEPTH batches wait between
+# two stages, so memory does not grow with the size of the space.
+WIKI_INGEST_PAGE_BATCH = int(os.getenv("WIKI_INGEST_PAGE_BATCH", "25"))
+WIKI_INGEST_EMBED_BATCH = int(os.getenv("WIKI_INGEST_EMBED_BATCH", "128"))
+WIKI_INGEST_QUEUE_DEPTH = int(os.getenv("WIKI_INGEST_QUEUE_DEPTH", "2"))
+
+_DONE = object()
+
+
+def wiki_chunk_id(page_id: str, chunk_index: int) -> str:
+    """Stable chunk ID: re-ingesting a page overwrites its own chunks only"""
+    return f"wiki:{page_id}:{chunk_index}"
+
+
+# ---- Manifest: page_id -> version per index, plus the resume checkpoint ----
+def manifest_path(vector_store: VectorStore, index_id: str) -> str:
+    return os.path.join(vector_store.base_dir, "wiki_manifests", f"{index_id}.json")
+
+
+def load_manifest(vector_store: VectorStore, index_id: str) -> Dict[str, Any]:
+    try:
+        with open(manifest_path(vector_store, index_id), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault("pages", {})
+    return manifest
+
+
+def save_manifest(vector_store: VectorStore, index_id: str, manifest: Dict[str, Any]) -> None:
+    path = manifest_path(vector_store, index_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    # Rewritten after every batch: serialize in one go (json.dump issues a
+    # write per token)
+    data = json.dumps(manifest, ensure_ascii=False)
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def page_version(page: Dict[str, Any]) -> int:
+    return int(page.get("version", {}).get("number", 0))
+
+
+def page_chunks(
+    wiki_client: WikiClient,
+    page: Dict[str, Any],
+    max_chunk_chars: int,
+    chunker: str = RAG_CHUNKER,
+) -> Tuple[List[str], List[dict], List[str]]:
+    """(chunks, metadatas, ids) for one page; empty for empty or very short pages"""
+    text = wiki_client.extract_text(page)
+    if not text or len(text.strip()) < 50:
+        return [], [], []
+
+    page_title = page.get("title", page.get("displayTitle", "Unknown"))
+    chunks = split_text(text, title=page_title, mode=chunker, max_chars=max_chunk_chars)
+    page_id = str(page.get("id", page.get("pageid", "unknown")))
+    page_url = page.get("_links", {}).get("webui", page.get("url", ""))
+    metadatas = [
+        {
+            "source": "wiki",
+            "page_id": page_id,
+            "page_title": page_title,
+            "heading_path": " > ".join(chunk.heading_path),
+            "chunk_index": i,
+            "total_chunks": len(chunks),
+            "url": page_url,
+        }
+        for i, chunk in enumerate(chunks)
+    ]
+    ids = [wiki_chunk_id(page_id, i) for i in range(len(chunks))]
+    return [chunk.text for chunk in chunks], metadatas, ids
+
+
+@dataclass
+class IngestProgress:
+    """Passed to on_progress after every committed page batch."""
+    index_id: str
+    pages_total: int
+    pages_done: int
+    pages_failed: int
+    chunks_written: int
+    seconds: float
+
+
+@dataclass
+class _PageBatch:
+    page_ids: List[str]                # as requested (incl. pages that failed to fetch)
+    pages: List[Dict[str, Any]]
+    chunks: Optional[List[Tuple[Dict[str, Any], List[str], List[dict], List[str]]]] = None
+    embeddings: Optional[List[List[float]]] = None
+
+
+class WikiIngestPipeline:
+    """
+    fetch -> extract/chunk -> embed -> write, one thread per stage, with
+    bounded queues in between (the slowest stage sets the pace; the others
+    block instead of buffering). The unit of work is a batch of
+    page_batch pages.
+
+    Checkpointing: before the first batch, the IDs still to ingest are
+    stored in the manifest ("checkpoint.pending"); after each batch is
+    written, its pages move to manifest["pages"] and the manifest is
+    saved atomically. A crashed run leaves the remainder in pending (as
+    does a finished run whose pages failed to fetch), and
+    resume_page_ids() hands it to the next run.
+    """
+
+    def __init__(
+        self,
+        wiki_client: WikiClient,
+        vector_store: VectorStore,
+        index: RAGIndex,
+        manifest: Dict[str, Any],
+        max_chunk_chars: int = 3500,
+        page_batch: int = WIKI_INGEST_PAGE_BATCH,
+        embed_batch: int = WIKI_INGEST_EMBED_BATCH,
+        queue_depth: int = WIKI_INGEST_QUEUE_DEPTH,
+        on_progress: Optional[Callable[[IngestProgress], None]] = None,
+        chunker: str = RAG_CHUNKER,
+    ):
+        self.wiki_client = wiki_client
+        self.vector_store = vector_store
+        self.index = index
+        self.manifest = manifest
+        self.max_chunk_chars = max_chunk_chars
+        self.page_batch = max(1, page_batch)
+        self.embed_batch = max(1, embed_batch)
+        self.queue_depth = max(1, queue_depth)
+        self.on_progress = on_progress
+        self.chunker = chunker
+        self.chunker_signature = chunker_signature(chunker, max_chunk_chars)
+        self._stop = threading.Event()
+
+    # ---- checkpoint ----
+    def _save(self) -> None:
+        save_manifest(self.vector_store, self.index.index_id, self.manifest)
+
+    @staticmethod
+    def resume_page_ids(manifest: Dict[str, Any]) -> List[str]:
+        """Pages an interrupted run did not get to (empty if it finished)."""
+        return list(manifest.get("checkpoint", {}).get("pending", []))
+
+    # ---- stages ----
+    def _put(self, q: "queue.Queue[Any]", item: Any) -> bool:
+        """Blocking put that gives up once the pipeline is stopping."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: "queue.Queue[Any]") -> Any:
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _stage(
+        self,
+        source: "queue.Queue[Any]",
+        sink: "queue.Queue[Any]",
+        work: Callable[[_PageBatch], _PageBatch],
+    ) -> None:
+        while True:
+            item = self._get(source)
+            if item is _DONE or isinstance(item, BaseException):
+                self._put(sink, item)
+                return
+            try:
+                item = work(item)
+            except BaseException as e:
+                self._put(sink, e)
+                return
+            if not self._put(sink, item):
+                return
+
+    def _fetch_all(self, page_ids: List[str], sink: "queue.Queue[Any]") -> None:
+        # Up to max_workers batches downloading at once (the client's own
+        # limiter still applies), handed on in order
+        workers = max(1, getattr(self.wiki_client, "max_workers", 1))
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wiki-ingest-fetch")
+        in_flight: "deque[Tuple[List[str], Future]]" = deque()
+        try:
+            for i in range(0, len(page_ids), self.page_batch):
+                ids = page_ids[i:i + self.page_batch]
+                in_flight.append((ids, pool.submit(self.wiki_client.fetch_pages_by_id, ids)))
+                if len(in_flight) >= workers:
+                    ids, future = in_flight.popleft()
+                    if not self._put(sink, _PageBatch(ids, future.result())):
+                        return
+            while in_flight:
+                ids, future = in_flight.popleft()
+                if not self._put(sink, _PageBatch(ids, future.result())):
+                    return
+        except BaseException as e:
+            self._put(sink, e)
+            return
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._put(sink, _DONE)
+
+    def _chunk(self, batch: _PageBatch) -> _PageBatch:
+        batch.chunks = []
+        for page in batch.pages:
+            page_id = str(page.get("id", page.get("pageid", "unknown")))
+            try:
+                chunks, metadatas, ids = page_chunks(self.wiki_client, page, self.max_chunk_chars, self.chunker)
+            except Exception as e:
+                print(f"Error processing page {page_id}: {e}")
+                continue
+            batch.chunks.append((page, chunks, metadatas, ids))
+        batch.pages = []  # bodies are no longer needed
+        return batch
+
+    def _embed(self, batch: _PageBatch) -> _PageBatch:
+        texts = [t for _, chunks, _, _ in batch.chunks for t in chunks]
+        batch.embeddings = []
+        for i in range(0, len(texts), self.embed_batch):
+            batch.embeddings.extend(self.vector_store.embed_chunks(texts[i:i + self.embed_batch]))
+        return batch
+
+    def _write(self, batch: _PageBatch) -> Tuple[int, int]:
+        """Replace the batch's pages in the index, then checkpoint. Returns (pages, chunks)."""
+        pages_meta = self.manifest["pages"]
+        texts: List[str] = []
+        metadatas: List[dict] = []
+        ids: List[str] = []
+        written = set()
+        for page, chunks, page_metadatas, chunk_ids in batch.chunks:
+            page_id = str(page.get("id", page.get("pageid", "unknown")))
+            texts.extend(chunks)
+            metadatas.extend(page_metadatas)
+            ids.extend(chunk_ids)
+            written.add(page_id)
+            pages_meta[page_id] = {
+                "version": page_version(page),
+                "title": page.get("title", ""),
+                "chunks": len(chunks),
+                "chunker": self.chunker_signature,
+                "space": (page.get("space") or {}).get("key"),
+            }
+        # Old chunks first (one delete for the batch): a page that got
+        # shorter leaves nothing behind
+        if written:
+            self.vector_store.delete_texts(
+                self.index, where={"page_id": {"$in": sorted(written)}}, refresh_field_tables=False
+            )
+        for i in range(0, len(texts), self.embed_batch):
+            self.vector_store.add_texts(
+                self.index,
+                texts[i:i + self.embed_batch],
+                metadatas=metadatas[i:i + self.embed_batch],
+                ids=ids[i:i + self.embed_batch],
+                embeddings=batch.embeddings[i:i + self.embed_batch],
+                refresh_field_tables=False,
+            )
+
+        # Pages that failed to fetch / process stay pending for the next run
+        checkpoint = self.manifest.setdefault("checkpoint", {"pending": []})
+        checkpoint["pending"] = [p for p in checkpoint["pending"] if p not in written]
+        self._save()
+        return len(batch.chunks), len(texts)
+
+    # ---- driver ----
+    def run(self, page_ids: Iterable[str]) -> Dict[str, Any]:
+        """
+        Ingest page_ids (fetched by ID, in batches). Field tables are not
+        refreshed; callers do that once at the end.
+
+        Returns:
+            Dict with pages, failed, chunks_written, seconds
+        """
+        page_ids = list(dict.fromkeys(str(p) for p in page_ids))
+        started = time.perf_counter()
+        self.manifest["checkpoint"] = {"pending": list(page_ids)}
+        self._save()
+
+        fetched: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_depth)
+        chunked: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_depth)
+        embedded: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_depth)
+        threads = [
+            threading.Thread(target=self._fetch_all, args=(page_ids, fetched), name="wiki-ingest-fetch", daemon=True),
+            threading.Thread(target=self._stage, args=(fetched, chunked, self._chunk), name="wiki-ingest-chunk", daemon=True),
+            threading.Thread(target=self._stage, args=(chunked, embedded, self._embed), name="wiki-ingest-embed", daemon=True),
+        ]
+        for t in threads:
+            t.start()
+
+        pages_done = failed = chunks_written = 0
+        try:
+            while True:
+                batch = embedded.get()
+                if batch is _DONE:
+                    break
+                if isinstance(batch, BaseException):
+                    raise batch
+                written_pages, written_chunks = self._write(batch)
+                pages_done += written_pages
+                failed += len(batch.page_ids) - written_pages
+                chunks_written += written_chunks
+                if self.on_progress is not None:
+                    self.on_progress(IngestProgress(
+                        index_id=self.index.index_id,
+                        pages_total=len(page_ids),
+                        pages_done=pages_done,
+                        pages_failed=failed,
+                        chunks_written=chunks_written,
+                        seconds=time.perf_counter() - started,
+                    ))
+        finally:
+            self._stop.set()
+            for t in threads:
+                t.join(timeout=5)
+
+        if not self.resume_page_ids(self.manifest):
+            self.manifest.pop("checkpoint", None)
+        self._save()
+        return {
+            "pages": pages_done,
+            "failed": failed,
+            "chunks_written": chunks_written,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
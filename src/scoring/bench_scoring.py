@@ -0,0 +1,148 @@
+"""
+SCORING MICROBENCHMARK
+
+Compares the compiled rule-table scorers (FIELD_SCORERS) with the previous
+hand-written scorers that lowercased the text and scanned every keyword
+with a separate substring check. Times are the best of --repeat runs.
+
+Expected Results is a little slower than before (0.8-1.0x): its regex
+is as fast as the old one, but the Turkish fold (tr_fold) costs more than
+str.lower on text that contains "ı".
+
+Usage:
+    PYTHONPATH=. python -m src.scoring.bench_scoring [--iterations 20000] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from typing import Callable, Dict, List
+
+from .scoring_engine_final import FIELD_RULES, FIELD_SCORERS, VAGUE_WORDS_TR, compile_field_rules
+
+
+# ---- previous implementation (reference only) ----
+
+def _legacy_char_len(s: str) -> int:
+    return len((s or "").strip())
+
+def _legacy_contains_any(text: str, words: List[str]) -> bool:
+    t = (text or "").lower()
+    return any(w.lower() in t for w in words)
+
+def _legacy_background(val):
+    if _legacy_char_len(val) == 0:
+        return 0, ["Background alanı boş."], ["Q_BACKGROUND_EMPTY"]
+    if _legacy_char_len(val) < 50:
+        return 5, ["Background çok kısa."], ["Q_BACKGROUND_MORE_DETAIL"]
+    if _legacy_contains_any(val, VAGUE_WORDS_TR):
+        return 13, ["Belirsiz ifadeler var."], ["Q_BACKGROUND_MORE_SPECIFIC"]
+    return 15, [], []
+
+def _legacy_expected_results(val):
+    if _legacy_char_len(val) == 0:
+        return 0, ["Expected Results alanı boş."], ["Q_EXPECTED_RESULTS_EMPTY"]
+    if re.search(r"(%|sn|dk|adet|oran|kpi)", val.lower()):
+        return 15, [], []
+    return 10, ["Ölçülebilir hedef yok."], ["Q_EXPECTED_RESULTS_ADD_TARGET"]
+
+def _legacy_journeys_description(val):
+    if _legacy_char_len(val) == 0:
+        return 0, ["Journey Description boş."], ["Q_JDESC_EMPTY"]
+    if _legacy_char_len(val) < 120:
+        return 20, ["Journey açıklaması zayıf."], ["Q_JDESC_BEFORE_AFTER"]
+    if any(x in val.lower() for x in ["edge", "hata", "timeout", "error"]):
+        return 40, [], []
+    return 35, ["Edge-case eksik."], ["Q_JDESC_EDGE_CASE"]
+
+LEGACY_SCORERS: Dict[str, Callable] = {
+    "Background": _legacy_background,
+    "Expected Results": _legacy_expected_results,
+    "Journeys Description": _legacy_journeys_description,
+}
+
+SAMPLES: Dict[str, List[str]] = {
+    "Background": [
+        "Mevcut süreçte faturalı müşteriler tarife değişikliği için çağrı merkezini arıyor, "
+        "işlem ortalama 12 dakika sürüyor ve manuel adımlar nedeniyle hata oranı yüksek.",
+        "Kampanya tanımları legacy sistemde manuel yapılıyor; süreci daha iyi ve verimli hale getirmek istiyoruz.",
+        "Kısa metin",
+    ],
+    "Expected Results": [
+        "Çağrı merkezi aramalarında %20 azalma, işlem süresinin 30 sn altına inmesi.",
+        "Müşteri memnuniyeti artacak ve süreç hızlanacak.",
+    ],
+    "Journeys Description": [
+        "As-is: müşteri çağrı merkezini arar, temsilci tarifeyi manuel değiştirir. To-be: müşteri "
+        "uygulamadan tarifeyi seçer, sistem uygunluk kontrolü yapar ve anında aktive eder. "
+        "Ödeme servisinde timeout olursa işlem kuyruğa alınır ve müşteriye bildirim gönderilir.",
+        "As-is: müşteri mağazaya gider ve formu doldurur. To-be: müşteri web üzerinden başvurur, "
+        "başvuru otomatik onaylanır ve sözleşme e-posta ile gönderilir, süreç tamamen dijital olur.",
+    ],
+}
+
+
+def _time(fn: Callable, texts: List[str], iterations: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            for t in texts:
+                fn(t)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _large_vocabulary_case(size: int):
+    """Background scorer with a grown vague-word list (regex trie path)."""
+    words = list(VAGUE_WORDS_TR) + [f"belirsiz{i}ifade" for i in range(size)]
+
+    def legacy(val):
+        if _legacy_char_len(val) == 0:
+            return 0, ["Background alanı boş."], ["Q_BACKGROUND_EMPTY"]
+        if _legacy_char_len(val) < 50:
+            return 5, ["Background çok kısa."], ["Q_BACKGROUND_MORE_DETAIL"]
+        if _legacy_contains_any(val, words):
+            return 13, ["Belirsiz ifadeler var."], ["Q_BACKGROUND_MORE_SPECIFIC"]
+        return 15, [], []
+
+    rules = [dict(r) for r in FIELD_RULES["Background"]]
+    rules[2]["keywords"] = words
+    return legacy, compile_field_rules(rules)
+
+
+def _report(
+    name: str, legacy: Callable, compiled: Callable, texts: List[str], iterations: int, repeat: int
+) -> None:
+    # Same results on these (Turkish-casing-neutral) samples
+    for t in texts:
+        expected, got = legacy(t), compiled(t)
+        if expected != got:
+            raise RuntimeError(f"{name}: compiled scorer returned {got!r}, legacy {expected!r} for {t!r}")
+
+    calls = iterations * len(texts)
+    t_legacy = _time(legacy, texts, iterations, repeat)
+    t_compiled = _time(compiled, texts, iterations, repeat)
+    print(
+        f"{name:<28}{t_legacy / calls * 1e6:>16.2f}{t_compiled / calls * 1e6:>18.2f}"
+        f"{t_legacy / t_compiled:>9.2f}x"
+    )
+
+
+def run(iterations: int = 20000, repeat: int = 5) -> None:
+    print(f"{'field':<28}{'legacy us/call':>16}{'compiled us/call':>18}{'speedup':>10}")
+    for field, legacy in LEGACY_SCORERS.items():
+        _report(field, legacy, FIELD_SCORERS[field], SAMPLES[field], iterations, repeat)
+
+    legacy, compiled = _large_vocabulary_case(300)
+    _report("Background (314 keywords)", legacy, compiled, SAMPLES["Background"], max(1, iterations // 10), repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark compiled vs legacy field scorers.")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per scorer (best is reported)")
+    args = parser.parse_args()
+    run(args.iterations, args.repeat)
@@ -0,0 +1,236 @@
+"""
+BULK RESCORING (session archive)
+
+Re-runs scoring_engine_final over every stored session, e.g. after tuning
+FIELD_MAX / VAGUE_WORDS_TR / SUBMIT_THRESHOLD, and reports which sessions
+flip submit_allowed.
+
+- Streams session IDs from the SessionStore (no full archive in memory)
+- Scores chunks of sessions across a process pool (workers load sessions)
+- Writes one row per session to JSONL or CSV
+- Prints a JSON summary with counts and throughput
+
+Usage:
+    PYTHONPATH=. python -m src.scoring.rescore --data-dir data/sessions \\
+        --out data/rescore.jsonl --workers 8
+    PYTHONPATH=. python -m src.scoring.rescore --backend sqlite \\
+        --db data/sessions/sessions.db --format csv --out rescore.csv --threshold 75
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import scoring_engine_final as engine
+
+
+RESULT_COLUMNS = [
+    "session_id",
+    "total_score",
+    "max_total",
+    "submit_allowed",
+    "prev_total_score",
+    "prev_submit_allowed",
+    "submit_changed",
+    "weak_fields",
+    "error",
+]
+
+# Per-worker store (set by _init_worker)
+_store = None
+
+
+def _open_store(backend: str, data_dir: str, db_path: Optional[str]):
+    from ..core.store import FileSessionStore
+
+    if backend == "sqlite":
+        from ..core.store_sqlite import SQLiteSessionStore
+
+        return SQLiteSessionStore(db_path or os.path.join(data_dir, "sessions.db"))
+    return FileSessionStore(data_dir)
+
+
+def _init_worker(backend: str, data_dir: str, db_path: Optional[str], threshold: Optional[int]) -> None:
+    global _store
+    _store = _open_store(backend, data_dir, db_path)
+    if threshold is not None:
+        engine.SUBMIT_THRESHOLD = threshold
+
+
+def _score_one(session_id: str) -> Dict[str, Any]:
+    row: Dict[str, Any] = {"session_id": session_id, "error": None}
+    try:
+        state = _store.load(session_id)
+    except Exception as e:
+        row["error"] = f"load failed: {e}"
+        return row
+
+    result = engine.compute_scores_from_fields(state.fields)
+    prev = state.scores or {}
+    prev_allowed = prev.get("submit_allowed")
+
+    row.update({
+        "total_score": result.total_score,
+        "max_total": result.max_total,
+        "submit_allowed": result.submit_allowed,
+        "prev_total_score": prev.get("total_score"),
+        "prev_submit_allowed": prev_allowed,
+        "submit_changed": prev_allowed is not None and prev_allowed != result.submit_allowed,
+        "weak_fields": engine.get_weak_fields(result),
+    })
+    return row
+
+
+def _score_chunk(session_ids: List[str]) -> List[Dict[str, Any]]:
+    return [_score_one(sid) for sid in session_ids]
+
+
+def _chunks(it: Iterator[str], size: int) -> Iterator[List[str]]:
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _Writer:
+    def __init__(self, path: str, fmt: str):
+        self.fmt = fmt
+        self.f = open(path, "w", encoding="utf-8", newline="")
+        self.csv = None
+        if fmt == "csv":
+            self.csv = csv.DictWriter(self.f, fieldnames=RESULT_COLUMNS)
+            self.csv.writeheader()
+
+    def write(self, row: Dict[str, Any]) -> None:
+        if self.csv is not None:
+            out = dict(row)
+            out["weak_fields"] = ";".join(row.get("weak_fields") or [])
+            self.csv.writerow({k: out.get(k) for k in RESULT_COLUMNS})
+        else:
+            self.f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def close(self) -> None:
+        self.f.close()
+
+
+def rescore_archive(
+    out_path: str,
+    data_dir: str = "data/sessions",
+    backend: str = "file",
+    db_path: Optional[str] = None,
+    fmt: str = "jsonl",
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    threshold: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Rescore every session in the store and write per-session rows to out_path.
+    Returns a summary dict (counts, flipped sessions, throughput).
+    """
+    workers = workers or os.cpu_count() or 1
+    # The parent only streams IDs (workers open their own stores); closed below
+    store = _open_store(backend, data_dir, db_path)
+    ids: Iterator[str] = iter(store.iter_session_ids())
+    if limit:
+        ids = islice(ids, limit)
+
+    summary: Dict[str, Any] = {
+        "sessions": 0,
+        "errors": 0,
+        "submit_allowed": 0,
+        "became_allowed": 0,
+        "became_blocked": 0,
+        "changed_sample": [],  # first few flipped IDs; all are in the output
+    }
+    writer: Optional[_Writer] = None
+    t0 = time.perf_counter()
+
+    def consume(rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            writer.write(row)
+            summary["sessions"] += 1
+            if row.get("error"):
+                summary["errors"] += 1
+                continue
+            if row["submit_allowed"]:
+                summary["submit_allowed"] += 1
+            if row["submit_changed"]:
+                key = "became_allowed" if row["submit_allowed"] else "became_blocked"
+                summary[key] += 1
+                if len(summary["changed_sample"]) < 20:
+                    summary["changed_sample"].append(row["session_id"])
+
+    try:
+        writer = _Writer(out_path, fmt)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(backend, data_dir, db_path, threshold),
+        ) as pool:
+            # Keep a bounded number of chunks in flight so the ID stream is
+            # consumed lazily
+            pending = set()
+            max_in_flight = workers * 4
+            for chunk in _chunks(ids, chunk_size):
+                pending.add(pool.submit(_score_chunk, chunk))
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        consume(fut.result())
+            for fut in pending:
+                consume(fut.result())
+    finally:
+        if writer is not None:
+            writer.close()
+        store.close()
+
+    seconds = time.perf_counter() - t0
+    summary["seconds"] = round(seconds, 3)
+    summary["sessions_per_sec"] = round(summary["sessions"] / seconds, 1) if seconds > 0 else None
+    summary["workers"] = workers
+    summary["threshold"] = threshold if threshold is not None else engine.SUBMIT_THRESHOLD
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rescore archived BRD sessions in parallel.")
+    parser.add_argument("--data-dir", default="data/sessions")
+    parser.add_argument("--backend", choices=["file", "sqlite"], default=os.getenv("SESSION_STORE", "file"))
+    parser.add_argument("--db", default=None, help="SQLite path (default: <data-dir>/sessions.db)")
+    parser.add_argument("--out", default="rescore.jsonl")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                        help="Output format (default: from --out extension)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--threshold", type=int, default=None,
+                        help="Override SUBMIT_THRESHOLD for a what-if run")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.out.endswith(".csv") else "jsonl")
+    summary = rescore_archive(
+        out_path=args.out,
+        data_dir=args.data_dir,
+        backend=args.backend,
+        db_path=args.db,
+        fmt=fmt,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        threshold=args.threshold,
+        limit=args.limit,
+    )
+    print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-
 """
 SCORING ENGINE (Wizard / State Based)
 
@@ -10,9 +9,11 @@ SCORING ENGINE (Wizard / State Based)
 Author: Hackathon Team
 """
 
+import hashlib
+import json
 import re
 from dataclasses import dataclass
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Callable, Dict, List, Tuple, Optional
 
 # -------------------------------------------------
 # 1) Fields & max scores
@@ -29,6 +30,9 @@ FIELD_MAX = {
     "Traffic Forecast": 5,
 }
 
+# Minimum total score to allow submit
+SUBMIT_THRESHOLD = 70
+
 VAGUE_WORDS_TR = [
     "uygun", "mümkün", "hızlı", "asap", "optimum", "gerektiğinde", "user friendly",
     "makul", "iyileştir", "geliştir", "daha iyi", "kolay", "en kısa", "verimli"
@@ -95,89 +99,209 @@ class ScoreResult:
 # 4) Helpers
 # -------------------------------------------------
 
+# Turkish-aware fold: İ/I/ı/i all map to "i" so Turkish casing ("İYİLEŞTİR")
+# and English keywords ("KPI", "TIMEOUT") both match lowercase keywords.
+# (str.lower maps "İ" to "i" + combining dot U+0307, which is dropped here.)
+def tr_fold(text: str) -> str:
+    t = (text or "").lower()
+    if "ı" in t:
+        t = t.replace("ı", "i")
+    if "\u0307" in t:
+        t = t.replace("i\u0307", "i")
+    return t
+
+def as_text(val: Any) -> str:
+    # Field values are strings, but LLM normalization may return lists
+    if isinstance(val, list):
+        return ", ".join(str(x) for x in val)
+    return str(val or "")
+
 def char_len(s: str) -> int:
-    return len((s or "").strip())
+    return len(as_text(s).strip())
 
 def contains_any(text: str, words: List[str]) -> bool:
-    t = (text or "").lower()
-    return any(w.lower() in t for w in words)
+    t = tr_fold(as_text(text))
+    return any(tr_fold(w) in t for w in words)
 
 # -------------------------------------------------
-# 5) Field scorers
+# 5) Field scoring rules (declarative)
 # -------------------------------------------------
-
-def score_background(val: str):
-    if char_len(val) == 0:
-        return 0, ["Background alanı boş."], ["Q_BACKGROUND_EMPTY"]
-    if char_len(val) < 50:
-        return 5, ["Background çok kısa."], ["Q_BACKGROUND_MORE_DETAIL"]
-    if contains_any(val, VAGUE_WORDS_TR):
-        return 13, ["Belirsiz ifadeler var."], ["Q_BACKGROUND_MORE_SPECIFIC"]
-    return 15, [], []
-
-def score_expected_results(val: str):
-    if char_len(val) == 0:
-        return 0, ["Expected Results alanı boş."], ["Q_EXPECTED_RESULTS_EMPTY"]
-    measurable = bool(re.search(r"(%|sn|dk|adet|oran|kpi)", val.lower()))
-    if measurable:
-        return 15, [], []
-    return 10, ["Ölçülebilir hedef yok."], ["Q_EXPECTED_RESULTS_ADD_TARGET"]
-
-def score_target_customer_group(val: str):
-    if char_len(val) == 0:
-        return 0, ["Target Customer Group boş."], ["Q_CUSTOMER_GROUP_EMPTY"]
-    if "tüm" in val.lower():
-        return 2, ["Müşteri grubu çok genel."], ["Q_CUSTOMER_GROUP_SPECIFY"]
-    return 5, [], []
-
-def score_impacted_channels(val: str):
-    if char_len(val) == 0:
-        return 0, ["Impacted Channels boş."], ["Q_CHANNELS_EMPTY"]
-    if len(val.split()) < 3:
-        return 5, ["Kanal detayları zayıf."], ["Q_CHANNELS_IMPACT_EXPLAIN"]
-    return 10, [], []
-
-def score_impacted_journey(val: str):
-    if char_len(val) == 0:
-        return 0, ["Impacted Journey boş."], ["Q_JOURNEY_EMPTY"]
-    if any(x in val.lower() for x in ["yeni", "new", "mevcut", "existing"]):
-        return 5, [], []
-    return 3, ["Journey tipi net değil."], ["Q_JOURNEY_NEW_EXISTING"]
-
-def score_journeys_description(val: str):
-    if char_len(val) == 0:
-        return 0, ["Journey Description boş."], ["Q_JDESC_EMPTY"]
-    if char_len(val) < 120:
-        return 20, ["Journey açıklaması zayıf."], ["Q_JDESC_BEFORE_AFTER"]
-    if any(x in val.lower() for x in ["edge", "hata", "timeout", "error"]):
-        return 40, [], []
-    return 35, ["Edge-case eksik."], ["Q_JDESC_EDGE_CASE"]
-
-def score_reports_needed(val: str):
-    if char_len(val) == 0:
-        return 0, ["Reports Needed boş."], ["Q_REPORTS_EMPTY"]
-    if "yok" in val.lower():
-        return 3, [], []
-    return 5, [], []
-
-def score_traffic_forecast(val: str):
-    if char_len(val) == 0:
-        return 0, ["Traffic Forecast boş."], ["Q_TRAFFIC_EMPTY"]
-    if re.search(r"\d", val):
-        return 5, [], []
-    return 3, ["Tahmin sayısal değil."], ["Q_TRAFFIC_ESTIMATE"]
-
-FIELD_SCORERS = {
-    "Background": score_background,
-    "Expected Results": score_expected_results,
-    "Target Customer Group": score_target_customer_group,
-    "Impacted Channels": score_impacted_channels,
-    "Impacted Journey": score_impacted_journey,
-    "Journeys Description": score_journeys_description,
-    "Reports Needed": score_reports_needed,
-    "Traffic Forecast": score_traffic_forecast,
+# Each field has an ordered rule list; the first rule whose condition holds
+# gives (score, findings, question_ids). A rule without "if" is the default.
+#
+#   {"if": "empty"}                              value is blank
+#   {"if": "shorter_than", "chars": N}           stripped length < N
+#   {"if": "fewer_words_than", "words": N}       whitespace words < N
+#   {"if": "contains_any", "keywords": [...]}    any keyword (Turkish-folded)
+#   {"if": "matches", "pattern": r"..."}         regex on Turkish-folded text
+
+FIELD_RULES: Dict[str, List[Dict[str, Any]]] = {
+    "Background": [
+        {"if": "empty", "score": 0, "findings": ["Background alanı boş."], "questions": ["Q_BACKGROUND_EMPTY"]},
+        {"if": "shorter_than", "chars": 50, "score": 5, "findings": ["Background çok kısa."], "questions": ["Q_BACKGROUND_MORE_DETAIL"]},
+        {"if": "contains_any", "keywords": VAGUE_WORDS_TR, "score": 13, "findings": ["Belirsiz ifadeler var."], "questions": ["Q_BACKGROUND_MORE_SPECIFIC"]},
+        {"score": 15},
+    ],
+    "Expected Results": [
+        {"if": "empty", "score": 0, "findings": ["Expected Results alanı boş."], "questions": ["Q_EXPECTED_RESULTS_EMPTY"]},
+        {"if": "matches", "pattern": r"(%|sn|dk|adet|oran|kpi)", "score": 15},
+        {"score": 10, "findings": ["Ölçülebilir hedef yok."], "questions": ["Q_EXPECTED_RESULTS_ADD_TARGET"]},
+    ],
+    "Target Customer Group": [
+        {"if": "empty", "score": 0, "findings": ["Target Customer Group boş."], "questions": ["Q_CUSTOMER_GROUP_EMPTY"]},
+        {"if": "contains_any", "keywords": ["tüm"], "score": 2, "findings": ["Müşteri grubu çok genel."], "questions": ["Q_CUSTOMER_GROUP_SPECIFY"]},
+        {"score": 5},
+    ],
+    "Impacted Channels": [
+        {"if": "empty", "score": 0, "findings": ["Impacted Channels boş."], "questions": ["Q_CHANNELS_EMPTY"]},
+        {"if": "fewer_words_than", "words": 3, "score": 5, "findings": ["Kanal detayları zayıf."], "questions": ["Q_CHANNELS_IMPACT_EXPLAIN"]},
+        {"score": 10},
+    ],
+    "Impacted Journey": [
+        {"if": "empty", "score": 0, "findings": ["Impacted Journey boş."], "questions": ["Q_JOURNEY_EMPTY"]},
+        {"if": "contains_any", "keywords": ["yeni", "new", "mevcut", "existing"], "score": 5},
+        {"score": 3, "findings": ["Journey tipi net değil."], "questions": ["Q_JOURNEY_NEW_EXISTING"]},
+    ],
+    "Journeys Description": [
+        {"if": "empty", "score": 0, "findings": ["Journey Description boş."], "questions": ["Q_JDESC_EMPTY"]},
+        {"if": "shorter_than", "chars": 120, "score": 20, "findings": ["Journey açıklaması zayıf."], "questions": ["Q_JDESC_BEFORE_AFTER"]},
+        {"if": "contains_any", "keywords": ["edge", "hata", "timeout", "error"], "score": 40},
+        {"score": 35, "findings": ["Edge-case eksik."], "questions": ["Q_JDESC_EDGE_CASE"]},
+    ],
+    "Reports Needed": [
+        {"if": "empty", "score": 0, "findings": ["Reports Needed boş."], "questions": ["Q_REPORTS_EMPTY"]},
+        {"if": "contains_any", "keywords": ["yok"], "score": 3},
+        {"score": 5},
+    ],
+    "Traffic Forecast": [
+        {"if": "empty", "score": 0, "findings": ["Traffic Forecast boş."], "questions": ["Q_TRAFFIC_EMPTY"]},
+        {"if": "matches", "pattern": r"\d", "score": 5},
+        {"score": 3, "findings": ["Tahmin sayısal değil."], "questions": ["Q_TRAFFIC_ESTIMATE"]},
+    ],
 }
 
+_PATTERN_RULES = ("contains_any", "matches")
+
+# A lone keyword rule up to this size is matched with plain substring scans
+SMALL_KEYWORD_SET = 32
+
+def _trie_regex(words: List[str]) -> str:
+    """
+    Keyword alternation factored into a prefix trie, e.g.
+    ["makul", "mümkün"] -> "m(?:akul|ümkün)", so the regex engine tests
+    each text position against one branch per distinct character.
+    """
+    trie: Dict[str, Any] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        # A keyword ends here: the rest is optional (shortest match suffices)
+        return "" if "" in node else body
+
+    return build(trie)
+
+def _rule_regex(rule: Dict[str, Any]) -> str:
+    if rule["if"] == "contains_any":
+        return _trie_regex([tr_fold(w) for w in rule["keywords"] if w])
+    return rule["pattern"]
+
+def compile_field_rules(rules: List[Dict[str, Any]]) -> Callable[[Any], Tuple[int, List[str], List[str]]]:
+    """
+    Compile a rule list into a scorer function.
+
+    All keyword sets / regexes of a field are merged into one regex (a named
+    group per rule) that runs once over the Turkish-folded text; the text is
+    folded at most once per call and only if a pattern rule is reached.
+    """
+    pattern_idx = [i for i, r in enumerate(rules) if r.get("if") in _PATTERN_RULES]
+    combined = None
+    single: Dict[int, Any] = {}
+    if pattern_idx:
+        combined = re.compile("|".join(f"(?P<r{i}>{_rule_regex(rules[i])})" for i in pattern_idx))
+        if len(pattern_idx) > 1:
+            # Alternatives can shadow each other at the same position; a
+            # rule not seen in the combined pass is re-checked on its own
+            single = {i: re.compile(_rule_regex(rules[i])) for i in pattern_idx}
+    wanted = {f"r{i}" for i in pattern_idx}
+
+    # (condition, arg, rule index, group name, result) per rule, in order
+    steps = []
+    for i, r in enumerate(rules):
+        cond = r.get("if")
+        arg = r.get("chars", r.get("words"))
+        result = (r.get("score", 0), tuple(r.get("findings", ())), tuple(r.get("questions", ())))
+        steps.append((cond, arg, i, f"r{i}", result))
+
+    # Small keyword sets: CPython's substring search beats the regex engine
+    scan_words: Tuple[str, ...] = ()
+    if len(pattern_idx) == 1:
+        only = rules[pattern_idx[0]]
+        if only["if"] == "contains_any" and len(only["keywords"]) <= SMALL_KEYWORD_SET:
+            scan_words = tuple(sorted({tr_fold(w) for w in only["keywords"] if w}))
+
+    def matched_groups(folded: str) -> set:
+        if scan_words:
+            for w in scan_words:
+                if w in folded:
+                    return wanted
+            return set()
+        if len(pattern_idx) == 1:
+            # One pattern rule: stop at the first hit
+            return wanted if combined.search(folded) else set()
+        found = set()
+        for m in combined.finditer(folded):
+            found.add(m.lastgroup)
+            if found >= wanted:
+                break
+        return found
+
+    def scorer(val: Any) -> Tuple[int, List[str], List[str]]:
+        text = val if isinstance(val, str) else as_text(val)
+        stripped = text.strip()
+        matched = None
+        folded = ""
+
+        for cond, arg, i, group, result in steps:
+            if cond is None:
+                hit = True
+            elif cond == "empty":
+                hit = not stripped
+            elif cond == "shorter_than":
+                hit = len(stripped) < arg
+            elif cond == "fewer_words_than":
+                hit = len(text.split()) < arg
+            else:
+                if matched is None:
+                    folded = tr_fold(text)
+                    matched = matched_groups(folded)
+                hit = group in matched or (i in single and single[i].search(folded) is not None)
+            if hit:
+                return result[0], list(result[1]), list(result[2])
+
+        return 0, [], []
+
+    return scorer
+
+FIELD_SCORERS = {field: compile_field_rules(rules) for field, rules in FIELD_RULES.items()}
+
+# Named scorers kept for callers importing them directly
+score_background = FIELD_SCORERS["Background"]
+score_expected_results = FIELD_SCORERS["Expected Results"]
+score_target_customer_group = FIELD_SCORERS["Target Customer Group"]
+score_impacted_channels = FIELD_SCORERS["Impacted Channels"]
+score_impacted_journey = FIELD_SCORERS["Impacted Journey"]
+score_journeys_description = FIELD_SCORERS["Journeys Description"]
+score_reports_needed = FIELD_SCORERS["Reports Needed"]
+score_traffic_forecast = FIELD_SCORERS["Traffic Forecast"]
+
 # -------------------------------------------------
 # 6) Final score computation (STATE BASED)
 # -------------------------------------------------
@@ -195,8 +319,8 @@ def compute_scores_from_fields(fields: Dict[str, str]) -> ScoreResult:
         total += score
         field_scores.append(FieldScore(field, score, max_sc, findings, qids))
 
-    submit_allowed = total >= 70
-    blockers = [] if submit_allowed else ["Toplam skor 70'in altında."]
+    submit_allowed = total >= SUBMIT_THRESHOLD
+    blockers = [] if submit_allowed else [f"Toplam skor {SUBMIT_THRESHOLD}'in altında."]
 
     return ScoreResult(
         total_score=total,
@@ -206,6 +330,88 @@ def compute_scores_from_fields(fields: Dict[str, str]) -> ScoreResult:
         submit_blockers=blockers
     )
 
+# -------------------------------------------------
+# 7) Incremental scoring (per-field cache)
+# -------------------------------------------------
+
+# Bump when the scoring code itself changes (rule evaluation, folding).
+# Rule, keyword and max-score edits change SCORING_VERSION on their own.
+SCORER_CODE_VERSION = "2"
+
+def _scoring_version() -> str:
+    payload = json.dumps(
+        [SCORER_CODE_VERSION, FIELD_RULES, VAGUE_WORDS_TR, FIELD_MAX],
+        ensure_ascii=False, sort_keys=True, default=str,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+# Part of every cached per-field hash: any scorer change invalidates the cache
+SCORING_VERSION = _scoring_version()
+
+def _field_hash(field: str, val: Any) -> str:
+    payload = json.dumps(
+        [SCORING_VERSION, field, FIELD_MAX.get(field), val],
+        ensure_ascii=False, sort_keys=True, default=str,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def score_field(field: str, val: Any) -> FieldScore:
+    max_sc = FIELD_MAX[field]
+    score, findings, qids = FIELD_SCORERS[field](val)
+    score = max(0, min(score, max_sc))
+    return FieldScore(field, score, max_sc, findings, qids)
+
+def compute_scores_incremental(
+    fields: Dict[str, str],
+    cache: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Tuple[ScoreResult, Dict[str, Dict[str, Any]]]:
+    """
+    Same result as compute_scores_from_fields, but reuses cached FieldScores
+    for fields whose value hash did not change.
+
+    cache: field -> {"hash", "score", "findings", "question_ids"}
+           (JSON-serializable; store it with the session)
+    Returns (ScoreResult, updated cache).
+    """
+    cache = cache or {}
+    new_cache: Dict[str, Dict[str, Any]] = {}
+    total = 0
+    max_total = sum(FIELD_MAX.values())
+    field_scores = []
+
+    for field, max_sc in FIELD_MAX.items():
+        val = fields.get(field, "")
+        h = _field_hash(field, val)
+        entry = cache.get(field)
+        if entry is None or entry.get("hash") != h:
+            fs = score_field(field, val)
+            entry = {
+                "hash": h,
+                "score": fs.score,
+                "findings": list(fs.findings),
+                "question_ids": list(fs.question_ids),
+            }
+        else:
+            fs = FieldScore(
+                field, entry["score"], max_sc,
+                list(entry["findings"]), list(entry["question_ids"]),
+            )
+        new_cache[field] = entry
+        total += fs.score
+        field_scores.append(fs)
+
+    submit_allowed = total >= SUBMIT_THRESHOLD
+    blockers = [] if submit_allowed else [f"Toplam skor {SUBMIT_THRESHOLD}'in altında."]
+
+    result = ScoreResult(
+        total_score=total,
+        max_total=max_total,
+        field_scores=field_scores,
+        submit_allowed=submit_allowed,
+        submit_blockers=blockers
+    )
+    return result, new_cache
+
 def get_weak_fields(result: ScoreResult, ratio: float = 0.7) -> List[str]:
     return [
         fs.field for fs in result.field_scores
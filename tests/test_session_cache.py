@@ -0,0 +1,33 @@
+"""
+Run from the repo root: PYTHONPATH=. python -m pytest tests
+"""
+import threading
+import time
+
+from src.core.session_cache import CachedSessionStore
+from src.core.session_lock import session_lock
+from src.core.store import FileSessionStore
+from src.core.types import SessionState
+
+
+def test_flush_writes_the_save_made_under_session_lock(tmp_path):
+    backend = FileSessionStore(str(tmp_path))
+    cache = CachedSessionStore(backend, flush_interval=3600)
+    try:
+        cache.save(SessionState(session_id="s1", created_at="2024-01-01T00:00:00", fields={"a": "one"}))
+
+        flusher = threading.Thread(target=cache.flush)
+        with session_lock("s1"):
+            # A request loads and edits the session while a flush starts
+            state = cache.load("s1")
+            state.fields["a"] = "two"
+            flusher.start()
+            time.sleep(0.1)  # flush has listed the dirty session, waits for the lock
+            cache.save(state)
+        flusher.join(timeout=5)
+        cache.flush()
+
+        assert backend.load("s1").fields["a"] == "two"
+        assert cache.stats()["flush_conflicts"] == 0
+    finally:
+        cache.close()